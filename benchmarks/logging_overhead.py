@@ -0,0 +1,98 @@
+"""Per-request logging overhead: synchronous stream handler vs queue pipeline.
+
+Simulates the log calls a request makes (one filtered DEBUG call, one emitted
+INFO call) and reports the cost per request seen by the request thread.
+
+    python benchmarks/logging_overhead.py [--requests 20000]
+"""
+
+import argparse
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.logging import JsonFormatter, RequestContextFilter  # noqa: E402
+
+
+class SlowStream:
+    """stderr stand-in with a fixed per-write latency (e.g. a busy pipe / log shipper)."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def write(self, data: str) -> None:
+        time.sleep(self.delay)
+
+    def flush(self) -> None:
+        pass
+
+
+def _sync_logger(stream) -> logging.Logger:
+    logger = logging.getLogger("bench.sync")
+    logger.handlers[:] = [logging.StreamHandler(stream)]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _queue_logger(stream) -> tuple[logging.Logger, QueueListener]:
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    listener = QueueListener(log_queue, handler)
+    logger = logging.getLogger("bench.queue")
+    logger.handlers[:] = [queue_handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, listener
+
+
+def run_fstring(logger: logging.Logger, n: int) -> float:
+    users = list(range(50))
+    started = time.perf_counter()
+    for i in range(n):
+        logger.debug(f"Loaded users {users}")
+        logger.info(f"Successfully retrieved user with ID: {i}")
+    return (time.perf_counter() - started) / n
+
+
+def run_lazy(logger: logging.Logger, n: int) -> float:
+    users = list(range(50))
+    started = time.perf_counter()
+    for i in range(n):
+        logger.debug("Loaded users %s", users)
+        logger.info("Successfully retrieved user with ID: %s", i)
+    return (time.perf_counter() - started) / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--write-delay-us", type=float, default=20.0)
+    args = parser.parse_args()
+    stream = SlowStream(args.write_delay_us / 1_000_000)
+
+    sync_logger = _sync_logger(stream)
+    baseline = run_fstring(sync_logger, args.requests)
+
+    queue_logger, listener = _queue_logger(stream)
+    listener.start()
+    try:
+        pipeline = run_lazy(queue_logger, args.requests)
+    finally:
+        listener.stop()
+
+    print(f"requests simulated:                  {args.requests}")
+    print(f"sync handler + f-strings:            {baseline * 1e6:8.2f} us/request")
+    print(f"queue pipeline + lazy %-formatting:  {pipeline * 1e6:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,56 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from fastapi import APIRouter, Depends, Response
 from typing import List
 from ..database.core import DbSession
 from ..roles.services import require_admin
+from ..pagination import DEFAULT_PAGE_SIZE, PageLimit, set_next_cursor
 from . import services, models
 from ..auth.service import CurrentUser
 
 router = APIRouter(prefix="/admin-notifications", tags=["AdminNotifications"], dependencies=[Depends(require_admin)])
 
-@router.get("/", response_model=List[models.AdminNotificationResponse])
-def list_all(db: DbSession):
-    notifs = services.list_notifications(db)
-    return services.enrich(db, notifs)
 
-@router.get("/me", response_model=List[models.AdminNotificationResponse], dependencies=[])  # require_admin already global
-def my_notifications(current_user: CurrentUser, db: DbSession):
-    notifs = services.list_notifications_by_user(db, current_user.user_id)
-    return services.enrich(db, notifs)
+def _includes_message(include: str | None) -> bool:
+    return include is not None and "message" in {part.strip() for part in include.split(",")}
+
+
+@router.get("/", response_model=List[models.AdminNotificationResponse], response_model_exclude_unset=True)
+def list_all(
+    db: DbSession,
+    response: Response,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    status: str | None = None,
+    include: str | None = None,
+    cursor: str | None = None,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+):
+    notifs, next_cursor = services.list_notifications(
+        db, since=since, until=until, status=status, cursor=cursor, limit=limit,
+        include_message=_includes_message(include),
+    )
+    set_next_cursor(response, next_cursor)
+    return notifs
+
+@router.get("/me", response_model=List[models.AdminNotificationResponse], response_model_exclude_unset=True, dependencies=[])  # require_admin already global
+def my_notifications(
+    current_user: CurrentUser,
+    db: DbSession,
+    response: Response,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    status: str | None = None,
+    include: str | None = None,
+    cursor: str | None = None,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+):
+    notifs, next_cursor = services.list_notifications(
+        db, sent_to=current_user.user_id, since=since, until=until, status=status, cursor=cursor, limit=limit,
+        include_message=_includes_message(include),
+    )
+    set_next_cursor(response, next_cursor)
+    return notifs
+
+@router.get("/{notification_id}", response_model=models.AdminNotificationResponse)
+def get_notification(notification_id: int, db: DbSession):
+    return services.get_notification(db, notification_id)
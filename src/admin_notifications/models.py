@@ -8,7 +8,7 @@ class AdminNotificationResponse(BaseModel):
     sent_to: int
     sent_to_email: Optional[str] = None
     status: str
-    message: str
+    message: Optional[str] = None  # only with ?include=message
     error_message: Optional[str] = None
     sent_at: str
 
@@ -1,50 +1,98 @@
+from datetime import datetime
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
+from fastapi import HTTPException
+from typing import List, Tuple
 
 from src.entities.admin_notification import AdminNotification
+from src.entities.notification_event import NotificationEvent
 from src.entities.notification_status import NotificationStatus
 from src.entities.user import User
+from src.pagination import DEFAULT_PAGE_SIZE, seek, split_page
 from . import models
 
 
-def list_notifications(db: Session) -> List[AdminNotification]:
-    return db.query(AdminNotification).order_by(AdminNotification.sent_at.desc()).all()
+def _base_query(db: Session, include_message: bool):
+    # Deliveries carry only recipient and status; log ids and the body come from the event
+    columns = [
+        AdminNotification.id,
+        NotificationEvent.change_log_id,
+        NotificationEvent.user_change_log_id,
+        AdminNotification.sent_to,
+        User.email.label("sent_to_email"),
+        NotificationStatus.name.label("status_name"),
+        AdminNotification.error_message,
+        AdminNotification.sent_at,
+    ]
+    # The message body is the widest column; only read it when asked for
+    if include_message:
+        columns.append(NotificationEvent.message)
+    return (
+        db.query(*columns)
+        .join(NotificationEvent, NotificationEvent.id == AdminNotification.event_id)
+        .outerjoin(NotificationStatus, NotificationStatus.id == AdminNotification.status_id)
+        .outerjoin(User, User.id == AdminNotification.sent_to)
+    )
+
+
+def list_notifications(
+    db: Session,
+    sent_to: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    status: str | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    include_message: bool = False,
+) -> Tuple[List[models.AdminNotificationResponse], str | None]:
+    """One page of notifications, newest first, served by a single joined statement."""
+    query = _base_query(db, include_message)
+    if sent_to is not None:
+        query = query.filter(AdminNotification.sent_to == sent_to)
+    # Bounds on the partition key let Postgres prune monthly partitions
+    if since is not None:
+        query = query.filter(AdminNotification.sent_at >= since)
+    if until is not None:
+        query = query.filter(AdminNotification.sent_at < until)
+    if status is not None:
+        query = query.filter(NotificationStatus.name == status)
+    rows = seek(query, AdminNotification.sent_at, AdminNotification.id, cursor, limit).all()
+    rows, next_cursor = split_page(rows, limit, "sent_at")
+    return [_row_response(r, include_message) for r in rows], next_cursor
 
 
-def list_notifications_by_user(db: Session, user_id: int) -> List[AdminNotification]:
-    return db.query(AdminNotification).filter(AdminNotification.sent_to == user_id).order_by(AdminNotification.sent_at.desc()).all()
+def get_notification(db: Session, notification_id: int, include_message: bool = True) -> models.AdminNotificationResponse:
+    row = _base_query(db, include_message).filter(AdminNotification.id == notification_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    return _row_response(row, include_message)
+
 
 def to_response(db: Session, notif: AdminNotification) -> models.AdminNotificationResponse:
-    status = db.query(NotificationStatus).filter(NotificationStatus.id == notif.status_id).first()
-    user = db.query(User).filter(User.id == notif.sent_to).first()
-    return models.AdminNotificationResponse(
-        id=notif.id,
-        change_log_id=notif.change_log_id,
-        user_change_log_id=getattr(notif, 'user_change_log_id', None),
-        sent_to=notif.sent_to,
-        sent_to_email=user.email if user else None,
-        status=status.name if status else "UNKNOWN",
-        message=notif.message,
-        error_message=notif.error_message,
-        sent_at=str(notif.sent_at)
+    return get_notification(db, notif.id)
+
+
+def _row_response(row, include_message: bool) -> models.AdminNotificationResponse:
+    fields = dict(
+        id=row.id,
+        change_log_id=row.change_log_id,
+        user_change_log_id=row.user_change_log_id,
+        sent_to=row.sent_to,
+        sent_to_email=row.sent_to_email,
+        status=row.status_name or "UNKNOWN",
+        error_message=row.error_message,
+        sent_at=str(row.sent_at),
     )
+    # Leaving ``message`` unset drops it from the payload (exclude_unset)
+    if include_message:
+        fields["message"] = row.message
+    return models.AdminNotificationResponse(**fields)
 
 
-def enrich(db: Session, notifs: List[AdminNotification]) -> List[models.AdminNotificationResponse]:
-    status_ids = {n.status_id for n in notifs}
-    statuses = db.query(NotificationStatus).filter(NotificationStatus.id.in_(status_ids)).all() if status_ids else []
-    status_lookup = {s.id: s.name for s in statuses}
-    user_ids = {n.sent_to for n in notifs}
-    users = db.query(User).filter(User.id.in_(user_ids)).all() if user_ids else []
-    user_lookup = {u.id: u.email for u in users}
-    return [models.AdminNotificationResponse(
-        id=n.id,
-        change_log_id=n.change_log_id,
-        user_change_log_id=getattr(n, 'user_change_log_id', None),
-        sent_to=n.sent_to,
-        sent_to_email=user_lookup.get(n.sent_to),
-        status=status_lookup.get(n.status_id, "UNKNOWN"),
-        message=n.message,
-        error_message=n.error_message,
-        sent_at=str(n.sent_at)
-    ) for n in notifs]
+def count_by_status(db: Session, status_name: str) -> int:
+    return (
+        db.query(func.count(AdminNotification.id))
+        .join(NotificationStatus, NotificationStatus.id == AdminNotification.status_id)
+        .filter(NotificationStatus.name == status_name)
+        .scalar()
+    ) or 0
@@ -11,6 +11,8 @@ from src.product_views.controller import router as product_views_router
 from src.product_change_logs.controller import router as product_change_logs_router
 from src.admin_notifications.controller import router as admin_notifications_router
 from src.health.controller import router as health_router
+from src.metrics.controller import router as metrics_router
+from src.jobs.controller import router as jobs_router
 
 def register_routes(app: FastAPI):
     app.include_router(auth_router)
@@ -24,4 +26,6 @@ def register_routes(app: FastAPI):
     app.include_router(product_views_router)
     app.include_router(product_change_logs_router)
     app.include_router(admin_notifications_router)
-    app.include_router(health_router)
\ No newline at end of file
+    app.include_router(health_router)
+    app.include_router(metrics_router)
+    app.include_router(jobs_router)
\ No newline at end of file
@@ -9,6 +9,7 @@ from src.entities.user import User
 from . import models
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from ..exceptions import AuthenticationError
+from ..database.constraints import register_constraint_errors, translate_integrity_errors
 import logging
 import os
 from dotenv import load_dotenv
@@ -16,11 +17,17 @@ from src.user_sessions import services as session_service
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
 
+register_constraint_errors({"users_email_key": (400, "Email already in use")})
+
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl='auth/token')
+# For dependencies that decide per route whether a token is needed
+optional_oauth2_bearer = OAuth2PasswordBearer(tokenUrl='auth/token', auto_error=False)
 bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
 
@@ -35,7 +42,7 @@ def get_password_hash(password: str) -> str:
 def authenticate_user(email: str, password: str, db: Session) -> User | bool:
     user = db.query(User).filter(User.email == email).first()
     if not user or not verify_password(password, user.password):
-        logging.warning(f"Failed authentication attempt for email: {email}")
+        logger.warning("Failed authentication attempt for email: %s", email)
         return False
     return user
 
@@ -55,7 +62,7 @@ def verify_token(token: str) -> models.TokenData:
         user_id: int = payload.get('id')
         return models.TokenData(user_id=user_id)
     except PyJWTError as e:
-        logging.warning(f"Token verification failed: {str(e)}")
+        logger.warning("Token verification failed: %s", e)
         raise AuthenticationError()
 
 
@@ -68,9 +75,10 @@ def register_user(db: Session, register_user_request: models.RegisterUserRequest
             password=get_password_hash(register_user_request.password)
         )    
         db.add(create_user_model)
-        db.commit()
+        with translate_integrity_errors(db):
+            db.commit()
     except Exception as e:
-        logging.error(f"Failed to register user: {register_user_request.email}. Error: {str(e)}")
+        logger.error("Failed to register user: %s. Error: %s", register_user_request.email, e)
         raise
     
     
@@ -88,7 +96,7 @@ def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depen
     try:
         session_service.create_session(db, user.id, is_anonymous=False)
     except Exception as e:
-        logging.error(f"Failed to create user session for user {user.id}: {e}")
+        logger.error("Failed to create user session for user %s: %s", user.id, e)
     token = create_access_token(user.email, user.id, timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES)))
     return models.Token(access_token=token, token_type='bearer')
 
@@ -102,6 +110,6 @@ def anonymous_access_token(db: Session) -> models.Token:
     try:
         session_service.create_session(db, user.id, is_anonymous=True)
     except Exception as e:
-        logging.error(f"Failed to create anonymous session: {e}")
+        logger.error("Failed to create anonymous session: %s", e)
     token = create_access_token(user.email, user.id, timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES)))
     return models.Token(access_token=token, token_type='bearer')
@@ -1,27 +1,49 @@
 from fastapi import APIRouter, status, Depends
 from typing import List
+from ..auth.service import CurrentUser
 from ..database.core import DbSession
+from ..projections import parse_fields, projection_response
 from . import models, services
-from ..roles.services import require_admin
+from ..permissions.policy import FULL_ACCESS, route_permissions
 
-router = APIRouter(prefix="/brands", tags=["Brands"])
+# Reads stay public; changes need FULL_ACCESS
+router = APIRouter(prefix="/brands", tags=["Brands"], dependencies=[Depends(route_permissions({"GET": None}, default=FULL_ACCESS))])
 
 @router.get("/", response_model=List[models.BrandResponse])
-def list_brands(db: DbSession):
-    return services.list_brands(db)
+def list_brands(db: DbSession, fields: str | None = None):
+    projection = parse_fields(fields, models.BrandResponse, services.BRAND_PROJECTIONS)
+    brands = services.list_brands(db, fields=projection)
+    if projection:
+        return projection_response(models.BrandResponse, projection, brands)
+    return brands
+
+# Declared before /{brand_id} so "stats" is not parsed as an id
+@router.get("/stats", response_model=List[models.BrandStatsResponse])
+def list_brand_stats(db: DbSession):
+    """Brands with total/active product counts and min/max/avg price, for filter sidebars."""
+    return services.list_brand_stats(db)
 
 @router.get("/{brand_id}", response_model=models.BrandResponse)
-def get_brand(brand_id: int, db: DbSession):
-    return services.get_brand(db, brand_id)
+def get_brand(brand_id: int, db: DbSession, fields: str | None = None):
+    projection = parse_fields(fields, models.BrandResponse, services.BRAND_PROJECTIONS)
+    brand = services.get_brand(db, brand_id, fields=projection)
+    if projection:
+        return projection_response(models.BrandResponse, projection, brand, many=False)
+    return brand
 
-@router.post("/", response_model=models.BrandResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_admin)])
+@router.post("/", response_model=models.BrandResponse, status_code=status.HTTP_201_CREATED)
 def create_brand(brand_in: models.BrandCreate, db: DbSession):
     return services.create_brand(db, brand_in)
 
-@router.put("/{brand_id}", response_model=models.BrandResponse, dependencies=[Depends(require_admin)])
+@router.put("/{brand_id}", response_model=models.BrandResponse)
 def update_brand(brand_id: int, brand_in: models.BrandUpdate, db: DbSession):
     return services.update_brand(db, brand_id, brand_in)
 
-@router.delete("/{brand_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_admin)])
+@router.delete("/{brand_id}", status_code=status.HTTP_204_NO_CONTENT)
 def soft_delete_brand(brand_id: int, db: DbSession):
     services.soft_delete_brand(db, brand_id)
+
+@router.post("/{brand_id}/deactivate", response_model=models.BrandDeactivateResponse)
+def deactivate_brand(brand_id: int, db: DbSession, current_user: CurrentUser):
+    """Soft delete the brand and every active product of it; one grouped change notification."""
+    return services.deactivate_brand(db, brand_id, user_id=current_user.user_id)
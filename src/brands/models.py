@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from decimal import Decimal
+from typing import List, Optional
 
 class BrandBase(BaseModel):
     name: str
@@ -18,3 +19,20 @@ class BrandResponse(BrandBase):
     id: int
     class Config:
         from_attributes = True
+
+class BrandStatsResponse(BaseModel):
+    """Brand with the counts/prices of its products; price stats cover active products only."""
+    id: int
+    name: str
+    status: bool
+    total_products: int
+    active_products: int
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+    avg_price: Optional[Decimal] = None
+    class Config:
+        from_attributes = True
+
+class BrandDeactivateResponse(BaseModel):
+    brand_id: int
+    deactivated_products: List[int]
@@ -1,42 +1,75 @@
+from typing import List, Tuple
+from sqlalchemy import case, func, update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from . import models
 from src.entities.brand import Brand
+from src.entities.product import Product
+from ..database.constraints import register_constraint_errors, translate_integrity_errors
+from ..projections import SUMMARY, columns
+from ..products import services as product_services
 
+BRAND_PROJECTIONS = {SUMMARY: ("id", "name")}
 
-def list_brands(db: Session):
+register_constraint_errors({"brands_name_key": (400, "Brand name already exists")})
+
+
+def list_brands(db: Session, fields: Tuple[str, ...] | None = None):
+    if fields:
+        return db.query(*columns(Brand, fields)).all()
     return db.query(Brand).all()
 
 
-def get_brand(db: Session, brand_id: int) -> Brand:
-    brand = db.query(Brand).filter(Brand.id == brand_id).first()
+def list_brand_stats(db: Session) -> List[models.BrandStatsResponse]:
+    """Every brand with its product counts and active-product price stats, in one ``GROUP BY`` query."""
+    active_price = case((Product.status == True, Product.price))  # noqa: E712
+    rows = (
+        db.query(
+            Brand.id,
+            Brand.name,
+            Brand.status,
+            func.count(Product.id).label("total_products"),
+            func.count(active_price).label("active_products"),
+            func.min(active_price).label("min_price"),
+            func.max(active_price).label("max_price"),
+            func.round(func.avg(active_price), 2).label("avg_price"),
+        )
+        .outerjoin(Product, Product.brand_id == Brand.id)
+        .group_by(Brand.id, Brand.name, Brand.status)
+        .order_by(Brand.id)
+        .all()
+    )
+    return [models.BrandStatsResponse.model_validate(row) for row in rows]
+
+
+def get_brand(db: Session, brand_id: int, fields: Tuple[str, ...] | None = None) -> Brand:
+    query = db.query(*columns(Brand, fields)) if fields else db.query(Brand)
+    brand = query.filter(Brand.id == brand_id).first()
     if not brand:
         raise HTTPException(status_code=404, detail="Brand not found")
     return brand
 
 
 def create_brand(db: Session, brand_in: models.BrandCreate) -> Brand:
-    exists = db.query(Brand).filter(Brand.name == brand_in.name).first()
-    if exists:
-        raise HTTPException(status_code=400, detail="Brand name already exists")
     brand = Brand(name=brand_in.name, description=brand_in.description, status=brand_in.status)
     db.add(brand)
-    db.commit(); db.refresh(brand)
+    with translate_integrity_errors(db):
+        db.commit()
+    db.refresh(brand)
     return brand
 
 
 def update_brand(db: Session, brand_id: int, brand_in: models.BrandUpdate) -> Brand:
     brand = get_brand(db, brand_id)
-    if brand_in.name is not None and brand_in.name != brand.name:
-        exists = db.query(Brand).filter(Brand.name == brand_in.name).first()
-        if exists:
-            raise HTTPException(status_code=400, detail="Brand name already exists")
+    if brand_in.name is not None:
         brand.name = brand_in.name
     if brand_in.description is not None:
         brand.description = brand_in.description
     if brand_in.status is not None:
         brand.status = brand_in.status
-    db.commit(); db.refresh(brand)
+    with translate_integrity_errors(db):
+        db.commit()
+    db.refresh(brand)
     return brand
 
 
@@ -44,3 +77,17 @@ def soft_delete_brand(db: Session, brand_id: int) -> None:
     brand = get_brand(db, brand_id)
     brand.status = False
     db.commit()
+
+
+def deactivate_brand(db: Session, brand_id: int, user_id: int) -> models.BrandDeactivateResponse:
+    """Deactivate a brand and all its active products in one transaction (two set-based UPDATEs)."""
+    brand = db.execute(
+        update(Brand).where(Brand.id == brand_id).values(status=False).returning(Brand.id, Brand.name)
+    ).first()
+    if brand is None:
+        raise HTTPException(status_code=404, detail="Brand not found")
+    product_ids = product_services.set_status_where(
+        db, Product.brand_id == brand_id, False, user_id,
+        note=f"Brand '{brand.name}' (ID {brand.id}) deactivated with its products.",
+    )
+    return models.BrandDeactivateResponse(brand_id=brand.id, deactivated_products=product_ids)
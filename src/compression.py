@@ -0,0 +1,234 @@
+"""Response compression negotiated through ``Accept-Encoding``.
+
+Supported codings, in order of preference: ``br`` (when the ``brotli``
+package is installed), ``zstd`` (when ``zstandard`` is installed) and
+``gzip`` (always). Only complete, compressible bodies of at least
+``COMPRESSION_MIN_SIZE`` bytes are compressed; streaming responses
+(``more_body``), event streams and already encoded bodies pass through.
+
+Bodies of ``COMPRESSION_THREAD_MIN_SIZE`` bytes or more are compressed in a
+worker thread so the event loop keeps serving other requests. Compressed
+bytes are kept in a small LRU keyed by coding and body digest, so a hot
+response (e.g. the same product listing served to every anonymous visitor)
+is compressed once rather than per request.
+
+A strong ``ETag`` gets the coding appended (``"3"`` -> ``"3-gzip"``) on the
+compressed body, since the encoded bytes are a different representation;
+``src/concurrency.py`` reads either form as version 3.
+
+Environment variables:
+    COMPRESSION_MIN_SIZE (default 1024)
+    COMPRESSION_THREAD_MIN_SIZE (default 65536)
+    COMPRESSION_GZIP_LEVEL (default 6)
+    COMPRESSION_BROTLI_QUALITY (default 4)
+    COMPRESSION_ZSTD_LEVEL (default 3)
+    COMPRESSION_CACHE_ENTRIES (default 256, 0 disables the cache)
+    COMPRESSION_CACHE_MAX_BODY (default 1048576) -- larger bodies are not cached
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", "65536"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+COMPRESSION_CACHE_ENTRIES = int(os.getenv("COMPRESSION_CACHE_ENTRIES", "256"))
+COMPRESSION_CACHE_MAX_BODY = int(os.getenv("COMPRESSION_CACHE_MAX_BODY", "1048576"))
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+# Event streams must reach the client as they are written
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+def _gzip(body: bytes) -> bytes:
+    # mtime=0 keeps the output deterministic for identical bodies
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    encoders: Dict[str, Callable[[bytes], bytes]] = {}
+    if brotli is not None:
+        encoders["br"] = lambda body: brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    if zstandard is not None:
+        encoders["zstd"] = lambda body: zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(body)
+    encoders["gzip"] = _gzip
+    return encoders
+
+
+ENCODERS = _encoders()
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for item in header.split(","):
+        parts = [p.strip() for p in item.split(";")]
+        coding = parts[0].lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header: str | None) -> str | None:
+    """Best supported coding the client accepts (server preference breaks ties)."""
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in ENCODERS:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressedCache:
+    """LRU of compressed bodies keyed by (coding, body digest)."""
+
+    def __init__(self, max_entries: int = COMPRESSION_CACHE_ENTRIES, max_body: int = COMPRESSION_CACHE_MAX_BODY):
+        self.max_entries = max_entries
+        self.max_body = max_body
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def compress(self, coding: str, body: bytes) -> bytes:
+        if self.max_entries <= 0 or len(body) > self.max_body:
+            return ENCODERS[coding](body)
+        key = (coding, hashlib.blake2b(body, digest_size=16).digest())
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        compressed = ENCODERS[coding](body)
+        with self._lock:
+            self._entries[key] = compressed
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+cache = CompressedCache()
+
+
+def coded_etag(etag: str, coding: str) -> str:
+    """Strong validator of the ``coding`` representation; weak ones already cover every encoding."""
+    if etag.startswith('"') and etag.endswith('"'):
+        return f'{etag[:-1]}-{coding}"'
+    return etag
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    if content_type.startswith(UNCOMPRESSED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _revalidated_etag(start: Message, if_none_match: str | None, coding: str) -> None:
+    """A 304 carries the validator the client sent: the compressed one when it holds that representation."""
+    headers = MutableHeaders(scope=start)
+    etag = headers.get("etag")
+    if etag and if_none_match and coded_etag(etag, coding) in (tag.strip() for tag in if_none_match.split(",")):
+        headers["ETag"] = coded_etag(etag, coding)
+
+
+class CompressionMiddleware:
+    """Compresses single-message response bodies when the client accepts it and it is worthwhile."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        coding = choose_encoding(request_headers.get("accept-encoding"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if message["status"] == 304:
+                    _revalidated_etag(message, request_headers.get("if-none-match"), coding)
+                if _compressible(Headers(raw=message["headers"])) and message["status"] not in (204, 304):
+                    start = message
+                    return
+                passthrough = True
+                await send(message)
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            if message.get("more_body", False):
+                # Streaming response: send as is
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start)
+            headers.add_vary_header("Accept-Encoding")
+            if len(body) >= COMPRESSION_MIN_SIZE:
+                if len(body) >= COMPRESSION_THREAD_MIN_SIZE:
+                    body = await anyio.to_thread.run_sync(cache.compress, coding, body)
+                else:
+                    body = cache.compress(coding, body)
+                headers["Content-Encoding"] = coding
+                if "etag" in headers:
+                    headers["ETag"] = coded_etag(headers["etag"], coding)
+                headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
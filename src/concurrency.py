@@ -0,0 +1,64 @@
+"""Optimistic concurrency for versioned entities (``version_id_col``).
+
+Every UPDATE of a versioned row is issued as
+``UPDATE ... WHERE id = :id AND version = :version_read`` and bumps the
+version, so a write based on a stale read matches no row and SQLAlchemy
+raises ``StaleDataError``; ``commit_or_conflict`` turns that into a 412.
+No row locks are taken.
+
+The version is exposed as a strong ``ETag`` (``"3"``). Clients send it back
+in ``If-Match`` on PUT/DELETE to fail fast with 412 when their copy is out of
+date, and in ``If-None-Match`` on GET to get a 304 when it is still current.
+Compressed responses carry ``"3-gzip"`` (see ``src/compression.py``), which
+names the same version.
+"""
+
+from typing import List
+from fastapi import Response
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from src.exceptions import PreconditionFailedError
+
+
+def etag_for(version: int) -> str:
+    return f'"{version}"'
+
+
+def _entity_tags(header: str) -> List[str]:
+    """Tags as ``"<version>"``: weak and coding-suffixed (``"3-gzip"``) validators name the version too."""
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag.startswith('"') and "-" in tag:
+            tag = tag.split("-", 1)[0] + '"'
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+def check_if_match(if_match: str | None, version: int) -> None:
+    if if_match is None:
+        return
+    tags = _entity_tags(if_match)
+    if "*" not in tags and etag_for(version) not in tags:
+        raise PreconditionFailedError()
+
+
+def is_not_modified(if_none_match: str | None, version: int) -> bool:
+    if if_none_match is None:
+        return False
+    tags = _entity_tags(if_none_match)
+    return "*" in tags or etag_for(version) in tags
+
+
+def set_etag(response: Response, version: int) -> None:
+    response.headers["ETag"] = etag_for(version)
+
+
+def commit_or_conflict(db: Session) -> None:
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise PreconditionFailedError()
@@ -0,0 +1,83 @@
+"""Map database constraint violations to API errors.
+
+Writes insert/update directly and let the database enforce uniqueness and
+foreign keys instead of running a SELECT per rule first (extra round trips,
+and racy: two requests can both pass the check). Each services module
+registers the error for the constraints it owns:
+
+    register_constraint_errors({
+        "products_sku_key": (400, "Product SKU already exists"),
+        "products_brand_id_fkey": (404, "Brand not found"),
+    })
+
+and wraps the flush/commit in ``translate_integrity_errors(db)``.
+
+Constraint names follow ``NAMING_CONVENTION`` (the PostgreSQL defaults, so
+databases created before the convention was set have the same names).
+PostgreSQL reports the violated constraint by name; SQLite reports the
+columns of a UNIQUE violation, which are mapped to the same name, but not
+which FOREIGN KEY failed, so callers pass a ``resolve`` callback that finds
+the missing parent on that (rare) path.
+"""
+
+import re
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Tuple
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+NAMING_CONVENTION = {
+    "ix": "ix_%(column_0_label)s",
+    "uq": "%(table_name)s_%(column_0_name)s_key",
+    "fk": "%(table_name)s_%(column_0_name)s_fkey",
+    "pk": "%(table_name)s_pkey",
+}
+
+_SQLITE_UNIQUE = re.compile(r"UNIQUE constraint failed: (?P<table>\w+)\.(?P<column>\w+)")
+
+CONSTRAINT_ERRORS: Dict[str, Tuple[int, str]] = {}
+
+
+def register_constraint_errors(errors: Dict[str, Tuple[int, str]]) -> None:
+    CONSTRAINT_ERRORS.update(errors)
+
+
+def enable_sqlite_foreign_keys(engine: Engine) -> None:
+    """SQLite only enforces foreign keys when asked to, per connection."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def constraint_name(error: IntegrityError) -> str | None:
+    diag = getattr(error.orig, "diag", None)
+    if diag is not None and getattr(diag, "constraint_name", None):
+        return diag.constraint_name
+    match = _SQLITE_UNIQUE.search(str(error.orig))
+    if match:
+        return f"{match['table']}_{match['column']}_key"
+    return None
+
+
+@contextmanager
+def translate_integrity_errors(db: Session, resolve: Callable[[], None] | None = None) -> Iterator[None]:
+    """Turn registered constraint violations raised inside the block into ``HTTPException``."""
+    try:
+        yield
+    except IntegrityError as e:
+        db.rollback()
+        name = constraint_name(e)
+        if name in CONSTRAINT_ERRORS:
+            status_code, detail = CONSTRAINT_ERRORS[name]
+            raise HTTPException(status_code=status_code, detail=detail) from e
+        if resolve is not None:
+            resolve()
+        raise
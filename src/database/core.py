@@ -1,19 +1,23 @@
 from typing import Annotated
 from fastapi import Depends
-from sqlalchemy import create_engine
+from sqlalchemy import MetaData, create_engine
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 import os
 from dotenv import load_dotenv
+from .constraints import NAMING_CONVENTION, enable_sqlite_foreign_keys
+from .instrumentation import instrument_engine
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 engine = create_engine(DATABASE_URL)
+instrument_engine(engine)
+enable_sqlite_foreign_keys(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+Base = declarative_base(metadata=MetaData(naming_convention=NAMING_CONVENTION))
 
 def get_db():
     db = SessionLocal()
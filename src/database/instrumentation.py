@@ -0,0 +1,159 @@
+"""Per-request SQL instrumentation and query budgets.
+
+``instrument_engine`` hooks ``before_cursor_execute`` / ``after_cursor_execute``
+on an engine. While a request is in flight, ``QueryInstrumentationMiddleware``
+keeps a ``QueryStats`` object in a contextvar; every statement executed on
+behalf of the request (including sync endpoints running in the threadpool,
+which inherit the context) adds to its count and DB time.
+
+Each response gets a ``Server-Timing`` header, e.g.
+    Server-Timing: db;dur=4.2;desc="7 queries", app;dur=11.9
+
+Environment variables:
+    QUERY_BUDGET_DEFAULT   max statements per request for routes without an explicit budget
+    QUERY_BUDGETS          per-route budgets: "GET /products/=5,PUT /products/{product_id}=40"
+    QUERY_BUDGET_MODE      log (default) | raise  -- raise makes tests/CI fail on regressions
+"""
+
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_MODE_LOG = "log"
+QUERY_BUDGET_MODE_RAISE = "raise"
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0  # seconds spent in cursor.execute
+    # (statement, seconds) pairs, only collected when ``capture`` is set
+    capture: bool = False
+    statements: List[Tuple[str, float]] = field(default_factory=list)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+_request_stats: ContextVar[QueryStats | None] = ContextVar("request_query_stats", default=None)
+
+
+def current_stats() -> QueryStats | None:
+    return _request_stats.get()
+
+
+def _parse_budgets(raw: str | None) -> Dict[str, int]:
+    budgets: Dict[str, int] = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        route, limit = item.rsplit("=", 1)
+        budgets[" ".join(route.split())] = int(limit)
+    return budgets
+
+
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT")) if os.getenv("QUERY_BUDGET_DEFAULT") else None
+QUERY_BUDGETS = _parse_budgets(os.getenv("QUERY_BUDGETS"))
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", QUERY_BUDGET_MODE_LOG).lower()
+
+
+def budget_for(method: str, path: str) -> int | None:
+    return QUERY_BUDGETS.get(f"{method} {path}", QUERY_BUDGET_DEFAULT)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_stats.get() is not None:
+        context._query_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    started = getattr(context, "_query_started_at", None)
+    if stats is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.count += 1
+    stats.duration += elapsed
+    if stats.capture:
+        stats.statements.append((statement, elapsed))
+
+
+def instrument_engine(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_path(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "")
+
+
+class QueryInstrumentationMiddleware:
+    """Counts statements per request, adds ``Server-Timing`` and enforces budgets."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                self._check_budget(scope, stats)
+                app_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", app;dur={app_ms:.1f}',
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "%s %s -> %d: %d queries in %.1fms",
+                    scope["method"], _route_path(scope), status_code, stats.count, stats.duration * 1000,
+                    extra={
+                        "http_method": scope["method"],
+                        "route": _route_path(scope),
+                        "status_code": status_code,
+                        "db_queries": stats.count,
+                        "db_time_ms": round(stats.duration * 1000, 2),
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    },
+                )
+
+    @staticmethod
+    def _check_budget(scope: Scope, stats: QueryStats) -> None:
+        path = _route_path(scope)
+        budget = budget_for(scope["method"], path)
+        if budget is None or stats.count <= budget:
+            return
+        message = f"{scope['method']} {path} issued {stats.count} SQL statements (budget {budget})"
+        if QUERY_BUDGET_MODE == QUERY_BUDGET_MODE_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message, extra={"route": path, "db_queries": stats.count, "query_budget": budget})
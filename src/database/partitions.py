@@ -0,0 +1,191 @@
+"""Monthly range partitioning for the append-only audit tables (PostgreSQL only).
+
+Partitioned tables:
+    product_change_logs  -> changed_at
+    user_change_logs     -> changed_at
+    admin_notifications  -> sent_at
+
+When enabled, the parent tables are created with ``PARTITION BY RANGE`` and one
+child table per month (``<table>_pYYYYMM``) plus a DEFAULT partition as a
+safety net. Old months can be detached and archived to gzip CSV files.
+
+Maintenance (run from cron / a scheduled job):
+    python -m src.database.partitions --months-ahead 3 --retain-months 12 --archive-dir ./archive
+
+Environment variables:
+    ENABLE_LOG_PARTITIONING=true|false
+    PARTITION_MONTHS_AHEAD (default 3)
+    PARTITION_RETAIN_MONTHS (default 12)
+    PARTITION_ARCHIVE_DIR (optional)
+
+Note: partitioning is applied when the tables are created; existing
+non-partitioned tables are not converted automatically.
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES: Dict[str, str] = {
+    "product_change_logs": "changed_at",
+    "user_change_logs": "changed_at",
+    "admin_notifications": "sent_at",
+}
+
+PARTITIONING_ENABLED = (
+    os.getenv("ENABLE_LOG_PARTITIONING", "false").lower() == "true"
+    and (os.getenv("DATABASE_URL") or "").startswith("postgresql")
+)
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_RETAIN_MONTHS = int(os.getenv("PARTITION_RETAIN_MONTHS", "12"))
+PARTITION_ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR")
+
+_PARTITION_NAME = re.compile(r"^(?P<table>.+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def partitioned_table_args(column: str) -> dict:
+    """``__table_args__`` for an entity partitioned by ``column`` (empty when disabled)."""
+    if not PARTITIONING_ENABLED:
+        return {}
+    return {"postgresql_partition_by": f"RANGE ({column})"}
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + (day.month - 1) + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def month_bounds(day: date) -> Tuple[date, date]:
+    start = date(day.year, day.month, 1)
+    return start, add_months(start, 1)
+
+
+def partition_name(table: str, month_start: date) -> str:
+    return f"{table}_p{month_start:%Y%m}"
+
+
+def parse_partition_month(name: str) -> date | None:
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return date(int(match["year"]), int(match["month"]), 1)
+
+
+def months_to_create(today: date, months_ahead: int) -> List[date]:
+    """Current month plus ``months_ahead`` future months (first day of each)."""
+    current, _ = month_bounds(today)
+    return [add_months(current, i) for i in range(months_ahead + 1)]
+
+
+def expired_partitions(names: List[str], today: date, retain_months: int) -> List[str]:
+    """Partitions whose whole month is older than the retention window."""
+    cutoff = add_months(month_bounds(today)[0], -retain_months)
+    expired = []
+    for name in names:
+        month = parse_partition_month(name)
+        if month is not None and month < cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+def list_partitions(engine: Engine, table: str) -> List[str]:
+    query = text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :parent"
+    )
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(query, {"parent": table})]
+
+
+def ensure_partitions(engine: Engine, months_ahead: int = PARTITION_MONTHS_AHEAD, today: date | None = None) -> List[str]:
+    """Create missing monthly partitions (and the DEFAULT partition) for every table."""
+    today = today or datetime.now().date()
+    created: List[str] = []
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT'))
+            for month in months_to_create(today, months_ahead):
+                start, end = month_bounds(month)
+                name = partition_name(table, start)
+                conn.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+                created.append(name)
+    return created
+
+
+def _archive_partition(engine: Engine, name: str, archive_dir: str) -> str:
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    raw = engine.raw_connection()
+    try:
+        with gzip.open(path, "wb") as fh:
+            cursor = raw.cursor()
+            cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', fh)
+            cursor.close()
+        raw.commit()
+    finally:
+        raw.close()
+    return path
+
+
+def detach_expired_partitions(engine: Engine, retain_months: int = PARTITION_RETAIN_MONTHS, archive_dir: str | None = PARTITION_ARCHIVE_DIR, today: date | None = None) -> List[str]:
+    """Detach partitions older than ``retain_months``.
+
+    With ``archive_dir`` the detached partition is exported to
+    ``<archive_dir>/<partition>.csv.gz`` and dropped; otherwise it is left as a
+    standalone table.
+    """
+    today = today or datetime.now().date()
+    detached: List[str] = []
+    for table in PARTITIONED_TABLES:
+        for name in expired_partitions(list_partitions(engine, table), today, retain_months):
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            if archive_dir:
+                path = _archive_partition(engine, name, archive_dir)
+                with engine.begin() as conn:
+                    conn.execute(text(f'DROP TABLE "{name}"'))
+                logger.info("Archived partition %s to %s", name, path)
+            else:
+                logger.info("Detached partition %s", name)
+            detached.append(name)
+    return detached
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain monthly partitions of the audit tables")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    parser.add_argument("--retain-months", type=int, default=PARTITION_RETAIN_MONTHS)
+    parser.add_argument("--archive-dir", default=PARTITION_ARCHIVE_DIR)
+    parser.add_argument("--skip-detach", action="store_true", help="Only create future partitions")
+    args = parser.parse_args(argv)
+
+    from .core import engine
+
+    if engine.dialect.name != "postgresql":
+        parser.error("Partitioning is only supported on PostgreSQL")
+    created = ensure_partitions(engine, args.months_ahead)
+    logger.info("Ensured %d partitions", len(created))
+    if not args.skip_detach:
+        detached = detach_expired_partitions(engine, args.retain_months, args.archive_dir)
+        logger.info("Detached %d partitions", len(detached))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,24 +1,29 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, func
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Index, func
 from sqlalchemy.orm import relationship
 
 from ..database.core import Base 
+from ..database.partitions import PARTITIONING_ENABLED, partitioned_table_args
 
 
 class AdminNotification(Base):
+    """Delivery of a ``NotificationEvent`` to one admin; the message lives on the event."""
     __tablename__ = 'admin_notifications'
+    __table_args__ = (
+        # Keyset pagination seeks on (sent_at, id)
+        Index("ix_admin_notifications_sent_at_id", "sent_at", "id"),
+        Index("ix_admin_notifications_sent_to_sent_at", "sent_to", "sent_at"),
+        partitioned_table_args("sent_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    # For product change notifications
-    change_log_id = Column(Integer, ForeignKey("product_change_logs.id"), nullable=True)
-    # For user change notifications
-    user_change_log_id = Column(Integer, ForeignKey("user_change_logs.id"), nullable=True)
+    # Status transitions are one UPDATE ... WHERE event_id = ?
+    event_id = Column(Integer, ForeignKey("notification_events.id"), nullable=False, index=True)
     sent_to = Column(Integer, ForeignKey("users.id"), nullable=False)
-    sent_at = Column(DateTime, nullable=False, server_default=func.now())
-    status_id = Column(Integer, ForeignKey("notification_status.id"), nullable=False)
-    message = Column(Text, nullable=False)
+    # Partition key must be part of the primary key on partitioned tables
+    sent_at = Column(DateTime, nullable=False, server_default=func.now(), primary_key=PARTITIONING_ENABLED)
+    status_id = Column(Integer, ForeignKey("notification_status.id"), nullable=False, index=True)
     error_message = Column(Text, nullable=True)
 
-    change_log = relationship("ProductChangeLog", back_populates="admin_notifications")
-    user_change_log = relationship("UserChangeLog", back_populates="admin_notifications")
+    event = relationship("NotificationEvent", back_populates="deliveries")
     sent_to_user = relationship("User", foreign_keys=[sent_to])
-    status = relationship("NotificationStatus")
\ No newline at end of file
+    status = relationship("NotificationStatus")
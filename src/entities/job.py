@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, JSON, Text, func
+
+from ..database.core import Base
+
+
+class Job(Base):
+    """A unit of background work; the table is the queue (see src/jobs)."""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Workers claim the oldest queued job
+        Index("ix_jobs_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(100), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")
+    payload = Column(JSON, nullable=False, default=dict)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(100), nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Refreshed on every progress report; a stale running job is requeued
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}')>"
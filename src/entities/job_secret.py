@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, ForeignKey, JSON
+
+from ..database.core import Base
+
+
+class JobSecret(Base):
+    """Secret part of a job's payload (e.g. plaintext passwords), kept out of ``jobs.payload``.
+
+    Deleted in the transaction that claims the job, or when the queued job is cancelled.
+    """
+    __tablename__ = 'job_secrets'
+
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True)
+    payload = Column(JSON, nullable=False)
+
+    def __repr__(self):
+        return f"<JobSecret(job_id={self.job_id})>"
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, DateTime
+
+from ..database.core import Base
+
+
+class NotificationDigestEntry(Base):
+    """A change log waiting for the next digest email (see src/notifications/digest.py)."""
+    __tablename__ = 'notification_digest_entries'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Plain ids, not foreign keys: the rows only live until the next digest
+    change_log_id = Column(Integer, nullable=True)
+    user_change_log_id = Column(Integer, nullable=True)
+    # Naive UTC, set by the writer so the window is judged on one clock
+    created_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<NotificationDigestEntry(id={self.id}, change_log_id={self.change_log_id}, user_change_log_id={self.user_change_log_id})>"
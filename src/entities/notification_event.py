@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, func
+from sqlalchemy.orm import relationship
+
+from ..database.core import Base 
+from ..database.partitions import PARTITIONING_ENABLED
+
+
+def _log_fk(target: str) -> tuple:
+    # Partitioned change log tables have no unique constraint on id alone,
+    # so they cannot be referenced by a foreign key.
+    return () if PARTITIONING_ENABLED else (ForeignKey(target),)
+
+
+class NotificationEvent(Base):
+    """One notification email: subject and body are stored once, deliveries point here."""
+    __tablename__ = 'notification_events'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # For product change notifications
+    change_log_id = Column(Integer, *_log_fk("product_change_logs.id"), nullable=True)
+    # For user change notifications
+    user_change_log_id = Column(Integer, *_log_fk("user_change_logs.id"), nullable=True)
+    subject = Column(Text, nullable=False)
+    message = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    change_log = relationship("ProductChangeLog",
+                              primaryjoin="foreign(NotificationEvent.change_log_id) == ProductChangeLog.id",
+                              back_populates="notification_events")
+    user_change_log = relationship("UserChangeLog",
+                                   primaryjoin="foreign(NotificationEvent.user_change_log_id) == UserChangeLog.id",
+                                   back_populates="notification_events")
+    deliveries = relationship("AdminNotification", back_populates="event")
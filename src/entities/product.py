@@ -8,13 +8,17 @@ class Product(Base):
 
     id = Column(Integer,primary_key=True, autoincrement=True)
     sku = Column(String(100), unique=True, nullable=False)
-    name = Column(String(100), nullable=False)
+    name = Column(String(100), unique=True, nullable=False)
     description = Column(String, nullable=True)
     price = Column(Numeric(10, 2), nullable=False)
-    brand_id = Column(Integer, ForeignKey("brands.id"), nullable=False)
+    brand_id = Column(Integer, ForeignKey("brands.id"), nullable=False, index=True)
     status = Column(Boolean, default=True, nullable=False)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
+    # Optimistic concurrency: bumped on every UPDATE, see src/concurrency.py
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     brand = relationship("Brand", back_populates="products")
     creator = relationship("User", back_populates="products")
@@ -1,11 +1,18 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, func
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Index, func
 from sqlalchemy.orm import relationship
 
 from ..database.core import Base 
+from ..database.partitions import PARTITIONING_ENABLED, partitioned_table_args
 
 
 class ProductChangeLog(Base):
     __tablename__ = 'product_change_logs'
+    __table_args__ = (
+        # Keyset pagination seeks on (changed_at, id)
+        Index("ix_product_change_logs_changed_at_id", "changed_at", "id"),
+        Index("ix_product_change_logs_product_id_changed_at", "product_id", "changed_at"),
+        partitioned_table_args("changed_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -14,9 +21,12 @@ class ProductChangeLog(Base):
     field_changed = Column(Text, nullable=False)
     old_value = Column(Text, nullable=True)
     new_value = Column(Text, nullable=True)
-    changed_at = Column(DateTime, nullable=False, server_default=func.now())
+    # Partition key must be part of the primary key on partitioned tables
+    changed_at = Column(DateTime, nullable=False, server_default=func.now(), primary_key=PARTITIONING_ENABLED)
 
     product = relationship("Product", back_populates="change_logs")
     changed_by_user = relationship("User")
     action = relationship("ActionStatus", back_populates="product_changes")
-    admin_notifications = relationship("AdminNotification", back_populates="change_log")
\ No newline at end of file
+    notification_events = relationship("NotificationEvent",
+                                       primaryjoin="ProductChangeLog.id == foreign(NotificationEvent.change_log_id)",
+                                       back_populates="change_log")
\ No newline at end of file
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime, ForeignKey, Index
+
+from ..database.core import Base 
+
+
+class ProductViewHourly(Base):
+    __tablename__ = 'product_view_hourly'
+    __table_args__ = (
+        # Window aggregation scans only the buckets inside the window
+        Index("ix_product_view_hourly_bucket_start", "bucket_start"),
+    )
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    view_count = Column(BigInteger, nullable=False, default=0)
+
+
+class ProductViewDaily(Base):
+    __tablename__ = 'product_view_daily'
+    __table_args__ = (
+        Index("ix_product_view_daily_bucket_start", "bucket_start"),
+    )
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    view_count = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey
+
+from ..database.core import Base 
+
+
+class ProductViewTop(Base):
+    """Precomputed top-N products per window (``1h``, ``24h``, ``7d``, ``30d``)."""
+    __tablename__ = 'product_view_top'
+
+    window = Column(String(10), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    view_count = Column(BigInteger, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index, func
 from sqlalchemy.orm import relationship
 
 from ..database.core import Base 
 
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Directory keyset pagination seeks on (created_at, id)
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer,primary_key=True, autoincrement=True)
     email = Column(String(255), unique=True, nullable=False)
@@ -13,6 +17,10 @@ class User(Base):
     password = Column(String(255), nullable=False)
     status = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
+    # Optimistic concurrency: bumped on every UPDATE, see src/concurrency.py
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     sessions = relationship("UserSession", back_populates="user")
     change_logs = relationship("UserChangeLog", 
@@ -24,4 +32,18 @@ class User(Base):
     products = relationship("Product", back_populates="creator")
     
     def __repr__(self):
-        return f"<User(email='{self.email}', first_name='{self.first_name}', last_name='{self.last_name}')>"
\ No newline at end of file
+        return f"<User(email='{self.email}', first_name='{self.first_name}', last_name='{self.last_name}')>"
+
+
+def _prefix_search_index(column) -> Index:
+    """Index on ``lower(column)`` for case-insensitive ``LIKE 'abc%'`` searches.
+
+    ``text_pattern_ops`` lets Postgres use it for LIKE under any collation.
+    """
+    label = f"{column.key}_lower"
+    return Index(f"ix_users_{label}", func.lower(column).label(label), postgresql_ops={label: "text_pattern_ops"})
+
+
+_prefix_search_index(User.email)
+_prefix_search_index(User.first_name)
+_prefix_search_index(User.last_name)
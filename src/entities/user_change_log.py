@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, func
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Index, func
 from sqlalchemy.orm import relationship
 
 from ..database.core import Base 
+from ..database.partitions import PARTITIONING_ENABLED, partitioned_table_args
 
 class UserChangeLog(Base):
     __tablename__ = 'user_change_logs'
+    __table_args__ = (
+        # Keyset pagination seeks on (changed_at, id)
+        Index("ix_user_change_logs_changed_at_id", "changed_at", "id"),
+        Index("ix_user_change_logs_user_id_changed_at", "user_id", "changed_at"),
+        partitioned_table_args("changed_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -13,9 +20,12 @@ class UserChangeLog(Base):
     field_changed = Column(Text, nullable=False)
     old_value = Column(Text, nullable=True)
     new_value = Column(Text, nullable=True)
-    changed_at = Column(DateTime, nullable=False, server_default=func.now())
+    # Partition key must be part of the primary key on partitioned tables
+    changed_at = Column(DateTime, nullable=False, server_default=func.now(), primary_key=PARTITIONING_ENABLED)
 
     user = relationship("User", foreign_keys=[user_id], back_populates="change_logs")
     changed_by_user = relationship("User", foreign_keys=[changed_by], back_populates="changes_made")
     action = relationship("ActionStatus", back_populates="user_changes")
-    admin_notifications = relationship("AdminNotification", back_populates="user_change_log")
\ No newline at end of file
+    notification_events = relationship("NotificationEvent",
+                                       primaryjoin="UserChangeLog.id == foreign(NotificationEvent.user_change_log_id)",
+                                       back_populates="user_change_log")
\ No newline at end of file
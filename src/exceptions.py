@@ -20,3 +20,7 @@ class InvalidPasswordError(UserError):
 class AuthenticationError(HTTPException):
     def __init__(self, message: str = "Could not validate user"):
         super().__init__(status_code=401, detail=message)
+
+class PreconditionFailedError(HTTPException):
+    def __init__(self, message: str = "Resource was modified by another request; fetch it again"):
+        super().__init__(status_code=412, detail=message)
@@ -1,7 +1,21 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from ..database.core import DbSession
+from . import services
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
 @router.get("", summary="Health Check", description="Check if the service is active")
 def healt_check():
-    return {"message": "Service is active"}
\ No newline at end of file
+    return {"message": "Service is active"}
+
+
+@router.get("/live", summary="Liveness probe", description="The process is up and serving requests (no dependency checks)")
+def liveness():
+    return {"status": services.STATUS_OK}
+
+
+@router.get("/ready", summary="Readiness probe", description="Database, connection pool and backlog checks; 503 when the service should not receive traffic")
+def readiness(db: DbSession):
+    body, status_code = services.readiness(db)
+    return JSONResponse(content=body, status_code=status_code)
@@ -0,0 +1,137 @@
+"""Liveness / readiness checks.
+
+Readiness runs a cheap ``SELECT 1`` (bounded by a statement timeout on
+Postgres), reports pool saturation and the notification backlog, and caches
+the result for ``HEALTH_CACHE_SECONDS`` so probe storms from load balancers
+don't turn into database load.
+
+Environment variables:
+    HEALTH_CACHE_SECONDS (default 2)
+    HEALTH_DB_TIMEOUT_MS (default 500)
+    HEALTH_DB_LATENCY_WARN_MS (default 200)
+    HEALTH_POOL_SATURATION_WARN (default 0.9)
+    HEALTH_NOTIFICATION_BACKLOG_WARN (default 1000)
+    HEALTH_VIEW_FLUSH_LAG_WARN (default 60) -- seconds buffered product views may wait
+    HEALTH_FAIL_ON_DEGRADED=true|false (default false) -- answer 503 when degraded
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from src.database.core import engine
+from src.admin_notifications.services import count_by_status
+from src.notifications.services import NOTIF_STATUS_PENDING
+from src.product_views.recorder import buffer as view_buffer
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "2"))
+HEALTH_DB_TIMEOUT_MS = int(os.getenv("HEALTH_DB_TIMEOUT_MS", "500"))
+HEALTH_DB_LATENCY_WARN_MS = float(os.getenv("HEALTH_DB_LATENCY_WARN_MS", "200"))
+HEALTH_POOL_SATURATION_WARN = float(os.getenv("HEALTH_POOL_SATURATION_WARN", "0.9"))
+HEALTH_NOTIFICATION_BACKLOG_WARN = int(os.getenv("HEALTH_NOTIFICATION_BACKLOG_WARN", "1000"))
+HEALTH_VIEW_FLUSH_LAG_WARN = float(os.getenv("HEALTH_VIEW_FLUSH_LAG_WARN", "60"))
+HEALTH_FAIL_ON_DEGRADED = os.getenv("HEALTH_FAIL_ON_DEGRADED", "false").lower() == "true"
+
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"
+STATUS_DOWN = "down"
+
+_cache_lock = threading.Lock()
+_cached: Tuple[float, Dict[str, Any], int] | None = None
+
+
+def reset_cache() -> None:
+    global _cached
+    with _cache_lock:
+        _cached = None
+
+
+def pool_status() -> Dict[str, Any]:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"checked_out": None, "capacity": None, "saturation": None}
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "checked_out": checked_out,
+        "capacity": capacity,
+        "saturation": round(checked_out / capacity, 3) if capacity else None,
+    }
+
+
+def _ping(db: Session) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text(f"SET LOCAL statement_timeout = {HEALTH_DB_TIMEOUT_MS}"))
+        db.execute(text("SELECT 1"))
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        status = STATUS_DEGRADED if latency_ms > HEALTH_DB_LATENCY_WARN_MS else STATUS_OK
+        return {"status": status, "latency_ms": latency_ms}
+    except Exception as e:
+        logger.warning("Readiness database check failed: %s", e)
+        return {"status": STATUS_DOWN, "error": str(e)}
+    finally:
+        db.rollback()
+
+
+def _notification_backlog(db: Session) -> Dict[str, Any]:
+    try:
+        pending = count_by_status(db, NOTIF_STATUS_PENDING)
+    except Exception as e:
+        logger.warning("Readiness backlog check failed: %s", e)
+        db.rollback()
+        return {"status": STATUS_DEGRADED, "error": str(e)}
+    status = STATUS_DEGRADED if pending > HEALTH_NOTIFICATION_BACKLOG_WARN else STATUS_OK
+    return {"status": status, "pending": pending}
+
+
+def _view_buffer() -> Dict[str, Any]:
+    # Per worker: views this process has counted but not yet written
+    products, views = view_buffer.pending()
+    lag = round(view_buffer.lag_seconds(), 1)
+    status = STATUS_DEGRADED if lag > HEALTH_VIEW_FLUSH_LAG_WARN else STATUS_OK
+    return {"status": status, "pending_views": views, "pending_products": products, "lag_seconds": lag}
+
+
+def _check(db: Session) -> Tuple[Dict[str, Any], int]:
+    pool = pool_status()
+    saturation = pool["saturation"]
+    if saturation is not None and saturation >= 1:
+        # Checking out another connection would block until the pool timeout
+        database = {"status": STATUS_DOWN, "error": "connection pool exhausted"}
+    else:
+        database = _ping(db)
+    pool["status"] = STATUS_DEGRADED if saturation is not None and saturation >= HEALTH_POOL_SATURATION_WARN else STATUS_OK
+
+    checks = {"database": database, "pool": pool, "view_buffer": _view_buffer()}
+    if database["status"] != STATUS_DOWN:
+        checks["notification_backlog"] = _notification_backlog(db)
+
+    statuses = {c["status"] for c in checks.values()}
+    if STATUS_DOWN in statuses:
+        overall = STATUS_DOWN
+    elif STATUS_DEGRADED in statuses:
+        overall = STATUS_DEGRADED
+    else:
+        overall = STATUS_OK
+    unhealthy = overall == STATUS_DOWN or (overall == STATUS_DEGRADED and HEALTH_FAIL_ON_DEGRADED)
+    return {"status": overall, "checks": checks}, 503 if unhealthy else 200
+
+
+def readiness(db: Session) -> Tuple[Dict[str, Any], int]:
+    global _cached
+    now = time.monotonic()
+    with _cache_lock:
+        if _cached and now - _cached[0] < HEALTH_CACHE_SECONDS:
+            return _cached[1], _cached[2]
+        body, status_code = _check(db)
+        _cached = (now, body, status_code)
+        return body, status_code
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, Response, status
+
+from ..auth.service import CurrentUser
+from ..database.core import DbSession
+from ..roles.services import require_admin
+from . import handlers  # noqa: F401  registers the built-in job kinds
+from . import models, services
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"], dependencies=[Depends(require_admin)])
+
+
+@router.post("/", response_model=models.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_job(job_in: models.JobCreate, db: DbSession, current_user: CurrentUser, response: Response):
+    """Queue a job and return at once; poll ``Location`` (``GET /jobs/{id}``) for progress and result."""
+    job = services.enqueue(db, job_in.kind, job_in.payload, user_id=current_user.user_id)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job
+
+
+@router.get("/{job_id}", response_model=models.JobResponse)
+def get_job(job_id: int, db: DbSession):
+    return services.get_job(db, job_id)
+
+
+@router.post("/{job_id}/cancel", response_model=models.JobResponse)
+def cancel_job(job_id: int, db: DbSession):
+    """Queued jobs are cancelled at once; running ones stop at their next progress report."""
+    return services.cancel_job(db, job_id)
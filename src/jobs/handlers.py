@@ -0,0 +1,38 @@
+"""Built-in job kinds.
+
+    users.provision          payload {"rows": [{email, first_name, last_name, password, role?}, ...], "role": default};
+                             the rows (plaintext passwords) are a secret key: stored apart and deleted once claimed
+    product_views.maintain   refresh the top-N rollups and prune expired view buckets
+    notifications.digest     send the waiting digest entries as one email (enqueued when the digest is due)
+"""
+
+from typing import Any, Dict
+
+from src.notifications import digest, services as notification_services
+from src.product_views import services as product_view_services
+from src.users import provisioning
+from .services import JobContext, register_job
+
+
+@register_job("users.provision", secret_payload_keys=("rows",))
+def provision_users(ctx: JobContext) -> Dict[str, Any]:
+    rows = ctx.payload.get("rows")
+    if rows is None:
+        # Missing, or requeued after its worker died: the rows were deleted when it was first claimed
+        raise ValueError("Rows are missing or no longer available; submit the file again")
+    report = provisioning.provision(ctx.db, rows, ctx.payload.get("role"), progress=ctx.progress)
+    return report.model_dump()
+
+
+@register_job(product_view_services.MAINTAIN_JOB)
+def maintain_product_views(ctx: JobContext) -> Dict[str, Any]:
+    product_view_services.refresh_top(ctx.db)
+    ctx.progress(1, 2)
+    hourly, daily = product_view_services.prune_buckets(ctx.db)
+    ctx.progress(2, 2)
+    return {"pruned_hourly": hourly, "pruned_daily": daily}
+
+
+@register_job(digest.DIGEST_JOB)
+def send_notification_digest(ctx: JobContext) -> Dict[str, Any]:
+    return {"sent": notification_services.flush_digest(ctx.bind)}
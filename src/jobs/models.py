@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+
+
+class JobCreate(BaseModel):
+    kind: str
+    payload: Dict[str, Any] = {}
+
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress_done: int
+    progress_total: Optional[int] = None
+    cancel_requested: bool
+    attempts: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_by: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
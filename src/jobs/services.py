@@ -0,0 +1,247 @@
+"""Database-backed job queue for long-running admin work.
+
+``POST /jobs`` stores a ``queued`` row in ``jobs`` and answers 202. Worker
+threads claim the oldest queued job with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` plus an ``UPDATE ... WHERE status = 'queued'``, so each job runs
+once. The threads run inside the API processes (``JOB_WORKERS``) or in
+their own processes (``python -m src.jobs.worker``), so workers scale apart
+from the API. Each job's handler is looked up by its kind and run:
+
+    @register_job("things.export")
+    def export_things(ctx: JobContext) -> dict:
+        for n, chunk in enumerate(chunks, 1):
+            ...
+            ctx.progress(n, len(chunks))   # raises JobCancelled once cancellation was requested
+        return {"exported": total}         # stored as the job result
+
+Payload keys a kind declares secret (``register_job(kind,
+secret_payload_keys=...)``, e.g. rows with plaintext passwords) are stored
+in ``job_secrets`` instead of ``jobs.payload``. The claiming transaction
+deletes them and hands them to the worker in memory only, so they are never
+kept past the claim. A job requeued after its worker died runs without them.
+
+``POST /jobs/{id}/cancel`` cancels a queued job at once. A running job stops
+at its next ``ctx.progress`` call, and work it already committed stays. A
+running job whose heartbeat (refreshed on every progress report) is older
+than ``JOB_STALE_SECONDS`` is assumed lost with its worker. It is queued
+again, up to ``JOB_MAX_ATTEMPTS`` runs, after which it fails.
+
+Environment variables:
+    JOB_WORKERS (default 0)           worker threads started in each API process
+    JOB_POLL_SECONDS (default 1)
+    JOB_STALE_SECONDS (default 600)
+    JOB_MAX_ATTEMPTS (default 3)
+    JOB_STOP_TIMEOUT_SECONDS (default 30)   how long shutdown waits for running jobs
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from src.entities.job import Job
+from src.entities.job_secret import JobSecret
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "0"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_STOP_TIMEOUT_SECONDS = float(os.getenv("JOB_STOP_TIMEOUT_SECONDS", "30"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+JOB_NOT_FOUND = "Job not found"
+
+
+def utcnow() -> datetime:
+    # Job timestamps are naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobCancelled(Exception):
+    """Raised from ``JobContext.progress`` when the job was asked to stop."""
+
+
+@dataclass
+class JobContext:
+    job_id: int
+    payload: Dict[str, Any]
+    db: Session  # for the handler's own work; commit as it goes
+    bind: Engine | Connection
+
+    def progress(self, done: int, total: int | None = None) -> None:
+        if report_progress(self.bind, self.job_id, done, total):
+            raise JobCancelled()
+
+
+Handler = Callable[[JobContext], Dict[str, Any] | None]
+HANDLERS: Dict[str, Handler] = {}
+# Payload keys stored in job_secrets until the job is claimed (e.g. plaintext passwords)
+SECRET_PAYLOAD_KEYS: Dict[str, Sequence[str]] = {}
+
+
+def register_job(kind: str, secret_payload_keys: Sequence[str] = ()) -> Callable[[Handler], Handler]:
+    def decorator(handler: Handler) -> Handler:
+        HANDLERS[kind] = handler
+        SECRET_PAYLOAD_KEYS[kind] = tuple(secret_payload_keys)
+        return handler
+    return decorator
+
+
+def _split_payload(kind: str, payload: Dict[str, Any] | None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """``(public, secret)`` parts of a payload according to the kind's secret keys."""
+    secret_keys = SECRET_PAYLOAD_KEYS.get(kind, ())
+    public, secret = {}, {}
+    for key, value in (payload or {}).items():
+        (secret if key in secret_keys else public)[key] = value
+    return public, secret
+
+
+def enqueue(db: Session, kind: str, payload: Dict[str, Any] | None = None, user_id: int | None = None) -> Job:
+    if kind not in HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {kind}")
+    public, secret = _split_payload(kind, payload)
+    job = Job(kind=kind, status=QUEUED, payload=public, created_by=user_id)
+    db.add(job)
+    if secret:
+        db.flush()
+        db.add(JobSecret(job_id=job.id, payload=secret))
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def enqueue_unique(db: Session, kind: str, payload: Dict[str, Any] | None = None) -> Job:
+    """Enqueue ``kind`` unless a job of that kind is already queued; returns the queued job."""
+    job = db.query(Job).filter(Job.kind == kind, Job.status == QUEUED).order_by(Job.id).first()
+    return job or enqueue(db, kind, payload)
+
+
+def get_job(db: Session, job_id: int) -> Job:
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=JOB_NOT_FOUND)
+    return job
+
+
+def cancel_job(db: Session, job_id: int) -> Job:
+    """Cancel a queued job now, or ask a running one to stop at its next progress report."""
+    job = get_job(db, job_id)
+    # Guarded UPDATEs: a worker may claim the job between our read and write
+    cancelled = (
+        db.query(Job).filter(Job.id == job_id, Job.status == QUEUED)
+        .update({"status": CANCELLED, "finished_at": utcnow()}, synchronize_session=False)
+    )
+    if cancelled:
+        db.execute(delete(JobSecret).where(JobSecret.job_id == job_id))
+    else:
+        requested = (
+            db.query(Job).filter(Job.id == job_id, Job.status == RUNNING)
+            .update({"cancel_requested": True}, synchronize_session=False)
+        )
+        if not requested:
+            raise HTTPException(status_code=409, detail="Job already finished")
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def requeue_stale(db: Session) -> None:
+    """Queue again (or fail, after ``JOB_MAX_ATTEMPTS``) running jobs whose worker stopped reporting."""
+    stale = (Job.status == RUNNING, Job.heartbeat_at < utcnow() - timedelta(seconds=JOB_STALE_SECONDS))
+    db.query(Job).filter(*stale, Job.attempts < JOB_MAX_ATTEMPTS).update(
+        {"status": QUEUED, "worker_id": None}, synchronize_session=False
+    )
+    db.query(Job).filter(*stale).update(
+        {"status": FAILED, "error": "Worker stopped responding", "finished_at": utcnow()}, synchronize_session=False
+    )
+    db.commit()
+
+
+def claim_next(db: Session, worker_id: str) -> Job | None:
+    """Mark the oldest queued job as running for ``worker_id`` and return it, detached.
+
+    Its secret payload keys are deleted from ``job_secrets`` in the same
+    transaction and merged into the returned job's payload in memory only.
+    """
+    while True:
+        # SKIP LOCKED: concurrent workers pass over rows another one is claiming
+        # (FOR UPDATE is omitted on SQLite; the guarded UPDATE below covers it)
+        row = (
+            db.query(Job.id).filter(Job.status == QUEUED).order_by(Job.id)
+            .with_for_update(skip_locked=True).first()
+        )
+        if row is None:
+            db.commit()
+            return None
+        now = utcnow()
+        claimed = db.query(Job).filter(Job.id == row.id, Job.status == QUEUED).update({
+            "status": RUNNING, "worker_id": worker_id, "started_at": now, "heartbeat_at": now,
+            "attempts": Job.attempts + 1,
+        }, synchronize_session=False)
+        secret = db.execute(
+            delete(JobSecret).where(JobSecret.job_id == row.id).returning(JobSecret.payload)
+        ).scalar() if claimed else None
+        db.commit()
+        if claimed:
+            job = db.get(Job, row.id)
+            db.expunge(job)
+            if secret:
+                job.payload = {**(job.payload or {}), **secret}
+            return job
+
+
+def report_progress(bind: Engine | Connection, job_id: int, done: int, total: int | None = None) -> bool:
+    """Store progress and refresh the heartbeat in its own transaction; True when cancellation was requested."""
+    values = {"progress_done": done, "heartbeat_at": utcnow()}
+    if total is not None:
+        values["progress_total"] = total
+    with Session(bind=bind) as db:
+        cancel = db.execute(
+            update(Job).where(Job.id == job_id).values(**values).returning(Job.cancel_requested)
+        ).scalar()
+        db.commit()
+    return bool(cancel)
+
+
+def finish(bind: Engine | Connection, job: Job, status: str, result: Dict[str, Any] | None = None, error: str | None = None) -> None:
+    with Session(bind=bind) as db:
+        db.query(Job).filter(Job.id == job.id, Job.status == RUNNING).update({
+            "status": status, "result": result, "error": error, "finished_at": utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+
+
+def run_job(bind: Engine | Connection, job: Job) -> str:
+    """Run a claimed job's handler and record the outcome; returns the final status."""
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        finish(bind, job, FAILED, error=f"Unknown job kind: {job.kind}")
+        return FAILED
+    with Session(bind=bind) as db:
+        try:
+            result = handler(JobContext(job_id=job.id, payload=job.payload or {}, db=db, bind=bind))
+        except JobCancelled:
+            db.rollback()
+            finish(bind, job, CANCELLED)
+            logger.info("Job %s (%s) cancelled", job.id, job.kind)
+            return CANCELLED
+        except Exception as e:
+            db.rollback()
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            finish(bind, job, FAILED, error=str(e) or type(e).__name__)
+            return FAILED
+    finish(bind, job, SUCCEEDED, result=result)
+    logger.info("Job %s (%s) succeeded", job.id, job.kind)
+    return SUCCEEDED
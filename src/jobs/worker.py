@@ -0,0 +1,99 @@
+"""Worker threads that claim and run queued jobs (see ``services``).
+
+Started inside the API when ``JOB_WORKERS`` > 0, or as a separate process
+that scales on its own:
+
+    python -m src.jobs.worker --threads 4
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from typing import List
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import handlers  # noqa: F401  registers the built-in job kinds
+from .services import JOB_POLL_SECONDS, JOB_STOP_TIMEOUT_SECONDS, JOB_WORKERS, claim_next, requeue_stale, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    def __init__(self, bind: Engine | Connection, threads: int = 1, poll_seconds: float = JOB_POLL_SECONDS):
+        self.bind = bind
+        self.threads = threads
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def run_once(self, worker_id: str | None = None) -> bool:
+        """Claim and run one job; False when the queue was empty."""
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        with Session(bind=self.bind) as db:
+            requeue_stale(db)
+            job = claim_next(db, worker_id)
+            if job is None:
+                return False
+        run_job(self.bind, job)
+        return True
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                ran = self.run_once()
+            except Exception:
+                logger.exception("Job worker iteration failed")
+                ran = False
+            if not ran:
+                self._stop.wait(self.poll_seconds)
+
+    def start(self) -> None:
+        for n in range(self.threads):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Started %d job worker thread(s)", self.threads)
+
+    def stop(self, timeout: float | None = JOB_STOP_TIMEOUT_SECONDS) -> None:
+        """Stop claiming jobs and wait up to ``timeout`` seconds in all for running ones.
+
+        Jobs still running then are cut short with the process (the threads
+        are daemons) and requeued once stale.
+        """
+        self._stop.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        alive = sum(thread.is_alive() for thread in self._threads)
+        if alive:
+            logger.warning("%d job worker thread(s) still running after %ss; their jobs are requeued once stale", alive, timeout)
+        self._threads.clear()
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument("--threads", type=int, default=max(JOB_WORKERS, 1))
+    parser.add_argument("--poll-seconds", type=float, default=JOB_POLL_SECONDS)
+    parser.add_argument("--stop-timeout", type=float, default=JOB_STOP_TIMEOUT_SECONDS, help="Seconds to wait for running jobs on shutdown")
+    args = parser.parse_args(argv)
+
+    from src.database.core import engine
+
+    worker = JobWorker(engine, threads=args.threads, poll_seconds=args.poll_seconds)
+    stopped = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopped.set())
+    worker.start()
+    stopped.wait()
+    logger.info("Stopping job workers")
+    worker.stop(args.stop_timeout)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,8 +1,35 @@
+"""Logging setup: non-blocking queue pipeline with structured (JSON) output.
+
+Request threads only put records on an in-memory queue (``QueueHandler``); a
+``QueueListener`` thread formats them and writes to stderr, so slow log I/O
+never blocks a request. Every record logged while a request is in flight
+carries ``request_id`` and ``elapsed_ms`` (see ``RequestContextMiddleware``).
+
+Environment variables:
+    LOG_LEVEL    root level, overrides the level passed to configure_logging
+    LOG_LEVELS   per-module levels: "src.users=DEBUG,sqlalchemy.engine=WARNING"
+    LOG_FORMAT   json (default) | text
+"""
+
+import atexit
+import json
 import logging
+import os
+import queue
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from enum import StrEnum
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
 LOG_FORMAT_DEBUG = "%(levelname)s:%(message)s:%(pathname)s:%(funcName)s:%(lineno)d"
+LOG_FORMAT_TEXT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+REQUEST_ID_HEADER = "X-Request-ID"
 
 
 class LogLevels(StrEnum):
@@ -12,16 +39,118 @@ class LogLevels(StrEnum):
     debug = "DEBUG"
 
 
+_request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+_request_started: ContextVar[float | None] = ContextVar("request_started", default=None)
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener: QueueListener | None = None
+
+
+def current_request_id() -> str | None:
+    return _request_id.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request id and time since the request started."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get() or "-"
+        started = _request_started.get()
+        if started is not None:
+            record.elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def parse_module_levels(raw: str | None) -> Dict[str, str]:
+    levels: Dict[str, str] = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 def configure_logging(log_level: str = LogLevels.error):
-    log_level = str(log_level).upper()
+    global _listener
+    log_level = str(os.getenv("LOG_LEVEL") or log_level).upper()
     log_levels = [level.value for level in LogLevels]
-
     if log_level not in log_levels:
-        logging.basicConfig(level=LogLevels.error)
-        return
+        log_level = LogLevels.error
 
-    if log_level == LogLevels.debug:
-        logging.basicConfig(level=log_level, format=LOG_FORMAT_DEBUG)
+    if _listener is not None:
         return
 
-    logging.basicConfig(level=log_level)
\ No newline at end of file
+    stream = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        stream.setFormatter(logging.Formatter(LOG_FORMAT_DEBUG if log_level == LogLevels.debug else LOG_FORMAT_TEXT))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # Filters run in the calling thread, so request context is captured before enqueueing
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    root.addHandler(queue_handler)
+    for name, level in parse_module_levels(os.getenv("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+
+
+class RequestContextMiddleware:
+    """Assigns a request id (honouring an incoming ``X-Request-ID``) and echoes it back."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode())
+        request_id = incoming.decode("latin-1")[:64] if incoming else uuid.uuid4().hex
+        id_token = _request_id.set(request_id)
+        started_token = _request_started.set(time.perf_counter())
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(REQUEST_ID_HEADER, request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _request_id.reset(id_token)
+            _request_started.reset(started_token)
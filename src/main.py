@@ -1,19 +1,82 @@
+import asyncio
+import logging
 from fastapi import FastAPI
-from contextlib import asynccontextmanager
-from .database.core import engine, Base
+from contextlib import asynccontextmanager, suppress
+import anyio
+from .database.core import engine, Base, SessionLocal
+from .database.partitions import PARTITIONING_ENABLED, ensure_partitions
+from .database.instrumentation import QueryInstrumentationMiddleware
+from .metrics.services import MetricsMiddleware, instrument_pool, mark_worker_dead, observe_view_buffer
+from .product_views.recorder import VIEW_FLUSH_SECONDS
+from .product_views import services as product_view_services
+from .product_views.services import flush_views
+from .notifications import digest
+from .notifications.transports import close_transport
+from .jobs.services import JOB_STOP_TIMEOUT_SECONDS, JOB_WORKERS
+from .jobs.worker import JobWorker
+from .compression import CompressionMiddleware
+from .profiling import ProfilingMiddleware, profile_routes
 
 from . import entities  # ensure all models imported
 from .api import register_routes
-from .logging import configure_logging, LogLevels
+from .logging import configure_logging, LogLevels, RequestContextMiddleware
 from .seed import seed
 from .seed_products import seed_products
 
 configure_logging(LogLevels.info)
+logger = logging.getLogger(__name__)
 
 """ Only uncomment below to create new tables, 
 otherwise the tests will fail if not connected
 """
 Base.metadata.create_all(bind=engine)
+if PARTITIONING_ENABLED:
+    ensure_partitions(engine)
+instrument_pool(engine)
+
+
+def _flush_views():
+    flush_views(engine)
+    observe_view_buffer()
+
+
+async def flush_views_periodically():
+    while True:
+        await asyncio.sleep(VIEW_FLUSH_SECONDS)
+        try:
+            await anyio.to_thread.run_sync(_flush_views)
+        except Exception:
+            logger.exception("Background product view flush failed")
+
+
+def _schedule_digest():
+    with SessionLocal() as db:
+        digest.schedule(db)
+
+
+async def schedule_digest_periodically():
+    # Only enqueues: the digest itself is sent once, by whichever job worker claims it
+    while True:
+        await asyncio.sleep(digest.DIGEST_POLL_SECONDS)
+        try:
+            await anyio.to_thread.run_sync(_schedule_digest)
+        except Exception:
+            logger.exception("Scheduling the notification digest failed")
+
+
+def _schedule_top_refresh():
+    with SessionLocal() as db:
+        product_view_services.schedule_maintenance(db)
+
+
+async def refresh_top_periodically():
+    # Only enqueues: a job worker recomputes the top, once however many API processes ask
+    while True:
+        try:
+            await anyio.to_thread.run_sync(_schedule_top_refresh)
+        except Exception:
+            logger.exception("Scheduling the product view maintenance failed")
+        await asyncio.sleep(product_view_services.VIEW_TOP_REFRESH_SECONDS)
 
 
 @asynccontextmanager
@@ -21,8 +84,25 @@ async def lifespan(app: FastAPI):
     # Startup logic
     seed()
     seed_products()
+    tasks = [asyncio.create_task(flush_views_periodically())]
+    if digest.NOTIFICATION_DIGEST_ENABLED:
+        tasks.append(asyncio.create_task(schedule_digest_periodically()))
+    if product_view_services.VIEW_TOP_REFRESH_SECONDS > 0:
+        tasks.append(asyncio.create_task(refresh_top_periodically()))
+    job_worker = JobWorker(engine, threads=JOB_WORKERS)
+    if JOB_WORKERS > 0:
+        job_worker.start()
     yield
-    # Shutdown logic (add if needed)
+    # Shutdown logic
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await anyio.to_thread.run_sync(job_worker.stop, JOB_STOP_TIMEOUT_SECONDS)
+    _flush_views()
+    close_transport()
+    # After the last flush: it updates the view buffer gauges
+    mark_worker_dead()
 
 app = FastAPI(
     title="Products Catalog API",
@@ -30,4 +110,14 @@ app = FastAPI(
     version="1.0.0",    
     lifespan=lifespan)
 
-register_routes(app)
\ No newline at end of file
+# Last added runs outermost: query stats are in scope while metrics are recorded
+# and while a profiled request captures its SQL
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryInstrumentationMiddleware)
+app.add_middleware(RequestContextMiddleware)
+# Outermost so every header above is in place before the body is compressed
+app.add_middleware(CompressionMiddleware)
+
+register_routes(app)
+profile_routes(app)
\ No newline at end of file
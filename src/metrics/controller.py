@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from ..database.core import DbSession
+from . import services
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("", summary="Prometheus metrics", description="Request, database pool and domain metrics in Prometheus text format")
+def metrics(db: DbSession):
+    body, content_type = services.render_metrics(db)
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,163 @@
+"""Prometheus metrics: HTTP latency/throughput, DB pool usage and domain gauges.
+
+Request metrics are recorded by ``MetricsMiddleware`` for every route registered
+in ``src/api.py`` (labelled by route template, not raw path, to keep label
+cardinality bounded). The product view buffer gauges are refreshed after
+every request and every background flush.
+
+Multiple uvicorn workers: set ``PROMETHEUS_MULTIPROC_DIR`` to an empty,
+writable directory before starting the workers. Each worker then writes its
+samples to mmap'ed files in that directory and ``/metrics`` aggregates them.
+On shutdown a worker removes its live (livesum/livemax) gauge files so a
+stopped worker's in-flight requests and buffered views stop counting. A
+worker that is killed (SIGKILL, OOM) can't do that: its gauges linger
+until the directory is cleared, which is why it must be emptied before
+every start.
+"""
+
+import os
+import time
+from typing import Iterable
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.database.instrumentation import current_stats
+from src.admin_notifications.services import count_by_status
+from src.notifications.services import NOTIF_STATUS_PENDING
+from src.product_views.recorder import buffer as view_buffer
+
+MULTIPROCESS_MODE = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+UNMATCHED_ROUTE = "unmatched"
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements issued per request", ["method", "route"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 500),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served", ["method"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity_connections", "Pool size plus max overflow",
+    multiprocess_mode="livesum",
+)
+VIEWS_BUFFERED = Gauge(
+    "product_views_buffered", "Product views counted in memory and not yet written",
+    multiprocess_mode="livesum",
+)
+VIEWS_FLUSH_LAG = Gauge(
+    "product_views_flush_lag_seconds", "Age of the oldest unwritten product view",
+    multiprocess_mode="livemax",
+)
+
+
+def observe_view_buffer() -> None:
+    VIEWS_BUFFERED.set(view_buffer.pending()[1])
+    VIEWS_FLUSH_LAG.set(view_buffer.lag_seconds())
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live gauges from the multiprocess directory (call on shutdown)."""
+    if MULTIPROCESS_MODE:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def instrument_pool(engine: Engine) -> None:
+    """Track pool checkouts through pool events (no work at scrape time)."""
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        DB_POOL_CAPACITY.set(pool.size() + max(pool._max_overflow, 0))
+    event.listen(engine, "checkout", lambda *args: DB_POOL_CHECKED_OUT.inc())
+    event.listen(engine, "checkin", lambda *args: DB_POOL_CHECKED_OUT.dec())
+
+
+def _route_label(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Records request count, latency, in-flight requests and SQL statements per route."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            route = _route_label(scope)
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            stats = current_stats()
+            if stats is not None:
+                REQUEST_QUERIES.labels(method, route).observe(stats.count)
+            observe_view_buffer()
+
+
+class DomainCollector(Collector):
+    """Gauges computed from the database at scrape time."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        yield GaugeMetricFamily(
+            "admin_notifications_pending", "Admin notifications waiting to be sent",
+            value=count_by_status(self.db, NOTIF_STATUS_PENDING),
+        )
+
+
+def render_metrics(db: Session) -> tuple[bytes, str]:
+    if MULTIPROCESS_MODE:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        process_metrics = generate_latest(registry)
+    else:
+        process_metrics = generate_latest(REGISTRY)
+    domain = CollectorRegistry(auto_describe=False)
+    domain.register(DomainCollector(db))
+    return process_metrics + generate_latest(domain), CONTENT_TYPE_LATEST
@@ -0,0 +1,96 @@
+"""Digest mode: coalesce change notifications into one email per window.
+
+With ``NOTIFICATION_DIGEST_ENABLED=true`` the ids of product and user change
+logs are stored in ``notification_digest_entries`` instead of being emailed
+one operation at a time, so a restart or a recycled worker loses nothing.
+The digest is due once the oldest entry is ``NOTIFICATION_DIGEST_SECONDS``
+old or there are ``NOTIFICATION_DIGEST_MAX_CHANGES`` entries. It is then
+sent by the ``notifications.digest`` job (see ``src/jobs``), so it needs a
+job worker (``JOB_WORKERS`` or ``python -m src.jobs.worker``). The API
+processes check the window every ``DIGEST_POLL_SECONDS`` and enqueue the
+job unless one is already queued. ``services.flush_digest`` deletes the
+entries it sends in the transaction that records the email, so concurrent
+flushes never send a change twice: the logs are loaded in one query per
+table and every active admin gets one email grouped by product and by user.
+
+Operations containing an action listed in ``NOTIFICATION_CRITICAL_ACTIONS``
+bypass the digest and are sent immediately.
+
+Environment variables:
+    NOTIFICATION_DIGEST_ENABLED=true|false (default false)
+    NOTIFICATION_DIGEST_SECONDS (default 300)
+    NOTIFICATION_DIGEST_MAX_CHANGES (default 500)
+    NOTIFICATION_CRITICAL_ACTIONS (default DELETE_PRODUCT,DELETE_USER)
+"""
+
+import os
+from datetime import timedelta
+from typing import Iterable, List, Tuple
+from sqlalchemy import delete, func, insert
+from sqlalchemy.orm import Session
+
+from src.entities.notification_digest_entry import NotificationDigestEntry
+from src.jobs.services import enqueue_unique, utcnow
+
+NOTIFICATION_DIGEST_ENABLED = os.getenv("NOTIFICATION_DIGEST_ENABLED", "false").lower() == "true"
+NOTIFICATION_DIGEST_SECONDS = float(os.getenv("NOTIFICATION_DIGEST_SECONDS", "300"))
+NOTIFICATION_DIGEST_MAX_CHANGES = int(os.getenv("NOTIFICATION_DIGEST_MAX_CHANGES", "500"))
+NOTIFICATION_CRITICAL_ACTIONS = frozenset(
+    name.strip() for name in os.getenv("NOTIFICATION_CRITICAL_ACTIONS", "DELETE_PRODUCT,DELETE_USER").split(",") if name.strip()
+)
+# How often the API processes check whether the window has elapsed
+DIGEST_POLL_SECONDS = min(NOTIFICATION_DIGEST_SECONDS, 30.0)
+
+DIGEST_JOB = "notifications.digest"
+
+
+def is_critical(action_names: Iterable[str]) -> bool:
+    return any(name in NOTIFICATION_CRITICAL_ACTIONS for name in action_names)
+
+
+def add(db: Session, product_log_ids: Iterable[int] = (), user_log_ids: Iterable[int] = ()) -> None:
+    """Store change log ids for the next digest (one INSERT) and commit."""
+    now = utcnow()
+    rows = (
+        [{"change_log_id": log_id, "user_change_log_id": None, "created_at": now} for log_id in product_log_ids]
+        + [{"change_log_id": None, "user_change_log_id": log_id, "created_at": now} for log_id in user_log_ids]
+    )
+    if not rows:
+        return
+    db.execute(insert(NotificationDigestEntry), rows)
+    db.commit()
+
+
+def pending(db: Session) -> int:
+    return db.query(func.count(NotificationDigestEntry.id)).scalar()
+
+
+def due(db: Session) -> bool:
+    count, oldest = db.query(func.count(NotificationDigestEntry.id), func.min(NotificationDigestEntry.created_at)).one()
+    if oldest is None:
+        return False
+    return count >= NOTIFICATION_DIGEST_MAX_CHANGES or utcnow() - oldest >= timedelta(seconds=NOTIFICATION_DIGEST_SECONDS)
+
+
+def schedule(db: Session) -> bool:
+    """Enqueue the digest job when the digest is due; True when it was (or already is) queued."""
+    if not due(db):
+        return False
+    enqueue_unique(db, DIGEST_JOB)
+    return True
+
+
+def claim(db: Session) -> Tuple[List[int], List[int]]:
+    """Delete every waiting entry in the caller's transaction and return its product and user log ids.
+
+    Nothing is removed until the caller commits; a concurrent claim waits on
+    the deleted rows and then skips them.
+    """
+    rows = db.execute(
+        delete(NotificationDigestEntry).returning(
+            NotificationDigestEntry.change_log_id, NotificationDigestEntry.user_change_log_id
+        )
+    ).all()
+    product_log_ids = sorted(row.change_log_id for row in rows if row.change_log_id is not None)
+    user_log_ids = sorted(row.user_change_log_id for row in rows if row.user_change_log_id is not None)
+    return product_log_ids, user_log_ids
@@ -0,0 +1,62 @@
+"""Cache of the admin users that receive change notifications.
+
+The admin set rarely changes, so it is resolved once (one joined query, see
+``services.active_admins``) and reused by every send until something that can
+change it invalidates the cache: ``assign_role``, a role rename, and user
+status/email changes or soft deletes. Other workers only see those writes
+when their entry expires after ``NOTIFICATION_RECIPIENTS_TTL_SECONDS``.
+
+Environment variables:
+    NOTIFICATION_RECIPIENTS_TTL_SECONDS (default 300, 0 disables the cache)
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+NOTIFICATION_RECIPIENTS_TTL_SECONDS = float(os.getenv("NOTIFICATION_RECIPIENTS_TTL_SECONDS", "300"))
+
+
+@dataclass(frozen=True)
+class Recipient:
+    id: int
+    email: str
+
+
+class RecipientCache:
+    """Thread-safe cached recipient list with a TTL and explicit invalidation."""
+
+    def __init__(self, ttl: float = NOTIFICATION_RECIPIENTS_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._recipients: List[Recipient] | None = None
+        self._loaded_at = 0.0
+        # Bumped on invalidation so a load that raced with it is not stored
+        self._generation = 0
+
+    def get(self, load: Callable[[], List[Recipient]]) -> List[Recipient]:
+        with self._lock:
+            if self._recipients is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._recipients
+            generation = self._generation
+        recipients = load()
+        with self._lock:
+            if generation == self._generation and self.ttl > 0:
+                self._recipients = recipients
+                self._loaded_at = time.monotonic()
+        return recipients
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._recipients = None
+            self._generation += 1
+
+
+admin_recipients = RecipientCache()
+
+
+def invalidate_admin_recipients() -> None:
+    """Call after committing a change to roles, role assignments or user status/email."""
+    admin_recipients.invalidate()
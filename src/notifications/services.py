@@ -1,39 +1,46 @@
-"""Notification service using SendGrid.
+"""Admin notifications for product and user changes, sent by email.
 
 High level flow:
-    diff_and_log() -> send_admin_notifications_for_product_change([...logs])
+    publish_changes() -> send_admin_notifications_for_product_change([...logs])
         -> validate config & gather active admins
         -> build grouped message (all field changes)
-        -> persist AdminNotification rows as PENDING
-        -> attempt send (single email to all admins)
-        -> update rows to SENT or ERROR
+        -> persist one NotificationEvent (subject + body) and a PENDING
+           AdminNotification delivery row per admin
+        -> send through the configured transport (see ``transports``)
+        -> move the event's deliveries to SENT or ERROR (one UPDATE)
+
+In digest mode (see ``digest``) the log ids are stored as digest entries
+and the ``notifications.digest`` job (``flush_digest``) sends one
+summarized email per window instead.
 
 Environment variables:
-    SENDGRID_API_KEY
     NOTIFICATION_SENDER
     ENABLE_EMAIL_NOTIFICATIONS=true|false
 """
 
 import os
-from typing import List, Sequence, Tuple
-from sqlalchemy.orm import Session
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+from sqlalchemy import insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, joinedload
 import logging
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
 
 from src.entities.product_change_log import ProductChangeLog
 from src.entities.user_change_log import UserChangeLog
 from src.entities.admin_notification import AdminNotification
+from src.entities.notification_event import NotificationEvent
 from src.entities.product import Product
 from src.entities.notification_status import NotificationStatus
 from src.entities.user import User
 from src.entities.user_role import UserRole
 from src.entities.role import Role
 from src.roles.services import ADMIN_ROLE
+from . import digest, transports
+from .recipients import Recipient, admin_recipients
 
 logger = logging.getLogger(__name__)
 
-SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 NOTIFICATION_SENDER = os.getenv("NOTIFICATION_SENDER")  # verified sender / single-sender
 ENABLE_EMAIL_NOTIFICATIONS = os.getenv("ENABLE_EMAIL_NOTIFICATIONS", "false").lower() == "true"
 
@@ -47,22 +54,25 @@ def _get_or_create_status(db: Session, name: str) -> NotificationStatus:
     if status:
         return status
     status = NotificationStatus(name=name, description=name)
-    db.add(status); db.commit(); db.refresh(status)
+    # Flushed, not committed: it commits with the event that needs it
+    db.add(status); db.flush()
     return status
 
 
-def _sg_client():
-    return SendGridAPIClient(SENDGRID_API_KEY)
+def _load_active_admins(db: Session) -> List[Recipient]:
+    rows = (
+        db.query(User.id, User.email)
+        .join(UserRole, UserRole.user_id == User.id)
+        .join(Role, Role.id == UserRole.role_id)
+        .filter(Role.name == ADMIN_ROLE, User.status == True)  # noqa: E712
+        .order_by(User.id)
+        .all()
+    )
+    return [Recipient(id=row.id, email=row.email) for row in rows]
 
 
-def _active_admins(db: Session) -> List[User]:
-    role = db.query(Role).filter(Role.name == ADMIN_ROLE).first()
-    if not role:
-        return []
-    user_ids = [ur.user_id for ur in db.query(UserRole).filter(UserRole.role_id == role.id).all()]
-    if not user_ids:
-        return []
-    return db.query(User).filter(User.id.in_(user_ids), User.status == True).all()  # noqa: E712
+def _active_admins(db: Session) -> List[Recipient]:
+    return admin_recipients.get(lambda: _load_active_admins(db))
 
 
 def _validate_config() -> bool:
@@ -70,7 +80,7 @@ def _validate_config() -> bool:
         logger.debug("Email notifications disabled by flag")
         return False
     missing = [name for name, val in {
-        "SENDGRID_API_KEY": SENDGRID_API_KEY,
+        **transports.get_transport().required_config(),
         "NOTIFICATION_SENDER": NOTIFICATION_SENDER,
     }.items() if not val]
     if missing:
@@ -79,7 +89,73 @@ def _validate_config() -> bool:
     return True
 
 
-def _email_content(product: Product | None, changer: User | None, diffs: Sequence[ProductChangeLog]) -> Tuple[str, str]:
+def _deliver(db: Session, admins: List[Recipient], subject: str, body: str, change_log_id: int | None = None, user_change_log_id: int | None = None) -> None:
+    """Store the message once, add a PENDING delivery per admin, send one email and record the outcome."""
+    pending = _get_or_create_status(db, NOTIF_STATUS_PENDING)
+    sent = _get_or_create_status(db, NOTIF_STATUS_SENT)
+    error = _get_or_create_status(db, NOTIF_STATUS_ERROR)
+
+    event = NotificationEvent(
+        change_log_id=change_log_id,
+        user_change_log_id=user_change_log_id,
+        subject=subject,
+        message=body,
+    )
+    db.add(event); db.flush()
+    db.execute(insert(AdminNotification), [
+        {"event_id": event.id, "sent_to": u.id, "status_id": pending.id} for u in admins
+    ])
+    db.commit()
+
+    message = transports.OutgoingEmail(
+        sender=NOTIFICATION_SENDER,
+        recipients=tuple(u.email for u in admins),
+        subject=subject,
+        body=body,
+    )
+    try:
+        failed = transports.get_transport().send(message)
+    except Exception as e: 
+        logger.exception("Email send failed: %s", e)
+        failed = dict.fromkeys(message.recipients, str(e))
+
+    failed_ids: Dict[str, List[int]] = defaultdict(list)
+    for u in admins:
+        if u.email in failed:
+            failed_ids[failed[u.email]].append(u.id)
+    if len(failed) < len(admins):
+        _set_delivery_status(db, event.id, sent.id)
+    # One UPDATE per distinct error (normally none or one)
+    for err_text, user_ids in failed_ids.items():
+        _set_delivery_status(db, event.id, error.id, err_text, sent_to=user_ids)
+    db.commit()
+
+
+def _set_delivery_status(db: Session, event_id: int, status_id: int, error_message: str | None = None, sent_to: List[int] | None = None) -> None:
+    """Move the deliveries of an event (all, or those to ``sent_to``) to ``status_id`` with one UPDATE."""
+    query = db.query(AdminNotification).filter(AdminNotification.event_id == event_id)
+    if sent_to is not None:
+        query = query.filter(AdminNotification.sent_to.in_(sent_to))
+    query.update({"status_id": status_id, "error_message": error_message}, synchronize_session=False)
+
+
+def _buffered_for_digest(db: Session, change_logs: Sequence[UserChangeLog]) -> bool:
+    action_names = [log.action.name for log in change_logs]
+    return _buffer_ids_for_digest(db, action_names, user_log_ids=[log.id for log in change_logs])
+
+
+def _buffer_ids_for_digest(db: Session, action_names: Sequence[str], product_log_ids: Sequence[int] = (), user_log_ids: Sequence[int] = ()) -> bool:
+    """In digest mode store the logs as digest entries (unless the operation is critical); True when stored."""
+    if not digest.NOTIFICATION_DIGEST_ENABLED:
+        return False
+    if digest.is_critical(action_names):
+        return False
+    digest.add(db, product_log_ids=product_log_ids, user_log_ids=user_log_ids)
+    digest.schedule(db)
+    return True
+
+
+def _email_content(product: Product | None, changer: User | None, diffs: Sequence) -> Tuple[str, str]:
     if not diffs:
         return "", ""
     product_id = diffs[0].product_id
@@ -95,9 +171,22 @@ def _email_content(product: Product | None, changer: User | None, diffs: Sequenc
     return subject, body
 
 
-def send_admin_notifications_for_product_change(db: Session, change_logs: List[ProductChangeLog]):
+def send_admin_notifications_for_product_change(
+    db: Session,
+    change_logs: Sequence,
+    action_name: str,
+    product: Product | None = None,
+    changer: User | None = None,
+):
+    """``change_logs``: rows with the log columns (``id``, ``product_id``, ``changed_by``,
+    ``field_changed``, ``old_value``, ``new_value``) of one operation.
+
+    ``product``/``changer``: pass the objects the caller already has to skip their lookups.
+    """
     if not (change_logs and _validate_config()):
         return
+    if _buffer_ids_for_digest(db, [action_name], product_log_ids=[log.id for log in change_logs]):
+        return
     product_id = change_logs[0].product_id
     changer_id = change_logs[0].changed_by
     admins = _active_admins(db)
@@ -105,50 +194,51 @@ def send_admin_notifications_for_product_change(db: Session, change_logs: List[P
         logger.info("No active admin users to notify")
         return
 
-    product = db.query(Product).filter(Product.id == product_id).first()
-    changer = db.query(User).filter(User.id == changer_id).first()
+    # Session.get() answers from the identity map when the object is already loaded
+    product = product if product is not None else db.get(Product, product_id)
+    changer = changer if changer is not None else db.get(User, changer_id)
     subject, body = _email_content(product, changer, change_logs)
     if not subject:
         return
 
-    pending = _get_or_create_status(db, NOTIF_STATUS_PENDING)
-    sent = _get_or_create_status(db, NOTIF_STATUS_SENT)
-    error = _get_or_create_status(db, NOTIF_STATUS_ERROR)
+    _deliver(db, admins, subject, body, change_log_id=change_logs[-1].id)
 
-    notifications = [
-        AdminNotification(
-            change_log_id=change_logs[-1].id,
-            sent_to=u.id,
-            status_id=pending.id,
-            message=body,
-        ) for u in admins
-    ]
-    db.add_all(notifications); db.commit()
-
-    mail = Mail(
-        from_email=NOTIFICATION_SENDER,
-        to_emails=[u.email for u in admins],
-        subject=subject,
-        plain_text_content=body,
+
+def _bulk_email_content(products: Sequence, changer_email: str, field: str, old_value: str, new_value: str, note: str | None) -> Tuple[str, str]:
+    subject = f"{len(products)} product(s) updated: {field} {old_value} -> {new_value}"
+    lines = [f"- '{p.name}' (ID {p.id})" for p in products]
+    intro = f"{note}\n\n" if note else ""
+    body = (
+        f"{intro}{len(products)} product(s) updated by {changer_email}, "
+        f"{field}: {old_value} -> {new_value}.\n\nProducts:\n" + "\n".join(lines)
     )
-    try:
-        resp = _sg_client().send(mail)
-        ok = 200 <= resp.status_code < 300
-        target_status_id = sent.id if ok else error.id
-        err_text = None if ok else f"SendGrid status {resp.status_code}: {resp.body}"
-        if err_text:
-            logger.error(err_text)
-        for n in notifications:
-            n.status_id = target_status_id
-            if err_text:
-                n.error_message = err_text
-    except Exception as e: 
-        err_text = str(e)
-        logger.exception("SendGrid send failed: %s", err_text)
-        for n in notifications:
-            n.status_id = error.id
-            n.error_message = err_text
-    db.commit()
+    return subject, body
+
+
+def send_admin_notifications_for_bulk_product_change(
+    db: Session,
+    change_log_ids: List[int],
+    products: Sequence,
+    action_name: str,
+    field: str,
+    old_value: str,
+    new_value: str,
+    changer_id: int,
+    note: str | None = None,
+):
+    """One grouped email for the same change applied to many products (rows with ``id`` and ``name``)."""
+    if not (change_log_ids and _validate_config()):
+        return
+    if _buffer_ids_for_digest(db, [action_name], product_log_ids=change_log_ids):
+        return
+    admins = _active_admins(db)
+    if not admins:
+        logger.info("No active admin users to notify (bulk product change)")
+        return
+    changer = db.get(User, changer_id)
+    changer_email = changer.email if changer else f"user:{changer_id}"
+    subject, body = _bulk_email_content(products, changer_email, field, old_value, new_value, note)
+    _deliver(db, admins, subject, body, change_log_id=change_log_ids[-1])
 
 
 def _user_email_content(user: User | None, changer: User | None, diffs: Sequence[UserChangeLog]) -> Tuple[str, str]:
@@ -167,9 +257,17 @@ def _user_email_content(user: User | None, changer: User | None, diffs: Sequence
     return subject, body
 
 
-def send_admin_notifications_for_user_change(db: Session, change_logs: List[UserChangeLog]):
+def send_admin_notifications_for_user_change(
+    db: Session,
+    change_logs: List[UserChangeLog],
+    user: User | None = None,
+    changer: User | None = None,
+):
+    """``user``/``changer``: pass the objects the caller already has to skip their lookups."""
     if not (change_logs and _validate_config()):
         return
+    if _buffered_for_digest(db, change_logs):
+        return
     user_id = change_logs[0].user_id
     changer_id = change_logs[0].changed_by
     admins = _active_admins(db)
@@ -177,47 +275,85 @@ def send_admin_notifications_for_user_change(db: Session, change_logs: List[User
         logger.info("No active admin users to notify (user change)")
         return
 
-    user = db.query(User).filter(User.id == user_id).first()
-    changer = db.query(User).filter(User.id == changer_id).first()
+    user = user if user is not None else db.get(User, user_id)
+    if changer is None:
+        changer = user if changer_id == user_id else db.get(User, changer_id)
     subject, body = _user_email_content(user, changer, change_logs)
     if not subject:
         return
 
-    pending = _get_or_create_status(db, NOTIF_STATUS_PENDING)
-    sent = _get_or_create_status(db, NOTIF_STATUS_SENT)
-    error = _get_or_create_status(db, NOTIF_STATUS_ERROR)
+    _deliver(db, admins, subject, body, user_change_log_id=change_logs[-1].id)
 
-    notifications = [
-        AdminNotification(
-            user_change_log_id=change_logs[-1].id,
-            sent_to=u.id,
-            status_id=pending.id,
-            message=body,
-        ) for u in admins
-    ]
-    db.add_all(notifications); db.commit()
-
-    mail = Mail(
-        from_email=NOTIFICATION_SENDER,
-        to_emails=[u.email for u in admins],
-        subject=subject,
-        plain_text_content=body,
-    )
-    try:
-        resp = _sg_client().send(mail)
-        ok = 200 <= resp.status_code < 300
-        target_status_id = sent.id if ok else error.id
-        err_text = None if ok else f"SendGrid status {resp.status_code}: {resp.body}"
-        if err_text:
-            logger.error(err_text)
-        for n in notifications:
-            n.status_id = target_status_id
-            if err_text:
-                n.error_message = err_text
-    except Exception as e: 
-        err_text = str(e)
-        logger.exception("SendGrid send failed (user change): %s", err_text)
-        for n in notifications:
-            n.status_id = error.id
-            n.error_message = err_text
-    db.commit()
+
+def _digest_line(log: ProductChangeLog | UserChangeLog) -> str:
+    changer = log.changed_by_user.email if log.changed_by_user else f"user:{log.changed_by}"
+    return f"  - {log.field_changed}: {log.old_value} -> {log.new_value} ({log.action.name} by {changer})"
+
+
+def _digest_content(product_logs: Sequence[ProductChangeLog], user_logs: Sequence[UserChangeLog]) -> Tuple[str, str]:
+    by_product: Dict[int, List[ProductChangeLog]] = defaultdict(list)
+    for log in product_logs:
+        by_product[log.product_id].append(log)
+    by_user: Dict[int, List[UserChangeLog]] = defaultdict(list)
+    for log in user_logs:
+        by_user[log.user_id].append(log)
+
+    parts = []
+    if by_product:
+        parts.append(f"{len(product_logs)} change(s) to {len(by_product)} product(s)")
+    if by_user:
+        parts.append(f"{len(user_logs)} change(s) to {len(by_user)} user(s)")
+    subject = "Catalog digest: " + ", ".join(parts)
+
+    sections = []
+    for product_id, logs in by_product.items():
+        name = logs[0].product.name if logs[0].product else f"#{product_id}"
+        sections.append(f"Product '{name}' (ID {product_id}):\n" + "\n".join(_digest_line(log) for log in logs))
+    for user_id, logs in by_user.items():
+        email = logs[0].user.email if logs[0].user else f"#{user_id}"
+        sections.append(f"User '{email}' (ID {user_id}):\n" + "\n".join(_digest_line(log) for log in logs))
+    return subject, "\n\n".join(sections)
+
+
+def flush_digest(bind: Engine | Connection) -> int:
+    """Send the waiting digest entries as one email; returns the number of changes sent.
+
+    Uses its own session. The entries are deleted in the transaction that
+    records the email, so if the logs cannot be read they stay for the next
+    run. Run by the ``notifications.digest`` job.
+    """
+    with Session(bind=bind) as db:
+        product_log_ids, user_log_ids = digest.claim(db)
+        if not (product_log_ids or user_log_ids):
+            db.rollback()
+            return 0
+        admins = _active_admins(db)
+        if not admins:
+            logger.info("No active admin users to notify (digest of %d changes dropped)", len(product_log_ids) + len(user_log_ids))
+            db.commit()
+            return 0
+        product_logs = (
+            db.query(ProductChangeLog)
+            .options(joinedload(ProductChangeLog.product), joinedload(ProductChangeLog.changed_by_user), joinedload(ProductChangeLog.action))
+            .filter(ProductChangeLog.id.in_(product_log_ids))
+            .order_by(ProductChangeLog.id)
+            .all()
+        ) if product_log_ids else []
+        user_logs = (
+            db.query(UserChangeLog)
+            .options(joinedload(UserChangeLog.user), joinedload(UserChangeLog.changed_by_user), joinedload(UserChangeLog.action))
+            .filter(UserChangeLog.id.in_(user_log_ids))
+            .order_by(UserChangeLog.id)
+            .all()
+        ) if user_log_ids else []
+        if not (product_logs or user_logs):
+            db.commit()
+            return 0
+        subject, body = _digest_content(product_logs, user_logs)
+        # Commits the entries' deletion together with the event and its deliveries
+        _deliver(
+            db, admins, subject, body,
+            change_log_id=product_logs[-1].id if product_logs else None,
+            user_change_log_id=user_logs[-1].id if user_logs else None,
+        )
+    return len(product_logs) + len(user_logs)
@@ -0,0 +1,333 @@
+"""Email transports for admin notifications.
+
+``EMAIL_TRANSPORT`` selects the backend:
+    sendgrid  SendGrid v3 API over a pool of keep-alive HTTPS connections
+    smtp      an SMTP server over a pool of persistent connections
+    memory    keeps sent messages in memory (tests, local development)
+
+A message for several recipients is sent in batches: one SendGrid request
+with a personalization per recipient (each admin gets their own copy), or one
+SMTP transaction with a ``RCPT TO`` per recipient (the ``To`` header is the
+sender, so recipients are not disclosed to each other). Batches go out
+concurrently, at most ``EMAIL_MAX_CONCURRENCY`` at a time, which is also the
+size of each connection pool.
+
+Connection errors, SendGrid 429/5xx and SMTP 4xx replies are retried
+``EMAIL_MAX_RETRIES`` times with exponential backoff. Latency and errors are
+exported per transport as ``email_send_seconds`` and
+``email_send_errors_total``.
+
+Environment variables:
+    EMAIL_TRANSPORT (default sendgrid)
+    EMAIL_TIMEOUT_SECONDS (default 10)
+    EMAIL_MAX_RETRIES (default 2)
+    EMAIL_RETRY_BACKOFF_SECONDS (default 0.5)
+    EMAIL_MAX_CONCURRENCY (default 4)
+    SENDGRID_API_KEY
+    SMTP_HOST, SMTP_PORT (default 587), SMTP_USERNAME, SMTP_PASSWORD
+    SMTP_STARTTLS=true|false (default true)
+    SMTP_MAX_RECIPIENTS (default 100)
+"""
+
+import http.client
+import json
+import logging
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from email.message import EmailMessage
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+from prometheus_client import Counter, Histogram
+from sendgrid.helpers.mail import Mail, Personalization, To
+
+logger = logging.getLogger(__name__)
+
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "sendgrid").lower()
+EMAIL_TIMEOUT_SECONDS = float(os.getenv("EMAIL_TIMEOUT_SECONDS", "10"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "2"))
+EMAIL_RETRY_BACKOFF_SECONDS = float(os.getenv("EMAIL_RETRY_BACKOFF_SECONDS", "0.5"))
+EMAIL_MAX_CONCURRENCY = int(os.getenv("EMAIL_MAX_CONCURRENCY", "4"))
+
+SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+SENDGRID_HOST = "api.sendgrid.com"
+# SendGrid accepts at most 1000 personalizations per request
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_MAX_RECIPIENTS = int(os.getenv("SMTP_MAX_RECIPIENTS", "100"))
+
+# Defined here rather than in src.metrics, which imports the notification services
+EMAIL_SEND_LATENCY = Histogram(
+    "email_send_seconds", "Latency of one email batch send attempt", ["transport"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+EMAIL_SEND_ERRORS = Counter(
+    "email_send_errors_total", "Email batches that failed after retries", ["transport"],
+)
+
+
+class EmailError(Exception):
+    """The transport rejected the batch; retrying will not help."""
+
+
+class TransientEmailError(EmailError):
+    """Connection problem or temporary rejection; the batch is retried."""
+
+
+@dataclass(frozen=True)
+class OutgoingEmail:
+    sender: str
+    recipients: Tuple[str, ...]
+    subject: str
+    body: str
+
+
+class ConnectionPool:
+    """Keeps up to ``size`` open connections; ``size`` also caps concurrent use."""
+
+    def __init__(self, connect: Callable[[], Any], size: int):
+        self._connect = connect
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            except BaseException:
+                # The connection may be half way through an exchange; don't reuse it
+                _close_quietly(conn)
+                raise
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                _close_quietly(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class EmailTransport:
+    name = "base"
+    batch_size = 100
+
+    def required_config(self) -> Dict[str, str | None]:
+        """Settings that must be non-empty for this transport to send."""
+        return {}
+
+    def send(self, message: OutgoingEmail) -> Dict[str, str]:
+        """Send ``message`` to all its recipients; returns ``recipient -> error`` for failures."""
+        recipients = list(message.recipients)
+        batches = [recipients[i:i + self.batch_size] for i in range(0, len(recipients), self.batch_size)]
+        if len(batches) <= 1:
+            results = [self._send_with_retry(message, batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(EMAIL_MAX_CONCURRENCY, len(batches))) as executor:
+                results = list(executor.map(lambda batch: self._send_with_retry(message, batch), batches))
+        failed: Dict[str, str] = {}
+        for result in results:
+            failed.update(result)
+        return failed
+
+    def _send_with_retry(self, message: OutgoingEmail, recipients: List[str]) -> Dict[str, str]:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                return self._send_batch(message, recipients)
+            except TransientEmailError as e:
+                if attempt < EMAIL_MAX_RETRIES:
+                    delay = EMAIL_RETRY_BACKOFF_SECONDS * 2 ** attempt
+                    logger.warning("Email send via %s failed (%s), retrying in %.1fs", self.name, e, delay)
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                error = str(e)
+            except Exception as e:
+                error = str(e)
+            finally:
+                EMAIL_SEND_LATENCY.labels(self.name).observe(time.perf_counter() - started)
+            EMAIL_SEND_ERRORS.labels(self.name).inc()
+            logger.error("Email send via %s to %d recipient(s) failed: %s", self.name, len(recipients), error)
+            return dict.fromkeys(recipients, error)
+
+    def _send_batch(self, message: OutgoingEmail, recipients: List[str]) -> Dict[str, str]:
+        """Send one batch; returns recipients the server refused individually."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SendGridTransport(EmailTransport):
+    name = "sendgrid"
+    batch_size = SENDGRID_MAX_PERSONALIZATIONS
+
+    def __init__(self, api_key: str | None = SENDGRID_API_KEY, host: str = SENDGRID_HOST):
+        self.api_key = api_key
+        self._pool = ConnectionPool(
+            lambda: http.client.HTTPSConnection(host, timeout=EMAIL_TIMEOUT_SECONDS), EMAIL_MAX_CONCURRENCY,
+        )
+
+    def required_config(self) -> Dict[str, str | None]:
+        return {"SENDGRID_API_KEY": self.api_key}
+
+    def _payload(self, message: OutgoingEmail, recipients: Sequence[str]) -> bytes:
+        mail = Mail(from_email=message.sender, subject=message.subject, plain_text_content=message.body)
+        for recipient in recipients:
+            personalization = Personalization()
+            personalization.add_to(To(recipient))
+            mail.add_personalization(personalization)
+        return json.dumps(mail.get()).encode()
+
+    def _send_batch(self, message: OutgoingEmail, recipients: List[str]) -> Dict[str, str]:
+        body = self._payload(message, recipients)
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        with self._pool.connection() as conn:
+            try:
+                conn.request("POST", "/v3/mail/send", body=body, headers=headers)
+                resp = conn.getresponse()
+                detail = resp.read()
+            except (OSError, http.client.HTTPException) as e:
+                raise TransientEmailError(f"SendGrid request failed: {e!r}") from e
+        if 200 <= resp.status < 300:
+            return {}
+        err_text = f"SendGrid status {resp.status}: {detail.decode(errors='replace')}"
+        if resp.status == 429 or resp.status >= 500:
+            raise TransientEmailError(err_text)
+        raise EmailError(err_text)
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+class SMTPTransport(EmailTransport):
+    name = "smtp"
+    batch_size = SMTP_MAX_RECIPIENTS
+
+    def __init__(
+        self,
+        host: str | None = SMTP_HOST,
+        port: int = SMTP_PORT,
+        username: str | None = SMTP_USERNAME,
+        password: str | None = SMTP_PASSWORD,
+        starttls: bool = SMTP_STARTTLS,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self._pool = ConnectionPool(self._connect, EMAIL_MAX_CONCURRENCY)
+
+    def required_config(self) -> Dict[str, str | None]:
+        return {"SMTP_HOST": self.host}
+
+    def _connect(self) -> smtplib.SMTP:
+        try:
+            conn = smtplib.SMTP(self.host, self.port, timeout=EMAIL_TIMEOUT_SECONDS)
+            if self.starttls:
+                conn.starttls(context=ssl.create_default_context())
+            if self.username:
+                conn.login(self.username, self.password or "")
+        except (OSError, smtplib.SMTPException) as e:
+            raise TransientEmailError(f"SMTP connect to {self.host}:{self.port} failed: {e!r}") from e
+        return conn
+
+    def _send_batch(self, message: OutgoingEmail, recipients: List[str]) -> Dict[str, str]:
+        mail = EmailMessage()
+        mail["From"] = message.sender
+        mail["To"] = message.sender
+        mail["Subject"] = message.subject
+        mail.set_content(message.body)
+        with self._pool.connection() as conn:
+            try:
+                refused = conn.send_message(mail, from_addr=message.sender, to_addrs=recipients)
+            except smtplib.SMTPRecipientsRefused as e:
+                refused = e.recipients
+            except smtplib.SMTPResponseException as e:
+                err_text = f"SMTP {e.smtp_code}: {e.smtp_error!r}"
+                if 400 <= e.smtp_code < 500:
+                    raise TransientEmailError(err_text) from e
+                raise EmailError(err_text) from e
+            except (OSError, smtplib.SMTPException) as e:
+                # Includes a pooled connection the server closed while idle
+                raise TransientEmailError(f"SMTP send failed: {e!r}") from e
+        return {recipient: f"SMTP {code}: {reply!r}" for recipient, (code, reply) in refused.items()}
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+class MemoryTransport(EmailTransport):
+    """Records messages instead of sending them; ``refuse`` fails chosen recipients."""
+    name = "memory"
+
+    def __init__(self, refuse: Dict[str, str] | None = None):
+        self.outbox: List[OutgoingEmail] = []
+        self.refuse = dict(refuse or {})
+        self._lock = threading.Lock()
+
+    def _send_batch(self, message: OutgoingEmail, recipients: List[str]) -> Dict[str, str]:
+        with self._lock:
+            self.outbox.append(replace(message, recipients=tuple(recipients)))
+        return {r: self.refuse[r] for r in recipients if r in self.refuse}
+
+
+TRANSPORTS: Dict[str, Callable[[], EmailTransport]] = {
+    "sendgrid": SendGridTransport,
+    "smtp": SMTPTransport,
+    "memory": MemoryTransport,
+}
+# Checked at import so a typo stops startup instead of the first notification
+if EMAIL_TRANSPORT not in TRANSPORTS:
+    raise ValueError(f"Unknown EMAIL_TRANSPORT {EMAIL_TRANSPORT!r}, expected one of {', '.join(TRANSPORTS)}")
+
+_transport: EmailTransport | None = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> EmailTransport:
+    """The process-wide transport, built from ``EMAIL_TRANSPORT`` on first use."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = TRANSPORTS[EMAIL_TRANSPORT]()
+        return _transport
+
+
+def set_transport(transport: EmailTransport | None) -> EmailTransport | None:
+    """Replace the process-wide transport (closing the old one); returns the old one."""
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    if previous is not None:
+        previous.close()
+    return previous
+
+
+def close_transport() -> None:
+    set_transport(None)
@@ -0,0 +1,69 @@
+"""Keyset (seek) pagination helpers for newest-first listings.
+
+Listings are ordered by ``(timestamp DESC, id DESC)``; the cursor encodes the
+last row of the previous page and the next page seeks strictly below it, so
+every page costs an index range scan regardless of depth.
+
+The next cursor is returned in the ``X-Next-Cursor`` response header; it is
+absent on the last page.
+"""
+
+import base64
+from datetime import datetime
+from typing import Annotated, Any, List, Tuple
+from fastapi import HTTPException, Query as QueryParam, Response
+from sqlalchemy import DateTime, func, literal, tuple_
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+PageLimit = Annotated[int, QueryParam(ge=1, le=MAX_PAGE_SIZE)]
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    raw = f"{ts.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(ts), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _sortable(query: Query, expr):
+    # SQLite keeps CURRENT_TIMESTAMP without fractional seconds while bound
+    # datetimes carry them; normalize both sides so timestamp ties fall
+    # through to the id comparison.
+    if query.session.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:%f", expr)
+    return expr
+
+
+def seek(query: Query, ts_col, id_col, cursor: str | None, limit: int) -> Query:
+    """Apply the cursor predicate, newest-first ordering and ``limit + 1`` rows."""
+    ts_key = _sortable(query, ts_col)
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        bound = _sortable(query, literal(ts, DateTime))
+        query = query.filter(tuple_(ts_key, id_col) < tuple_(bound, row_id))
+    return query.order_by(ts_key.desc(), id_col.desc()).limit(limit + 1)
+
+
+def split_page(rows: List[Any], limit: int, ts_attr: str) -> Tuple[List[Any], str | None]:
+    """Trim the lookahead row and build the cursor for the following page."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, ts_attr), last.id)
+
+
+def set_next_cursor(response: Response, next_cursor: str | None) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
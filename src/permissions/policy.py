@@ -0,0 +1,205 @@
+"""Compiled role/permission matrix for request-time authorization.
+
+Every active permission gets a bit and every role a bitmask of the active
+permissions assigned to it (inactive roles get none), compiled with one
+query. A user's role is cached on first use. With both warm an authorization
+check is two dict lookups and a bit test, without touching the database.
+``FULL_ACCESS`` grants every permission.
+
+Services that change roles, permissions or their assignments call
+``invalidate_policy()`` (or ``invalidate_user_role(user_id)`` after
+``assign_role``) once committed; the matrix is recompiled on the next check.
+Other workers see the change when their copy expires after
+``PERMISSION_POLICY_TTL_SECONDS``.
+
+Routes declare what they need with ``require_permission``, or a router maps
+its routes to permissions in one place (the products, brands and users
+routers do):
+
+    router = APIRouter(prefix="/things", dependencies=[Depends(route_permissions({
+        "GET": "READ_THINGS",                      # every GET route
+        "POST /things/import": "IMPORT_THINGS",    # one route (full path template)
+        "GET /things/public": None,                # no permission, no token required
+    }, default=FULL_ACCESS))])
+
+The seed (``src/seed.py``) grants ``FULL_ACCESS`` to the admin role and
+``READ_PRODUCTS`` to the anonymous role on every start.
+
+Environment variables:
+    PERMISSION_POLICY_TTL_SECONDS (default 300)
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Annotated, Dict
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from src.auth.service import CurrentUser, optional_oauth2_bearer, verify_token
+from src.database.core import get_db
+from src.entities.permission import Permission
+from src.entities.role import Role
+from src.entities.role_permission import RolePermission
+from src.entities.user_role import UserRole
+
+PERMISSION_POLICY_TTL_SECONDS = float(os.getenv("PERMISSION_POLICY_TTL_SECONDS", "300"))
+
+FULL_ACCESS = "FULL_ACCESS"
+READ_PRODUCTS = "READ_PRODUCTS"
+NO_ROLE = "User has no role assigned"
+
+
+@dataclass(frozen=True)
+class RoleGrant:
+    """Cached view of a role; safe to share between requests (not bound to a session)."""
+    id: int
+    name: str
+    mask: int
+
+
+class PolicyMatrix:
+    def __init__(self, roles: Dict[int, RoleGrant], bits: Dict[str, int]):
+        self.roles = roles
+        self.bits = bits
+        self.full_access = 1 << bits[FULL_ACCESS] if FULL_ACCESS in bits else 0
+
+    @classmethod
+    def compile(cls, db: Session) -> "PolicyMatrix":
+        rows = (
+            db.query(Role.id, Role.name, Role.status, Permission.name.label("permission"))
+            .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+            .outerjoin(Permission, and_(Permission.id == RolePermission.permission_id, Permission.status == True))  # noqa: E712
+            .all()
+        )
+        bits: Dict[str, int] = {}
+        names: Dict[int, str] = {}
+        masks: Dict[int, int] = {}
+        for row in rows:
+            names[row.id] = row.name
+            masks.setdefault(row.id, 0)
+            if row.permission is None or not row.status:
+                continue
+            bit = bits.setdefault(row.permission, len(bits))
+            masks[row.id] |= 1 << bit
+        return cls({rid: RoleGrant(id=rid, name=names[rid], mask=masks[rid]) for rid in names}, bits)
+
+    def allows(self, role: RoleGrant, permission: str) -> bool:
+        if role.mask & self.full_access:
+            return True
+        bit = self.bits.get(permission)
+        return bit is not None and bool(role.mask >> bit & 1)
+
+
+class PolicyEngine:
+    """Holds the compiled matrix and the user -> role cache; both are filled lazily."""
+
+    def __init__(self, ttl: float = PERMISSION_POLICY_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._matrix: PolicyMatrix | None = None
+        self._compiled_at = 0.0
+        self._user_roles: Dict[int, int] = {}
+        # Bumped on invalidation so a compile that raced with it is not kept
+        self._generation = 0
+
+    def matrix(self, db: Session, refresh: bool = False) -> PolicyMatrix:
+        with self._lock:
+            fresh = self._matrix is not None and time.monotonic() - self._compiled_at < self.ttl
+            if fresh and not refresh:
+                return self._matrix
+            if not fresh:
+                # Expired with the matrix so other workers' assign_role calls show up too
+                self._user_roles.clear()
+            generation = self._generation
+        matrix = PolicyMatrix.compile(db)
+        with self._lock:
+            if generation == self._generation:
+                self._matrix = matrix
+                self._compiled_at = time.monotonic()
+        return matrix
+
+    def role_of(self, db: Session, user_id: int) -> RoleGrant | None:
+        matrix = self.matrix(db)
+        role_id = self._user_roles.get(user_id)
+        if role_id is None:
+            row = db.query(UserRole.role_id).filter(UserRole.user_id == user_id).first()
+            if row is None:
+                return None
+            role_id = row.role_id
+            with self._lock:
+                self._user_roles[user_id] = role_id
+        role = matrix.roles.get(role_id)
+        if role is None:
+            # Role created since the last compile
+            role = self.matrix(db, refresh=True).roles.get(role_id)
+        return role
+
+    def allows(self, db: Session, role: RoleGrant, permission: str) -> bool:
+        return self.matrix(db).allows(role, permission)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._matrix = None
+            self._user_roles.clear()
+            self._generation += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._user_roles.pop(user_id, None)
+
+
+policy = PolicyEngine()
+
+
+def invalidate_policy() -> None:
+    """Call after committing changes to roles, permissions or role permissions."""
+    policy.invalidate()
+
+
+def invalidate_user_role(user_id: int) -> None:
+    """Call after committing a change to a user's role assignment."""
+    policy.invalidate_user(user_id)
+
+
+def current_role(db: Session, user_id: int) -> RoleGrant:
+    role = policy.role_of(db, user_id)
+    if role is None:
+        raise HTTPException(status_code=404, detail=NO_ROLE)
+    return role
+
+
+def _check(db: Session, user_id: int, permission: str) -> RoleGrant:
+    role = current_role(db, user_id)
+    if not policy.allows(db, role, permission):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return role
+
+
+def require_permission(permission: str):
+    def dependency(current_user: CurrentUser, db: Session = Depends(get_db)) -> RoleGrant:
+        return _check(db, current_user.user_id, permission)
+    return dependency
+
+
+def route_permissions(mapping: Dict[str, str | None], default: str | None = None):
+    """Router-level dependency: ``"METHOD /path"`` entries win over ``"METHOD"`` entries, then ``default``.
+
+    Routes that resolve to no permission need no token here and are left to
+    their own dependencies.
+    """
+    def dependency(
+        request: Request,
+        token: Annotated[str | None, Depends(optional_oauth2_bearer)],
+        db: Session = Depends(get_db),
+    ) -> RoleGrant | None:
+        path = getattr(request.scope.get("route"), "path", request.url.path)
+        permission = mapping.get(f"{request.method} {path}", mapping.get(request.method, default))
+        if permission is None:
+            return None
+        if token is None:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        return _check(db, verify_token(token).user_id, permission)
+    return dependency
@@ -7,10 +7,14 @@ from src.entities.role import Role
 from src.entities.role_permission import RolePermission
 from src.entities.user_role import UserRole
 from src.entities.user import User
+from src.database.constraints import register_constraint_errors, translate_integrity_errors
+from src.permissions.policy import invalidate_policy
 from . import models
 
 PERMISSION_NOT_FOUND = "Permission not found"
 
+register_constraint_errors({"permissions_name_key": (400, "Permission name already exists")})
+
 
 def list_permissions(db: Session) -> List[Permission]:
     return db.query(Permission).all()
@@ -24,28 +28,26 @@ def get_permission(db: Session, permission_id: int) -> Permission:
 
 
 def create_permission(db: Session, perm_in: models.PermissionCreate) -> Permission:
-    existing = db.query(Permission).filter(Permission.name == perm_in.name).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Permission name already exists")
     perm = Permission(name=perm_in.name, description=perm_in.description, status=perm_in.status)
     db.add(perm)
-    db.commit()
+    with translate_integrity_errors(db):
+        db.commit()
+    invalidate_policy()
     db.refresh(perm)
     return perm
 
 
 def update_permission(db: Session, permission_id: int, perm_in: models.PermissionUpdate) -> Permission:
     perm = get_permission(db, permission_id)
-    if perm_in.name is not None and perm_in.name != perm.name:
-        exists = db.query(Permission).filter(Permission.name == perm_in.name).first()
-        if exists:
-            raise HTTPException(status_code=400, detail="Permission name already exists")
+    if perm_in.name is not None:
         perm.name = perm_in.name
     if perm_in.description is not None:
         perm.description = perm_in.description
     if perm_in.status is not None:
         perm.status = perm_in.status
-    db.commit()
+    with translate_integrity_errors(db):
+        db.commit()
+    invalidate_policy()
     db.refresh(perm)
     return perm
 
@@ -54,6 +56,7 @@ def soft_delete_permission(db: Session, permission_id: int) -> None:
     perm = get_permission(db, permission_id)
     perm.status = False
     db.commit()
+    invalidate_policy()
 
 
 def assign_permission_to_role(db: Session, role_id: int, permission_id: int) -> None:
@@ -68,6 +71,7 @@ def assign_permission_to_role(db: Session, role_id: int, permission_id: int) ->
         return  # idempotente
     db.add(RolePermission(role_id=role_id, permission_id=permission_id))
     db.commit()
+    invalidate_policy()
 
 
 def list_role_permissions(db: Session, role_id: int) -> List[Permission]:
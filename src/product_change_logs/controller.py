@@ -1,19 +1,50 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from fastapi import APIRouter, Depends, Response
 from typing import List
 from ..database.core import DbSession
 from ..roles.services import require_admin
+from ..pagination import DEFAULT_PAGE_SIZE, PageLimit, set_next_cursor
 from . import services, models
 
 router = APIRouter(prefix="/product-change-logs", tags=["ProductChangeLogs"], dependencies=[Depends(require_admin)])
 
 
 @router.get("/", response_model=List[models.ProductChangeLogResponse])
-def list_all(db: DbSession):
-    logs = services.list_all_logs(db)
-    return services.enrich_with_actions(db, logs)
+def list_all(
+    db: DbSession,
+    response: Response,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    changed_by: int | None = None,
+    field: str | None = None,
+    cursor: str | None = None,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+):
+    logs, next_cursor = services.list_logs(
+        db, since=since, until=until, action=action, changed_by=changed_by,
+        field=field, cursor=cursor, limit=limit,
+    )
+    set_next_cursor(response, next_cursor)
+    return logs
 
 
 @router.get("/product/{product_id}", response_model=List[models.ProductChangeLogResponse])
-def list_by_product(product_id: int, db: DbSession):
-    logs = services.list_logs_by_product(db, product_id)
-    return services.enrich_with_actions(db, logs)
+def list_by_product(
+    product_id: int,
+    db: DbSession,
+    response: Response,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    changed_by: int | None = None,
+    field: str | None = None,
+    cursor: str | None = None,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+):
+    logs, next_cursor = services.list_logs(
+        db, product_id=product_id, since=since, until=until, action=action,
+        changed_by=changed_by, field=field, cursor=cursor, limit=limit,
+    )
+    set_next_cursor(response, next_cursor)
+    return logs
@@ -1,13 +1,16 @@
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Sequence, Tuple
+from sqlalchemy import insert
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from fastapi import HTTPException
 
 from src.entities.product import Product
 from src.entities.product_change_log import ProductChangeLog
 from src.entities.action_status import ActionStatus
-from src.entities.user import User
 
-from src.notifications.services import send_admin_notifications_for_product_change
+from src.notifications.services import send_admin_notifications_for_bulk_product_change, send_admin_notifications_for_product_change
+from src.products.changes import ACTION_CREATE, notify_changes
+from src.pagination import DEFAULT_PAGE_SIZE, seek, split_page
 from . import models
 
 
@@ -17,65 +20,160 @@ def get_or_create_action(db: Session, name: str, description: str = "") -> Actio
     if action:
         return action
     action = ActionStatus(name=name, description=description or name)
-    db.add(action)
-    db.commit(); db.refresh(action)
+    # Flushed, not committed: it goes in with the caller's change
+    db.add(action); db.flush()
     return action
 
 
-def log_product_change(db: Session, product_id: int, changed_by: int, action_name: str, field: str, old_value: str | None, new_value: str | None) -> ProductChangeLog:
-    if not db.query(Product).filter(Product.id == product_id).first():
-        raise HTTPException(status_code=404, detail="Product not found")
-    if not db.query(User).filter(User.id == changed_by).first():
-        raise HTTPException(status_code=404, detail="User not found")
-    action = get_or_create_action(db, action_name, action_name)
-    log = ProductChangeLog(
-        product_id=product_id,
-        changed_by=changed_by,
-        action_id=action.id,
-        field_changed=field,
-        old_value=old_value,
-        new_value=new_value,
+# Committed actions are never renamed or removed; resolved ids skip the lookup on later writes
+_action_ids: Dict[str, int] = {}
+
+
+def get_action_id(db: Session, name: str) -> int:
+    """Id of the action; a missing one is created in the caller's transaction."""
+    action_id = _action_ids.get(name)
+    if action_id is None:
+        action_id = db.query(ActionStatus.id).filter(ActionStatus.name == name).scalar()
+        if action_id is None:
+            # Not cached: the caller's transaction may still roll it back
+            return get_or_create_action(db, name).id
+        _action_ids[name] = action_id
+    return action_id
+
+
+def add_logs(db: Session, product_id: int, changed_by: int, action_name: str, changes: Sequence[Tuple[str, str | None, str | None]]) -> List[Row]:
+    """Insert ``(field, old, new)`` logs with one statement in the caller's transaction.
+
+    No existence checks: the foreign keys reject an unknown product or user.
+    Returns rows with the log columns, by id; the caller commits.
+    """
+    if not changes:
+        return []
+    action_id = get_action_id(db, action_name)
+    rows = db.execute(
+        insert(ProductChangeLog).returning(
+            ProductChangeLog.id, ProductChangeLog.product_id, ProductChangeLog.changed_by,
+            ProductChangeLog.field_changed, ProductChangeLog.old_value, ProductChangeLog.new_value,
+        ),
+        [
+            {"product_id": product_id, "changed_by": changed_by, "action_id": action_id,
+             "field_changed": field, "old_value": old_value, "new_value": new_value}
+            for field, old_value, new_value in changes
+        ],
+    ).all()
+    # RETURNING order is not guaranteed for multi-row inserts
+    return sorted(rows, key=lambda row: row.id)
+
+
+def diff_and_log(db: Session, product: Product, data_before: Dict[str, Any], data_after: Dict[str, Any], user_id: int, action_name: str = "UPDATE") -> List[Row]:
+    """Insert one log per changed field, with one statement, in the caller's write transaction.
+
+    Call ``publish_changes`` with the returned rows once the caller has committed.
+    """
+    changes = [
+        (field, str(old_val) if old_val is not None else None, str(data_after[field]) if data_after[field] is not None else None)
+        for field, old_val in data_before.items()
+        if field in data_after and old_val != data_after[field]
+    ]
+    return add_logs(db, product.id, user_id, action_name, changes)
+
+
+def publish_changes(db: Session, logs: Sequence[Row], action_name: str, product: Product | None = None) -> None:
+    """After the commit that wrote ``logs``: wake the change streams and notify admins."""
+    if not logs:
+        return
+    notify_changes()
+    send_admin_notifications_for_product_change(db, logs, action_name, product=product)
+
+
+def log_bulk_change(db: Session, products: Sequence, user_id: int, action: ActionStatus, field: str, old_value: str, new_value: str, note: str | None = None) -> List[int]:
+    """Log one change applied to many products (rows with ``id`` and ``name``) with a single INSERT.
+
+    Commits the caller's pending bulk UPDATE together with the logs, then
+    sends one grouped notification. Returns the new log ids.
+    """
+    if not products:
+        db.commit()
+        return []
+    log_ids = db.scalars(
+        insert(ProductChangeLog).returning(ProductChangeLog.id),
+        [
+            {"product_id": p.id, "changed_by": user_id, "action_id": action.id,
+             "field_changed": field, "old_value": old_value, "new_value": new_value}
+            for p in products
+        ],
+    ).all()
+    db.commit()
+    # RETURNING order is not guaranteed for multi-row inserts
+    log_ids = sorted(log_ids)
+    notify_changes()
+    send_admin_notifications_for_bulk_product_change(
+        db, log_ids, products, action.name, field, old_value, new_value, changer_id=user_id, note=note,
+    )
+    return log_ids
+
+
+def log_product_created(db: Session, product: Product, user_id: int) -> Row:
+    """Add the ``product.created`` event to the transaction that inserts ``product`` (flushed, so it has an id).
+
+    Call ``notify_changes`` once the caller has committed.
+    """
+    return add_logs(db, product.id, user_id, ACTION_CREATE, [("product", None, product.name)])[0]
+
+
+def list_logs(
+    db: Session,
+    product_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    changed_by: int | None = None,
+    field: str | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Tuple[List[models.ProductChangeLogResponse], str | None]:
+    """One page of logs, newest first, with the action name joined in."""
+    query = (
+        db.query(
+            ProductChangeLog.id,
+            ProductChangeLog.product_id,
+            ProductChangeLog.changed_by,
+            ProductChangeLog.action_id,
+            ActionStatus.name.label("action_name"),
+            ProductChangeLog.field_changed,
+            ProductChangeLog.old_value,
+            ProductChangeLog.new_value,
+            ProductChangeLog.changed_at,
+        )
+        .outerjoin(ActionStatus, ActionStatus.id == ProductChangeLog.action_id)
+    )
+    if product_id is not None:
+        query = query.filter(ProductChangeLog.product_id == product_id)
+    # Bounds on the partition key let Postgres prune monthly partitions
+    if since is not None:
+        query = query.filter(ProductChangeLog.changed_at >= since)
+    if until is not None:
+        query = query.filter(ProductChangeLog.changed_at < until)
+    if action is not None:
+        query = query.filter(ActionStatus.name == action)
+    if changed_by is not None:
+        query = query.filter(ProductChangeLog.changed_by == changed_by)
+    if field is not None:
+        query = query.filter(ProductChangeLog.field_changed == field)
+    rows = seek(query, ProductChangeLog.changed_at, ProductChangeLog.id, cursor, limit).all()
+    rows, next_cursor = split_page(rows, limit, "changed_at")
+    return [to_response(r) for r in rows], next_cursor
+
+
+def to_response(row) -> models.ProductChangeLogResponse:
+    return models.ProductChangeLogResponse(
+        id=row.id,
+        product_id=row.product_id,
+        changed_by=row.changed_by,
+        action_id=row.action_id,
+        action_name=row.action_name,
+        field_changed=row.field_changed,
+        old_value=row.old_value,
+        new_value=row.new_value,
+        changed_at=str(row.changed_at)
     )
-    db.add(log)
-    db.commit(); db.refresh(log)
-    return log
-
-
-def diff_and_log(db: Session, product: Product, data_before: Dict[str, Any], data_after: Dict[str, Any], user_id: int, action_name: str = "UPDATE") -> list[ProductChangeLog]:
-    
-    created: list[ProductChangeLog] = []
-    for field, old_val in data_before.items():
-        if field not in data_after:
-            continue
-        new_val = data_after[field]
-        if old_val != new_val:
-            log = log_product_change(db, product.id, user_id, action_name, field, str(old_val) if old_val is not None else None, str(new_val) if new_val is not None else None)
-            created.append(log)
-    if created:
-        send_admin_notifications_for_product_change(db, created)
-    return created
-
-
-def list_logs_by_product(db: Session, product_id: int) -> List[ProductChangeLog]:
-    return db.query(ProductChangeLog).filter(ProductChangeLog.product_id == product_id).order_by(ProductChangeLog.changed_at.desc()).all()
-
-
-def list_all_logs(db: Session) -> List[ProductChangeLog]:
-    return db.query(ProductChangeLog).order_by(ProductChangeLog.changed_at.desc()).all()
-
-
-def enrich_with_actions(db: Session, logs: List[ProductChangeLog]) -> List[models.ProductChangeLogResponse]:
-    action_ids = {l.action_id for l in logs}
-    actions = db.query(ActionStatus).filter(ActionStatus.id.in_(action_ids)).all() if action_ids else []
-    lookup = {a.id: a.name for a in actions}
-    return [models.ProductChangeLogResponse(
-        id=l.id,
-        product_id=l.product_id,
-        changed_by=l.changed_by,
-        action_id=l.action_id,
-        action_name=lookup.get(l.action_id),
-        field_changed=l.field_changed,
-        old_value=l.old_value,
-        new_value=l.new_value,
-        changed_at=str(l.changed_at)
-    ) for l in logs]
@@ -1,4 +1,5 @@
-from fastapi import APIRouter
+from typing import Annotated
+from fastapi import APIRouter, Query
 from ..database.core import DbSession
 from . import services, models
 
@@ -8,6 +9,22 @@ router = APIRouter(prefix="/product-views", tags=["ProductViews"])
 def list_product_views(db: DbSession):
     return services.list_views(db)
 
+@router.get("/top", response_model=list[models.TopProductResponse])
+def top_product_views(
+    db: DbSession,
+    window: str = "1h",
+    limit: Annotated[int, Query(ge=1, le=services.VIEW_TOP_SIZE)] = 50,
+    realtime: bool = False,
+):
+    """Most viewed products in the window (1h, 24h, 7d, 30d).
+
+    With ``realtime=true`` the current hour is served from this worker's
+    in-memory counters instead (unflushed views included, other workers not).
+    """
+    if realtime:
+        return services.live_top_products(db, limit)
+    return services.top_products(db, window, limit)
+
 @router.get("/{product_id}", response_model=models.ProductViewResponse)
 def get_product_view(product_id: int, db: DbSession):
     return services.get_view(db, product_id)
@@ -8,3 +8,10 @@ class ProductViewResponse(BaseModel):
     last_viewed_at: Optional[datetime]| None = None
     class Config:
         from_attributes = True
+
+
+class TopProductResponse(BaseModel):
+    rank: int
+    product_id: int
+    name: Optional[str] = None
+    view_count: int
@@ -0,0 +1,149 @@
+"""In-process view recording: a write buffer plus a real-time top-K tracker.
+
+Views are counted in memory and written in batches (one upsert per table for
+all buffered products) instead of one read-modify-write per view. A flush
+happens on the request that finds the buffer older than
+``VIEW_FLUSH_SECONDS`` or holding more than ``VIEW_FLUSH_MAX_PRODUCTS``
+products, from a periodic background task (so an idle worker doesn't sit on
+counts) and once more on shutdown. Views are bucketed by flush time, so a
+view can land in the next hour when the flush crosses the boundary.
+
+``LiveTopK`` keeps the heaviest-viewed products of the current hour for this
+worker with bounded memory (Space-Saving: when full, the least-viewed entry is
+replaced and the newcomer inherits its count, so counts are upper bounds).
+
+Environment variables:
+    VIEW_FLUSH_SECONDS (default 5)
+    VIEW_FLUSH_MAX_PRODUCTS (default 1000)
+    VIEW_LIVE_TOPK_CAPACITY (default 1000)
+"""
+
+import heapq
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+
+VIEW_FLUSH_SECONDS = float(os.getenv("VIEW_FLUSH_SECONDS", "5"))
+VIEW_FLUSH_MAX_PRODUCTS = int(os.getenv("VIEW_FLUSH_MAX_PRODUCTS", "1000"))
+VIEW_LIVE_TOPK_CAPACITY = int(os.getenv("VIEW_LIVE_TOPK_CAPACITY", "1000"))
+
+
+def utcnow() -> datetime:
+    # Bucket columns are naive UTC timestamps
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def hour_start(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class ViewBuffer:
+    """Thread-safe ``product_id -> views`` counter that is swapped out on flush."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+        self._total = 0
+        self._oldest: float | None = None  # monotonic time of the first unflushed view
+        self._last_flush = time.monotonic()
+
+    def add(self, product_ids: List[int]) -> None:
+        with self._lock:
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._counts.update(product_ids)
+            self._total += len(product_ids)
+
+    def due(self) -> bool:
+        with self._lock:
+            if not self._counts:
+                return False
+            return (
+                len(self._counts) >= VIEW_FLUSH_MAX_PRODUCTS
+                or time.monotonic() - self._last_flush >= VIEW_FLUSH_SECONDS
+            )
+
+    def drain(self) -> Dict[int, int]:
+        with self._lock:
+            counts, self._counts = dict(self._counts), Counter()
+            self._total = 0
+            self._oldest = None
+            self._last_flush = time.monotonic()
+            return counts
+
+    def restore(self, counts: Dict[int, int]) -> None:
+        """Put back counts whose write failed so they go out with the next flush."""
+        with self._lock:
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._counts.update(counts)
+            self._total += sum(counts.values())
+
+    def pending(self) -> Tuple[int, int]:
+        """(distinct products, total views) waiting to be written."""
+        with self._lock:
+            return len(self._counts), self._total
+
+    def lag_seconds(self) -> float:
+        with self._lock:
+            return 0.0 if self._oldest is None else time.monotonic() - self._oldest
+
+
+class LiveTopK:
+    """Heaviest hitters of the current hour for this worker (Space-Saving)."""
+
+    def __init__(self, capacity: int = VIEW_LIVE_TOPK_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._hour: datetime | None = None
+        self._counts: Dict[int, int] = {}
+        # Min-heap of (count, product_id); entries go stale as counts grow and
+        # are skipped when popped
+        self._heap: List[Tuple[int, int]] = []
+
+    def _roll(self, now: datetime) -> None:
+        hour = hour_start(now)
+        if hour != self._hour:
+            self._hour = hour
+            self._counts.clear()
+            self._heap.clear()
+
+    def _evict_min(self) -> int:
+        while True:
+            count, product_id = heapq.heappop(self._heap)
+            if self._counts.get(product_id) == count:
+                del self._counts[product_id]
+                return count
+
+    def add(self, product_ids: Iterable[int], now: datetime | None = None) -> None:
+        with self._lock:
+            self._roll(now or utcnow())
+            for product_id in product_ids:
+                count = self._counts.get(product_id)
+                if count is None:
+                    count = self._evict_min() if len(self._counts) >= self.capacity else 0
+                count += 1
+                self._counts[product_id] = count
+                heapq.heappush(self._heap, (count, product_id))
+            if len(self._heap) > 4 * max(self.capacity, 1):
+                self._heap = [(c, p) for p, c in self._counts.items()]
+                heapq.heapify(self._heap)
+
+    def top(self, limit: int, now: datetime | None = None) -> List[Tuple[int, int]]:
+        """``[(product_id, views), ...]`` for the current hour, highest first."""
+        with self._lock:
+            self._roll(now or utcnow())
+            return heapq.nlargest(limit, self._counts.items(), key=lambda item: (item[1], -item[0]))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._hour = None
+            self._counts.clear()
+            self._heap.clear()
+
+
+buffer = ViewBuffer()
+live_top = LiveTopK()
@@ -1,31 +1,75 @@
+"""Product view counters, hourly/daily buckets and the top-N rollup.
+
+Views are buffered in memory (see ``recorder``) and flushed with one upsert per
+table into ``product_views`` (running total), ``product_view_hourly`` and
+``product_view_daily``. ``GET /product-views/top`` only reads the
+precomputed ``product_view_top`` rows, however old; the aggregate over the
+bucket tables runs in maintenance, never in a request.
+
+Maintenance (cron, or the ``product_views.maintain`` job), refreshes every
+window and prunes expired buckets:
+    python -m src.product_views.services
+
+The API processes enqueue that job every ``VIEW_TOP_REFRESH_SECONDS``
+(unless one is already queued), so with a job worker running the top keeps
+up without cron.
+
+Environment variables:
+    VIEW_TOP_SIZE (default 100)               rows kept per window
+    VIEW_TOP_REFRESH_SECONDS (default 300)    0 disables the periodic refresh
+    VIEW_HOURLY_RETENTION_HOURS (default 72)
+    VIEW_DAILY_RETENTION_DAYS (default 90)
+"""
+
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import and_, func, insert, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from src.entities.product_view import ProductView
+from src.entities.product_view_bucket import ProductViewDaily, ProductViewHourly
+from src.entities.product_view_top import ProductViewTop
 from src.entities.product import Product
-from sqlalchemy import func
+from src.jobs.services import enqueue_unique
+from . import models
+from .recorder import buffer, hour_start, live_top, utcnow
+
+logger = logging.getLogger(__name__)
 
 NOT_FOUND = "Product view not found"
 
+VIEW_TOP_SIZE = int(os.getenv("VIEW_TOP_SIZE", "100"))
+VIEW_TOP_REFRESH_SECONDS = float(os.getenv("VIEW_TOP_REFRESH_SECONDS", "300"))
+VIEW_HOURLY_RETENTION_HOURS = int(os.getenv("VIEW_HOURLY_RETENTION_HOURS", "72"))
+VIEW_DAILY_RETENTION_DAYS = int(os.getenv("VIEW_DAILY_RETENTION_DAYS", "90"))
 
-def get_or_create(db: Session, product_id: int) -> ProductView:
-    pv = db.query(ProductView).filter(ProductView.product_id == product_id).first()
-    if not pv:
-        # ensure product exists
-        product = db.query(Product).filter(Product.id == product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found")
-        pv = ProductView(product_id=product_id, view_count=0)
-        db.add(pv)
-        db.commit(); db.refresh(pv)
-    return pv
+# window -> (bucket table, length); windows are aligned to bucket boundaries,
+# e.g. "1h" at 10:05 covers 09:00-10:05
+WINDOWS = {
+    "1h": (ProductViewHourly, timedelta(hours=1)),
+    "24h": (ProductViewHourly, timedelta(hours=24)),
+    "7d": (ProductViewDaily, timedelta(days=7)),
+    "30d": (ProductViewDaily, timedelta(days=30)),
+}
 
+_UPSERT_CHUNK = 500
+
+MAINTAIN_JOB = "product_views.maintain"
 
-def increment_view(db: Session, product_id: int) -> ProductView:
-    pv = get_or_create(db, product_id)
-    pv.view_count += 1
-    pv.last_viewed_at = func.now()
-    db.commit(); db.refresh(pv)
-    return pv
+
+def day_start(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def window_start(window: str, now: datetime) -> datetime:
+    table, length = WINDOWS[window]
+    start = now - length
+    return hour_start(start) if table is ProductViewHourly else day_start(start)
 
 
 def get_view(db: Session, product_id: int) -> ProductView:
@@ -37,3 +81,177 @@ def get_view(db: Session, product_id: int) -> ProductView:
 
 def list_views(db: Session):
     return db.query(ProductView).all()
+
+
+def record_views(db: Session, product_ids: Iterable[int]) -> None:
+    """Count one view per id; written to the database by the next flush."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    buffer.add(product_ids)
+    live_top.add(product_ids)
+    if buffer.due():
+        flush_views(db.get_bind())
+
+
+def _upsert_increments(session: Session, table, keys: List[str], rows: List[Dict], extra_set: Dict | None = None) -> None:
+    """``INSERT ... ON CONFLICT (keys) DO UPDATE SET view_count = view_count + excluded.view_count``."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        _update_then_insert(session, table, keys, rows, extra_set)
+        return
+    for i in range(0, len(rows), _UPSERT_CHUNK):
+        stmt = upsert(table).values(rows[i:i + _UPSERT_CHUNK])
+        values = {"view_count": table.c.view_count + stmt.excluded.view_count}
+        for column in extra_set or ():
+            values[column] = stmt.excluded[column]
+        session.execute(stmt.on_conflict_do_update(index_elements=keys, set_=values))
+
+
+def _update_then_insert(session: Session, table, keys: List[str], rows: List[Dict], extra_set: Dict | None = None) -> None:
+    """Portable fallback for dialects without ``ON CONFLICT``: one UPDATE per row, one INSERT for the rest.
+
+    A row inserted concurrently by another flush makes the INSERT fail; the
+    caller then puts the counts back for the next flush.
+    """
+    missing = []
+    for row in rows:
+        values = {"view_count": table.c.view_count + row["view_count"]}
+        for column in extra_set or ():
+            values[column] = row[column]
+        matched = session.execute(
+            update(table).where(and_(*(table.c[key] == row[key] for key in keys))).values(values)
+        ).rowcount
+        if not matched:
+            missing.append(row)
+    if missing:
+        session.execute(insert(table), missing)
+
+
+def flush_views(bind: Engine | Connection, now: datetime | None = None) -> int:
+    """Write buffered views; returns the number of views written.
+
+    Uses its own session so the caller's transaction and loaded objects are
+    left alone. On failure the counts go back into the buffer.
+    """
+    counts = buffer.drain()
+    if not counts:
+        return 0
+    now = now or utcnow()
+    # Sorted ids keep lock order stable between concurrent flushes
+    ids = sorted(counts)
+    try:
+        with Session(bind=bind) as session:
+            _upsert_increments(
+                session, ProductView.__table__, ["product_id"],
+                [{"product_id": pid, "view_count": counts[pid], "last_viewed_at": now} for pid in ids],
+                extra_set=["last_viewed_at"],
+            )
+            for table, bucket in ((ProductViewHourly.__table__, hour_start(now)), (ProductViewDaily.__table__, day_start(now))):
+                _upsert_increments(
+                    session, table, ["product_id", "bucket_start"],
+                    [{"product_id": pid, "bucket_start": bucket, "view_count": counts[pid]} for pid in ids],
+                )
+            session.commit()
+    except SQLAlchemyError:
+        logger.exception("Flushing %d buffered product views failed", sum(counts.values()))
+        buffer.restore(counts)
+        return 0
+    return sum(counts.values())
+
+
+def compute_top(db: Session, window: str, limit: int, now: datetime | None = None) -> List[Tuple[int, int]]:
+    """Aggregate the window's buckets: ``[(product_id, views), ...]`` highest first."""
+    table, _ = WINDOWS[window]
+    total = func.sum(table.view_count).label("total")
+    rows = (
+        db.query(table.product_id, total)
+        .filter(table.bucket_start >= window_start(window, now or utcnow()))
+        .group_by(table.product_id)
+        .order_by(total.desc(), table.product_id)
+        .limit(limit)
+        .all()
+    )
+    return [(row.product_id, int(row.total)) for row in rows]
+
+
+def refresh_top(db: Session, windows: Iterable[str] | None = None, now: datetime | None = None) -> None:
+    now = now or utcnow()
+    for window in windows or WINDOWS:
+        top = compute_top(db, window, VIEW_TOP_SIZE, now)
+        db.query(ProductViewTop).filter(ProductViewTop.window == window).delete(synchronize_session=False)
+        db.add_all([
+            ProductViewTop(window=window, rank=rank, product_id=product_id, view_count=views, computed_at=now)
+            for rank, (product_id, views) in enumerate(top, start=1)
+        ])
+    db.commit()
+
+
+def top_products(db: Session, window: str, limit: int) -> List[models.TopProductResponse]:
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Unknown window, expected one of {', '.join(WINDOWS)}")
+    # Served as last computed by maintenance; a stale top is preferred to an aggregate per request
+    rows = (
+        db.query(ProductViewTop.rank, ProductViewTop.product_id, Product.name, ProductViewTop.view_count)
+        .join(Product, Product.id == ProductViewTop.product_id)
+        .filter(ProductViewTop.window == window)
+        .order_by(ProductViewTop.rank)
+        .limit(limit)
+        .all()
+    )
+    return [models.TopProductResponse(rank=r.rank, product_id=r.product_id, name=r.name, view_count=r.view_count) for r in rows]
+
+
+def live_top_products(db: Session, limit: int) -> List[models.TopProductResponse]:
+    """This worker's current-hour leaders, including views not yet flushed."""
+    top = live_top.top(limit)
+    names = dict(db.query(Product.id, Product.name).filter(Product.id.in_([pid for pid, _ in top])).all()) if top else {}
+    return [
+        models.TopProductResponse(rank=rank, product_id=pid, name=names.get(pid), view_count=views)
+        for rank, (pid, views) in enumerate(top, start=1)
+    ]
+
+
+def prune_buckets(db: Session, now: datetime | None = None) -> Tuple[int, int]:
+    now = now or utcnow()
+    hourly = (
+        db.query(ProductViewHourly)
+        .filter(ProductViewHourly.bucket_start < hour_start(now - timedelta(hours=VIEW_HOURLY_RETENTION_HOURS)))
+        .delete(synchronize_session=False)
+    )
+    daily = (
+        db.query(ProductViewDaily)
+        .filter(ProductViewDaily.bucket_start < day_start(now - timedelta(days=VIEW_DAILY_RETENTION_DAYS)))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return hourly, daily
+
+
+def schedule_maintenance(db: Session) -> None:
+    """Enqueue the ``product_views.maintain`` job unless one is already queued."""
+    enqueue_unique(db, MAINTAIN_JOB)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Refresh product view rollups and prune old buckets")
+    parser.add_argument("--skip-prune", action="store_true")
+    args = parser.parse_args(argv)
+
+    from src.database.core import SessionLocal
+
+    with SessionLocal() as db:
+        refresh_top(db)
+        logger.info("Refreshed top products for %s", ", ".join(WINDOWS))
+        if not args.skip_prune:
+            hourly, daily = prune_buckets(db)
+            logger.info("Pruned %d hourly and %d daily buckets", hourly, daily)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
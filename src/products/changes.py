@@ -0,0 +1,187 @@
+"""Catalog change feed backed by ``product_change_logs``.
+
+Every product change-log row is an event (``product.created``,
+``product.updated`` or ``product.deleted``) whose id is the log id, so the
+table itself is the durable, ordered feed:
+
+    GET /products/changes?since=<id>   catch-up page, ``X-Next-Cursor`` = last id
+    GET /products/changes/stream       Server-Sent Events, resumable via Last-Event-ID
+
+The in-process broadcaster only wakes the open streams of this worker after a
+change is committed; each stream then reads the new rows from the table.
+Streams also poll every ``CHANGES_POLL_SECONDS`` so changes written by other
+workers are picked up.
+
+Ids are taken when a log row is inserted, not when it commits, so a lower id
+can become visible after a higher one. Reads stop before a missing id until
+the row after it is ``CHANGES_GAP_SECONDS`` old; only then is the gap taken
+to be a rolled back insert and skipped. A cursor therefore never moves past
+an event that is still being committed.
+
+Environment variables:
+    CHANGES_POLL_SECONDS (default 2)
+    CHANGES_HEARTBEAT_SECONDS (default 15)
+    CHANGES_GAP_SECONDS (default 10)
+"""
+
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Sequence, Set, Tuple
+from fastapi import Request
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from src.entities.action_status import ActionStatus
+from src.entities.product_change_log import ProductChangeLog
+from . import models
+
+CHANGES_POLL_SECONDS = float(os.getenv("CHANGES_POLL_SECONDS", "2"))
+CHANGES_HEARTBEAT_SECONDS = float(os.getenv("CHANGES_HEARTBEAT_SECONDS", "15"))
+CHANGES_GAP_SECONDS = float(os.getenv("CHANGES_GAP_SECONDS", "10"))
+STREAM_BATCH_SIZE = 100
+
+ACTION_CREATE = "CREATE_PRODUCT"
+ACTION_UPDATE = "UPDATE_PRODUCT"
+ACTION_DELETE = "DELETE_PRODUCT"
+
+EVENT_TYPES = {
+    ACTION_CREATE: "product.created",
+    ACTION_UPDATE: "product.updated",
+    ACTION_DELETE: "product.deleted",
+}
+
+
+class ChangeBroadcaster:
+    """Wakes subscribed streams (possibly on other event loops) from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    def subscribe(self) -> Tuple[asyncio.AbstractEventLoop, asyncio.Event]:
+        subscription = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Tuple[asyncio.AbstractEventLoop, asyncio.Event]) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def notify(self) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, event in subscribers:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+broadcaster = ChangeBroadcaster()
+
+
+def notify_changes() -> None:
+    """Call after change-log rows are committed."""
+    broadcaster.notify()
+
+
+def list_changes(db: Session, since: int | None, limit: int) -> List[models.ProductChangeEvent]:
+    """Events with id greater than ``since``, oldest first, up to the first id gap that may still fill."""
+    query = (
+        db.query(
+            ProductChangeLog.id,
+            ProductChangeLog.product_id,
+            ActionStatus.name.label("action_name"),
+            ProductChangeLog.field_changed,
+            ProductChangeLog.old_value,
+            ProductChangeLog.new_value,
+            ProductChangeLog.changed_at,
+        )
+        .outerjoin(ActionStatus, ActionStatus.id == ProductChangeLog.action_id)
+    )
+    if since is not None:
+        query = query.filter(ProductChangeLog.id > since)
+    rows = query.order_by(ProductChangeLog.id).limit(limit).all()
+    return [to_event(row) for row in _committed_prefix(db, since, rows)]
+
+
+def _committed_prefix(db: Session, since: int | None, rows: Sequence) -> Sequence:
+    """Cut ``rows`` before the first missing id whose following row is younger than ``CHANGES_GAP_SECONDS``."""
+    expected = since + 1 if since is not None else None
+    now = None
+    for n, row in enumerate(rows):
+        if expected is not None and row.id != expected:
+            if now is None:
+                now = _database_now(db)
+            if now - row.changed_at < timedelta(seconds=CHANGES_GAP_SECONDS):
+                return rows[:n]
+        expected = row.id + 1
+    return rows
+
+
+def _database_now(db: Session) -> datetime:
+    # The clock behind the changed_at server default, naive like the column
+    return db.scalar(select(func.now())).replace(tzinfo=None)
+
+
+def latest_change_id(db: Session) -> int:
+    return db.query(func.max(ProductChangeLog.id)).scalar() or 0
+
+
+def to_event(row) -> models.ProductChangeEvent:
+    return models.ProductChangeEvent(
+        id=row.id,
+        type=EVENT_TYPES.get(row.action_name, "product.updated"),
+        product_id=row.product_id,
+        field=row.field_changed,
+        old_value=row.old_value,
+        new_value=row.new_value,
+        changed_at=str(row.changed_at),
+    )
+
+
+def _fetch(bind: Engine | Connection, since: int, limit: int) -> List[models.ProductChangeEvent]:
+    # Short-lived session per read: a stream must not hold a pooled connection while idle
+    with Session(bind=bind) as db:
+        return list_changes(db, since, limit)
+
+
+def format_event(event: models.ProductChangeEvent) -> str:
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.model_dump())}\n\n"
+
+
+async def stream_changes(request: Request, bind: Engine | Connection, since: int) -> AsyncIterator[str]:
+    subscription = broadcaster.subscribe()
+    _, wake = subscription
+    last_id = since
+    loop = asyncio.get_running_loop()
+    try:
+        yield f"retry: {int(CHANGES_POLL_SECONDS * 1000)}\n\n"
+        idle = 0.0
+        while not await request.is_disconnected():
+            wake.clear()
+            events = await loop.run_in_executor(None, _fetch, bind, last_id, STREAM_BATCH_SIZE)
+            for event in events:
+                yield format_event(event)
+                last_id = event.id
+            if len(events) == STREAM_BATCH_SIZE:
+                continue
+            if events:
+                idle = 0.0
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=CHANGES_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                idle += CHANGES_POLL_SECONDS
+                if idle >= CHANGES_HEARTBEAT_SECONDS:
+                    idle = 0.0
+                    # SSE comment; keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+    finally:
+        broadcaster.unsubscribe(subscription)
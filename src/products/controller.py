@@ -1,33 +1,122 @@
-from fastapi import APIRouter, Depends
+from typing import Annotated
+from fastapi import APIRouter, Depends, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from ..concurrency import etag_for, is_not_modified, set_etag
 from ..database.core import DbSession
-from . import models, services
+from ..pagination import DEFAULT_PAGE_SIZE, PageLimit, set_next_cursor
+from ..projections import parse_fields, projection_response
+from . import changes, models, services
 from ..auth.service import CurrentUser
-from ..roles.services import require_anonymous_or_admin_read_get, require_admin
+from ..permissions.policy import FULL_ACCESS, READ_PRODUCTS, RoleGrant, route_permissions
 
-router = APIRouter(prefix="/products", tags=["Products"])
+# Reads (including the POST batch lookup) need READ_PRODUCTS, everything else FULL_ACCESS
+permissions = route_permissions({
+    "GET": READ_PRODUCTS,
+    "POST /products/batch": READ_PRODUCTS,
+}, default=FULL_ACCESS)
 
+router = APIRouter(prefix="/products", tags=["Products"], dependencies=[Depends(permissions)])
 
-@router.get("/", response_model=list[models.ProductResponse], dependencies=[Depends(require_anonymous_or_admin_read_get)])
-def list_products(db: DbSession, current_user: CurrentUser):
-    return services.list_products(db, user_id=current_user.user_id)
 
+@router.get("/", response_model=list[models.ProductResponse])
+def list_products(db: DbSession, current_user: CurrentUser, fields: str | None = None):
+    """``fields`` selects columns (``fields=id,name,price``) or the ``summary`` projection."""
+    projection = parse_fields(fields, models.ProductResponse, services.PRODUCT_PROJECTIONS)
+    products = services.list_products(db, user_id=current_user.user_id, fields=projection)
+    if projection:
+        return projection_response(models.ProductResponse, projection, products)
+    return products
 
-@router.get("/{product_id}", response_model=models.ProductResponse, dependencies=[Depends(require_anonymous_or_admin_read_get)])
-def get_product(product_id: int, db: DbSession, current_user: CurrentUser):
-    return services.get_product(db, product_id, user_id=current_user.user_id)
 
+# Declared before /{product_id} so "batch" / "changes" are not parsed as ids.
+# Depends(permissions) hands over the role the router already checked.
+@router.get("/batch", response_model=models.ProductBatchResponse)
+def get_products_batch(ids: str, db: DbSession, role: RoleGrant = Depends(permissions)):
+    """Products for a comma separated id list (``?ids=1,2,3``); unknown ids are reported in ``missing``."""
+    return services.get_products_batch(db, services.parse_ids(ids), role)
 
-@router.post("/", response_model=models.ProductResponse, dependencies=[Depends(require_admin)])
+
+@router.post("/batch", response_model=models.ProductBatchResponse)
+def post_products_batch(batch: models.ProductBatchRequest, db: DbSession, role: RoleGrant = Depends(permissions)):
+    """Same as ``GET /products/batch`` for id lists too long for a query string."""
+    return services.get_products_batch(db, batch.ids, role)
+
+
+@router.patch("/status", response_model=models.ProductStatusBulkResponse)
+def set_products_status(batch: models.ProductStatusBulkRequest, db: DbSession, current_user: CurrentUser):
+    """Set ``status`` on many products with one UPDATE; logged and notified as a single change."""
+    return services.set_products_status(db, batch.ids, batch.status, user_id=current_user.user_id)
+
+
+@router.get("/changes", response_model=list[models.ProductChangeEvent])
+def list_changes(db: DbSession, response: Response, since: int | None = None, limit: PageLimit = DEFAULT_PAGE_SIZE):
+    """Catalog change events after ``since`` (an event id), oldest first."""
+    events = changes.list_changes(db, since, limit)
+    if events:
+        set_next_cursor(response, str(events[-1].id))
+    return events
+
+
+@router.get("/changes/stream")
+def stream_changes(
+    request: Request,
+    db: DbSession,
+    since: int | None = None,
+    last_event_id: Annotated[int | None, Header(alias="Last-Event-ID")] = None,
+):
+    """Server-Sent Events feed of catalog changes; without a position it starts at the newest change."""
+    start = last_event_id if last_event_id is not None else since
+    if start is None:
+        start = changes.latest_change_id(db)
+    return StreamingResponse(
+        changes.stream_changes(request, db.get_bind(), start),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{product_id}", response_model=models.ProductResponse)
+def get_product(
+    product_id: int,
+    db: DbSession,
+    current_user: CurrentUser,
+    response: Response,
+    fields: str | None = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    projection = parse_fields(fields, models.ProductResponse, services.PRODUCT_PROJECTIONS)
+    product = services.get_product(db, product_id, user_id=current_user.user_id, fields=projection, record_view=False)
+    # A revalidation answered with 304 is not a view
+    if not projection and is_not_modified(if_none_match, product.version):
+        return Response(status_code=304, headers={"ETag": etag_for(product.version)})
+    services.record_product_views(db, [product.id], current_user.user_id)
+    if projection:
+        return projection_response(models.ProductResponse, projection, product, many=False)
+    set_etag(response, product.version)
+    return product
+
+
+@router.post("/", response_model=models.ProductResponse)
 def create_product(current_user: CurrentUser, product_in: models.ProductCreate, db: DbSession):
     return services.create_product(db, product_in, creator_id=current_user.user_id)
 
 
-@router.put("/{product_id}", response_model=models.ProductResponse, dependencies=[Depends(require_admin)])
-def update_product(product_id: int, product_in: models.ProductUpdate, db: DbSession, current_user: CurrentUser):
-    return services.update_product(db, product_id, product_in, user_id=current_user.user_id)
+@router.put("/{product_id}", response_model=models.ProductResponse)
+def update_product(
+    product_id: int,
+    product_in: models.ProductUpdate,
+    db: DbSession,
+    current_user: CurrentUser,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    """``If-Match: "<version>"`` makes the update fail with 412 when the product changed since it was read."""
+    product = services.update_product(db, product_id, product_in, user_id=current_user.user_id, if_match=if_match)
+    set_etag(response, product.version)
+    return product
 
 
-@router.delete("/{product_id}", status_code=204, dependencies=[Depends(require_admin)])
-def soft_delete_product(product_id: int, db: DbSession, current_user: CurrentUser):
-    services.soft_delete_product(db, product_id, user_id=current_user.user_id)
+@router.delete("/{product_id}", status_code=204)
+def soft_delete_product(product_id: int, db: DbSession, current_user: CurrentUser, if_match: Annotated[str | None, Header()] = None):
+    services.soft_delete_product(db, product_id, user_id=current_user.user_id, if_match=if_match)
     return None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from decimal import Decimal
 
 class ProductBase(BaseModel):
@@ -24,5 +24,31 @@ class ProductUpdate(BaseModel):
 class ProductResponse(ProductBase):
     id: int
     created_by: int
+    version: int
     class Config:
         from_attributes = True
+
+
+class ProductBatchRequest(BaseModel):
+    ids: List[int]
+
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse]
+    missing: List[int]
+
+class ProductStatusBulkRequest(BaseModel):
+    ids: List[int]
+    status: bool
+
+class ProductStatusBulkResponse(BaseModel):
+    updated: List[int]
+    unchanged: List[int]
+
+class ProductChangeEvent(BaseModel):
+    id: int
+    type: str
+    product_id: int
+    field: str
+    old_value: Optional[str] = None
+    new_value: Optional[str] = None
+    changed_at: str
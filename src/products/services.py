@@ -1,42 +1,92 @@
+from typing import List, Tuple
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from . import models
 from src.entities.product import Product
 from src.entities.brand import Brand
 from src.entities.user import User
-from ..roles.services import get_user_role, ANONYMOUS_ROLE
+from ..roles.services import ANONYMOUS_ROLE
+from ..permissions.policy import RoleGrant, current_role
 from ..product_views import services as pv_services
 from ..product_change_logs import services as pcl_services
+from ..projections import SUMMARY, columns
+from ..concurrency import check_if_match, commit_or_conflict
+from ..database.constraints import register_constraint_errors, translate_integrity_errors
+from .changes import ACTION_DELETE, ACTION_UPDATE, notify_changes
 
+PRODUCT_PROJECTIONS = {SUMMARY: ("id", "sku", "name", "price")}
 
-def list_products(db: Session, user_id: int):
-    products = db.query(Product).all()
-    role = get_user_role(db, user_id)
-    if role.name == ANONYMOUS_ROLE:
-        for product in products:
-            pv_services.increment_view(db, product.id)
+BRAND_NOT_FOUND = "Brand not found"
+CREATOR_NOT_FOUND = "Creator user not found"
+
+register_constraint_errors({
+    "products_name_key": (400, "Product name already exists"),
+    "products_sku_key": (400, "Product SKU already exists"),
+    "products_brand_id_fkey": (404, BRAND_NOT_FOUND),
+    "products_created_by_fkey": (404, CREATOR_NOT_FOUND),
+})
+
+
+def list_products(db: Session, user_id: int, fields: Tuple[str, ...] | None = None):
+    """All products; with ``fields`` only those columns are selected (rows, not entities)."""
+    products = db.query(*columns(Product, fields)).all() if fields else db.query(Product).all()
+    record_product_views(db, [product.id for product in products], user_id)
     return products
 
 
-def get_product(db: Session, product_id: int, user_id: int) -> Product:
-    product = db.query(Product).filter(Product.id == product_id).first()
+def get_product(db: Session, product_id: int, user_id: int, fields: Tuple[str, ...] | None = None, record_view: bool = True) -> Product:
+    """``record_view=False`` leaves counting to the caller (``record_product_views``), e.g. after a 304 check."""
+    query = db.query(*columns(Product, fields)) if fields else db.query(Product)
+    product = query.filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    role =  get_user_role(db, user_id)
-    if role.name == ANONYMOUS_ROLE:
-        pv_services.increment_view(db, product.id)
+    if record_view:
+        record_product_views(db, [product.id], user_id)
     return product
 
 
+def record_product_views(db: Session, product_ids: List[int], user_id: int) -> None:
+    """Views are counted for anonymous visitors only."""
+    role = current_role(db, user_id)
+    if role.name == ANONYMOUS_ROLE:
+        pv_services.record_views(db, product_ids)
+
+
+BATCH_MAX_IDS = 500
+
+
+def parse_ids(raw: str) -> List[int]:
+    try:
+        return [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma separated list of integers")
+
+
+def get_products_batch(db: Session, ids: List[int], role: RoleGrant) -> models.ProductBatchResponse:
+    """Load many products with one ``IN`` query; unknown ids are listed in ``missing``."""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IDS} ids per request")
+    found = {p.id: p for p in db.query(Product).filter(Product.id.in_(ids)).all()} if ids else {}
+    if role.name == ANONYMOUS_ROLE:
+        pv_services.record_views(db, list(found))
+    return models.ProductBatchResponse(
+        products=[models.ProductResponse.model_validate(found[i]) for i in ids if i in found],
+        missing=[i for i in ids if i not in found],
+    )
+
+
+def _check_references(db: Session, brand_id: int | None, creator_id: int | None = None) -> None:
+    """Name the missing parent after a foreign key violation the driver did not identify."""
+    if brand_id is not None and not db.query(Brand.id).filter(Brand.id == brand_id).first():
+        raise HTTPException(status_code=404, detail=BRAND_NOT_FOUND)
+    if creator_id is not None and not db.query(User.id).filter(User.id == creator_id).first():
+        raise HTTPException(status_code=404, detail=CREATOR_NOT_FOUND)
+
+
 def create_product(db: Session, product_in: models.ProductCreate, creator_id: int) -> Product:
-    if db.query(Product).filter(Product.name == product_in.name).first():
-        raise HTTPException(status_code=400, detail="Product name already exists")
-    if db.query(Product).filter(Product.sku == product_in.sku).first():
-        raise HTTPException(status_code=400, detail="Product SKU already exists")
-    if not db.query(Brand).filter(Brand.id == product_in.brand_id).first():
-        raise HTTPException(status_code=404, detail="Brand not found")
-    if not db.query(User).filter(User.id == creator_id).first():
-        raise HTTPException(status_code=404, detail="Creator user not found")
+    # Uniqueness and references are enforced by the database constraints
     product = Product(
         sku=product_in.sku,
         name=product_in.name,
@@ -47,55 +97,88 @@ def create_product(db: Session, product_in: models.ProductCreate, creator_id: in
         created_by=creator_id
     )
     db.add(product)
-    db.commit(); db.refresh(product)
+    with translate_integrity_errors(db, resolve=lambda: _check_references(db, product_in.brand_id, creator_id)):
+        db.flush()
+        # Same transaction: a created product always has its feed event
+        pcl_services.log_product_created(db, product, creator_id)
+        db.commit()
+    db.refresh(product)
+    notify_changes()
     return product
 
 
-def update_product(db: Session, product_id: int, product_in: models.ProductUpdate, user_id: int) -> Product:
-    product = get_product(db, product_id, user_id)
-    before = {
+def _logged_fields(product: Product) -> dict:
+    return {
         "name": product.name,
         "sku": product.sku,
         "description": product.description,
-        "price": str(product.price),
+        # As stored by Numeric(10, 2), also before the UPDATE is written
+        "price": f"{product.price:.2f}",
         "brand_id": product.brand_id,
         "status": product.status,
     }
-    if product_in.name is not None and product_in.name != product.name:
-        if db.query(Product).filter(Product.name == product_in.name).first():
-            raise HTTPException(status_code=400, detail="Product name already exists")
+
+
+def update_product(db: Session, product_id: int, product_in: models.ProductUpdate, user_id: int, if_match: str | None = None) -> Product:
+    product = get_product(db, product_id, user_id)
+    check_if_match(if_match, product.version)
+    before = _logged_fields(product)
+    if product_in.name is not None:
         product.name = product_in.name
-    if product_in.sku is not None and product_in.sku != product.sku:
-        if db.query(Product).filter(Product.sku == product_in.sku).first():
-            raise HTTPException(status_code=400, detail="Product SKU already exists")
+    if product_in.sku is not None:
         product.sku = product_in.sku
     if product_in.description is not None:
         product.description = product_in.description
     if product_in.price is not None:
         product.price = product_in.price
     if product_in.brand_id is not None:
-        if not db.query(Brand).filter(Brand.id == product_in.brand_id).first():
-            raise HTTPException(status_code=404, detail="Brand not found")
         product.brand_id = product_in.brand_id
     if product_in.status is not None:
         product.status = product_in.status
-    db.commit(); db.refresh(product)
-    after = {
-        "name": product.name,
-        "sku": product.sku,
-        "description": product.description,
-        "price": str(product.price),
-        "brand_id": product.brand_id,
-        "status": product.status,
-    }
-    pcl_services.diff_and_log(db, product, before, after, user_id, action_name="UPDATE_PRODUCT")
+    # The logs go in with the UPDATE: one transaction, no lookups
+    logs = pcl_services.diff_and_log(db, product, before, _logged_fields(product), user_id, action_name=ACTION_UPDATE)
+    with translate_integrity_errors(db, resolve=lambda: _check_references(db, product_in.brand_id)):
+        commit_or_conflict(db)
+    db.refresh(product)
+    pcl_services.publish_changes(db, logs, ACTION_UPDATE, product)
     return product
 
 
-def soft_delete_product(db: Session, product_id: int, user_id: int) -> None:
+def set_status_where(db: Session, condition, status: bool, user_id: int, note: str | None = None) -> List[int]:
+    """Set ``status`` on every matching product with one ``UPDATE ... RETURNING``.
+
+    Products already in that status are left alone. The change logs are
+    written with one INSERT in the same transaction and admins get one
+    grouped notification. Returns the ids of the updated products.
+    """
+    action = pcl_services.get_or_create_action(db, ACTION_UPDATE if status else ACTION_DELETE)
+    rows = db.execute(
+        update(Product)
+        .where(condition, Product.status != status)
+        # Bulk UPDATEs skip the mapper's version counter, bump it here
+        .values(status=status, version=Product.version + 1)
+        .returning(Product.id, Product.name),
+        execution_options={"synchronize_session": False},
+    ).all()
+    pcl_services.log_bulk_change(db, rows, user_id, action, "status", str(not status), str(status), note=note)
+    return sorted(row.id for row in rows)
+
+
+def set_products_status(db: Session, ids: List[int], status: bool, user_id: int) -> models.ProductStatusBulkResponse:
+    """Bulk status change by id; ids that are unknown or already in ``status`` come back in ``unchanged``."""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IDS} ids per request")
+    updated = set_status_where(db, Product.id.in_(ids), status, user_id) if ids else []
+    done = set(updated)
+    return models.ProductStatusBulkResponse(updated=updated, unchanged=[i for i in ids if i not in done])
+
+
+def soft_delete_product(db: Session, product_id: int, user_id: int, if_match: str | None = None) -> None:
     product = get_product(db, product_id, user_id)
+    check_if_match(if_match, product.version)
     before = {"status": product.status}
     product.status = False
-    db.commit(); db.refresh(product)
-    after = {"status": product.status}
-    pcl_services.diff_and_log(db, product, before, after, user_id, action_name="DELETE_PRODUCT")
+    logs = pcl_services.diff_and_log(db, product, before, {"status": product.status}, user_id, action_name=ACTION_DELETE)
+    commit_or_conflict(db)
+    pcl_services.publish_changes(db, logs, ACTION_DELETE, product)
@@ -0,0 +1,264 @@
+"""On-demand request profiling.
+
+A request is profiled when it carries the profiling token, either as the
+``X-Profile-Token`` header or the ``profile`` query parameter, or when it is
+picked by the background sampling rate. The endpoint runs under a profiler
+(pyinstrument when installed, cProfile otherwise) and an HTML report with the
+SQL statements and their timings is written to
+``<PROFILING_DIR>/<METHOD>_<route>/<timestamp>-<request_id>.html``. Explicitly
+triggered requests get the report path back in ``X-Profile-Report``.
+
+Endpoints are profiled in the thread that runs them (sync endpoints run in the
+threadpool), so the report covers the endpoint body and everything it calls,
+not the dependencies resolved before it.
+
+Environment variables:
+    PROFILING_ENABLED       true|false (default false); when off nothing is profiled
+    PROFILING_TOKEN         secret that triggers profiling of a single request
+    PROFILING_SAMPLE_RATE   fraction of requests profiled in the background (default 0)
+    PROFILING_DIR           where reports are written (default ./profiles)
+    PROFILER                auto (default) | pyinstrument | cprofile
+"""
+
+import cProfile
+import functools
+import hmac
+import html
+import inspect
+import io
+import logging
+import os
+import pstats
+import random
+import re
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Tuple
+from urllib.parse import parse_qs
+
+import anyio
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .database.instrumentation import current_stats
+from .logging import current_request_id
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:  # optional dependency
+    _Pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_REPORT_HEADER = "X-Profile-Report"
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "./profiles")
+PROFILER = os.getenv("PROFILER", "auto").lower()
+
+_WRAPPED_MARKER = "__profiled__"
+
+
+@dataclass
+class ProfileRun:
+    explicit: bool
+    report: str | None = None  # HTML of the profiler section, set once the endpoint returns
+    profiler_name: str = ""
+
+
+_active_profile: ContextVar[ProfileRun | None] = ContextVar("active_profile", default=None)
+
+
+def _use_pyinstrument() -> bool:
+    if PROFILER == "cprofile":
+        return False
+    return _Pyinstrument is not None
+
+
+def _run_profiled(run: ProfileRun, call: Callable[[], Any]) -> Any:
+    if _use_pyinstrument():
+        profiler = _Pyinstrument(async_mode="disabled")
+        profiler.start()
+        try:
+            return call()
+        finally:
+            profiler.stop()
+            run.profiler_name = "pyinstrument"
+            run.report = profiler.output_html()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler already owns this thread (nested or concurrent run)
+        return call()
+    try:
+        return call()
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+        run.profiler_name = "cProfile"
+        run.report = f"<pre>{html.escape(out.getvalue())}</pre>"
+
+
+async def _run_profiled_async(run: ProfileRun, call: Callable[[], Any]) -> Any:
+    # Async endpoints run on the event loop thread, so other requests awaiting
+    # at the same time can show up in the profile.
+    if _use_pyinstrument():
+        profiler = _Pyinstrument(async_mode="enabled")
+        profiler.start()
+        try:
+            return await call()
+        finally:
+            profiler.stop()
+            run.profiler_name = "pyinstrument"
+            run.report = profiler.output_html()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return await call()
+    try:
+        return await call()
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+        run.profiler_name = "cProfile"
+        run.report = f"<pre>{html.escape(out.getvalue())}</pre>"
+
+
+def _profiled(endpoint: Callable) -> Callable:
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            run = _active_profile.get()
+            if run is None or run.report is not None:
+                return await endpoint(*args, **kwargs)
+            return await _run_profiled_async(run, lambda: endpoint(*args, **kwargs))
+
+        setattr(async_wrapper, _WRAPPED_MARKER, True)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        run = _active_profile.get()
+        if run is None or run.report is not None:
+            return endpoint(*args, **kwargs)
+        return _run_profiled(run, lambda: endpoint(*args, **kwargs))
+
+    setattr(wrapper, _WRAPPED_MARKER, True)
+    return wrapper
+
+
+def profile_routes(app: FastAPI) -> None:
+    """Wrap every API endpoint so it can run under the profiler.
+
+    Outside a profiled request the wrapper costs one contextvar lookup.
+    """
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        call = route.dependant.call
+        if call is None or getattr(call, _WRAPPED_MARKER, False):
+            continue
+        route.dependant.call = _profiled(call)
+
+
+def _has_token(scope: Scope) -> bool:
+    if not PROFILING_TOKEN:
+        return False
+    supplied = dict(scope["headers"]).get(PROFILE_TOKEN_HEADER.lower().encode(), b"").decode("latin-1")
+    if not supplied and scope.get("query_string"):
+        supplied = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY_PARAM, [""])[0]
+    return bool(supplied) and hmac.compare_digest(supplied, PROFILING_TOKEN)
+
+
+def _route_key(scope: Scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    return f"{scope['method']}_{re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_') or 'root'}"
+
+
+def report_path(scope: Scope) -> str:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    return os.path.join(PROFILING_DIR, _route_key(scope), f"{stamp}-{current_request_id() or 'request'}.html")
+
+
+def render_report(scope: Scope, run: ProfileRun, statements: List[Tuple[str, float]]) -> str:
+    route = getattr(scope.get("route"), "path", None) or scope["path"]
+    db_ms = sum(elapsed for _, elapsed in statements) * 1000
+    rows = "".join(
+        f"<tr><td>{elapsed * 1000:.2f}</td><td><code>{html.escape(statement)}</code></td></tr>"
+        for statement, elapsed in statements
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(scope['method'])} {html.escape(route)}</title></head><body>"
+        f"<h1>{html.escape(scope['method'])} {html.escape(route)}</h1>"
+        f"<p>request {html.escape(current_request_id() or '-')} &middot; {run.profiler_name} &middot; "
+        f"{len(statements)} SQL statements, {db_ms:.1f}ms in the database</p>"
+        f"<h2>SQL</h2><table><tr><th>ms</th><th>statement</th></tr>{rows}</table>"
+        f"<h2>Profile</h2>{run.report}"
+        "</body></html>"
+    )
+
+
+def _write_report(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(content)
+
+
+class ProfilingMiddleware:
+    """Decides per request whether to profile and writes the report afterwards.
+
+    Must sit inside ``QueryInstrumentationMiddleware`` so SQL timings can be captured.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not PROFILING_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        explicit = _has_token(scope)
+        if not explicit and not (PROFILING_SAMPLE_RATE and random.random() < PROFILING_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+
+        run = ProfileRun(explicit=explicit)
+        stats = current_stats()
+        if stats is not None:
+            stats.capture = True
+        path: str | None = None
+
+        async def send_with_report(message: Message) -> None:
+            nonlocal path
+            if message["type"] == "http.response.start" and run.report is not None:
+                path = report_path(scope)
+                if run.explicit:
+                    MutableHeaders(scope=message).append(PROFILE_REPORT_HEADER, path)
+            await send(message)
+
+        token = _active_profile.set(run)
+        try:
+            await self.app(scope, receive, send_with_report)
+        finally:
+            _active_profile.reset(token)
+            if path is not None:
+                content = render_report(scope, run, list(stats.statements) if stats else [])
+                try:
+                    await anyio.to_thread.run_sync(_write_report, path, content)
+                    logger.info("Profile of %s written to %s", _route_key(scope), path)
+                except OSError:
+                    logger.exception("Could not write profile report %s", path)
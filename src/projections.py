@@ -0,0 +1,54 @@
+"""Sparse fieldsets (``?fields=id,sku,name``) for read endpoints.
+
+The requested fields are pushed down into SQL as a column select, so only
+those columns are fetched and rows come back as plain tuples (no ORM
+entities, no identity map). Rows are serialized straight to JSON through a
+``TypeAdapter`` for a response model trimmed to the requested fields; models
+and adapters are cached per field set.
+
+``id`` is always included. Besides explicit lists, a resource can define named
+projections such as ``summary``.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple, Type
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+SUMMARY = "summary"
+
+
+def parse_fields(raw: str | None, model: Type[BaseModel], named: Dict[str, Tuple[str, ...]] | None = None) -> Tuple[str, ...] | None:
+    """Validated field names for ``raw``, or ``None`` when no projection was requested."""
+    if raw is None or not raw.strip():
+        return None
+    raw = raw.strip()
+    if named and raw in named:
+        return named[raw]
+    requested = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(["id", *requested]))
+
+
+def columns(entity, fields: Iterable[str]) -> List[Any]:
+    return [getattr(entity, name) for name in fields]
+
+
+@lru_cache(maxsize=256)
+def _adapter(model: Type[BaseModel], fields: Tuple[str, ...], many: bool) -> TypeAdapter:
+    projected = create_model(
+        f"{model.__name__}Projection",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (model.model_fields[name].annotation, ...) for name in fields},
+    )
+    return TypeAdapter(List[projected] if many else projected)
+
+
+def projection_response(model: Type[BaseModel], fields: Tuple[str, ...], data: Any, many: bool = True) -> Response:
+    adapter = _adapter(model, fields, many)
+    return Response(
+        content=adapter.dump_json(adapter.validate_python(data, from_attributes=True)),
+        media_type="application/json",
+    )
@@ -1,8 +1,11 @@
 from sqlalchemy.orm import Session
-from fastapi import HTTPException, Request, Depends
+from fastapi import HTTPException, Depends
 from typing import List
 from src.auth.service import CurrentUser
 from src.database.core import get_db
+from src.database.constraints import register_constraint_errors, translate_integrity_errors
+from src.notifications.recipients import invalidate_admin_recipients
+from src.permissions.policy import RoleGrant, current_role, invalidate_policy, invalidate_user_role
 
 from src.entities.role import Role
 from src.entities.user import User
@@ -11,6 +14,8 @@ from . import models
 
 ROLE_NOT_FOUND = "Role not found"
 
+register_constraint_errors({"roles_name_key": (400, "Role name already exists")})
+
 
 def list_roles(db: Session) -> List[Role]:
     return db.query(Role).all()
@@ -24,12 +29,11 @@ def get_role(db: Session, role_id: int) -> Role:
 
 
 def create_role(db: Session, role_in: models.RoleCreate) -> Role:
-    existing = db.query(Role).filter(Role.name == role_in.name).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Role name already exists")
     role = Role(name=role_in.name, description=role_in.description, status=role_in.status)
     db.add(role)
-    db.commit()
+    with translate_integrity_errors(db):
+        db.commit()
+    invalidate_policy()
     db.refresh(role)
     return role
 
@@ -37,16 +41,16 @@ def create_role(db: Session, role_in: models.RoleCreate) -> Role:
 def update_role(db: Session, role_id: int, role_in: models.RoleUpdate) -> Role:
     role = get_role(db, role_id)
     if role_in.name is not None:
-        if role_in.name != role.name:
-            exists = db.query(Role).filter(Role.name == role_in.name).first()
-            if exists:
-                raise HTTPException(status_code=400, detail="Role name already exists")
         role.name = role_in.name
     if role_in.description is not None:
         role.description = role_in.description
     if role_in.status is not None:
         role.status = role_in.status
-    db.commit()
+    with translate_integrity_errors(db):
+        db.commit()
+    invalidate_policy()
+    # A renamed role can gain or lose the admin name
+    invalidate_admin_recipients()
     db.refresh(role)
     return role
 
@@ -55,6 +59,7 @@ def soft_delete_role(db: Session, role_id: int) -> None:
     role = get_role(db, role_id)
     role.status = False
     db.commit()
+    invalidate_policy()
 
 
 def get_user_role(db: Session, user_id: int) -> Role:
@@ -80,6 +85,8 @@ def assign_role(db: Session, user_id: int, role_id: int) -> None:
     else:
         db.add(UserRole(user_id=user_id, role_id=role_id))
     db.commit()
+    invalidate_user_role(user_id)
+    invalidate_admin_recipients()
 
 
 # --- Role-based access helper dependencies ---
@@ -92,39 +99,20 @@ def get_current_user_role(db: Session, current_user: CurrentUser) -> Role:
     return get_user_role(db, current_user.user_id)
 
 
+# The checks below resolve the role through the cached policy (src.permissions.policy),
+# so a warm request authorizes without querying user_roles/roles.
+
 def require_role(required: str):
-    def dependency(current_user: CurrentUser, db: Session = Depends(get_db)):
-        role = get_user_role(db, current_user.user_id)
+    def dependency(current_user: CurrentUser, db: Session = Depends(get_db)) -> RoleGrant:
+        role = current_role(db, current_user.user_id)
         if role.name != required:
             raise HTTPException(status_code=403, detail=f"{required} role required")
         return role
     return dependency
 
 
-def require_admin(current_user: CurrentUser, db: Session = Depends(get_db)):
-    role = get_user_role(db, current_user.user_id)
+def require_admin(current_user: CurrentUser, db: Session = Depends(get_db)) -> RoleGrant:
+    role = current_role(db, current_user.user_id)
     if role.name != ADMIN_ROLE:
         raise HTTPException(status_code=403, detail="Admin role required")
     return role
-
-
-def require_anonymous_or_admin_read_get(current_user: CurrentUser, request: Request, db: Session = Depends(get_db)):
-    role = get_user_role(db, current_user.user_id)
-    if _is_admin(role):
-        return role
-    if _is_anonymous(role) and request.method == "GET":
-        return role
-    _deny_access()
-
-
-def _is_admin(role: Role) -> bool:
-    return role.name == ADMIN_ROLE
-
-
-def _is_anonymous(role: Role) -> bool:
-    return role.name == ANONYMOUS_ROLE
-
-
-def _deny_access():
-    raise HTTPException(status_code=403, detail="Not enough permissions")
-
@@ -7,6 +7,8 @@ from .entities.user import User
 from .entities.role import Role
 from .entities.user_role import UserRole
 
+logger = logging.getLogger(__name__)
+
 PRODUCTS_BATCH = [
     {"sku": "PILLOW-AIR-1", "name": "Almohada AirFlow", "description": "Ventilación avanzada", "price": 28.90, "brand": "DreamRest"},
     {"sku": "PILLOW-GEL-1", "name": "Almohada Gel Fresh", "description": "Capa gel refrescante", "price": 34.50, "brand": "ComfortPlus"},
@@ -24,22 +26,22 @@ BRAND_FALLBACKS = ["DreamRest", "ComfortPlus", "EcoHome", "UrbanLiving", "RelaxL
 
 def seed_products():
     if os.getenv("RUN_SEED_PRODUCTS", "false").lower() != "true":
-        logging.info("Product seeding skipped (set RUN_SEED_PRODUCTS=true to enable).")
+        logger.info("Product seeding skipped (set RUN_SEED_PRODUCTS=true to enable).")
         return
-    logging.info("Starting product batch seeding...")
+    logger.info("Starting product batch seeding...")
     db: Session = SessionLocal()
     try:
         admin_user_ids = _fetch_creators(db)
         if not admin_user_ids:
-            logging.warning("No admin users found; aborting product seed.")
+            logger.warning("No admin users found; aborting product seed.")
             return
         brand_cache = _ensure_brands(db)
         new_count = _insert_products(db, admin_user_ids, brand_cache)
         if new_count:
             db.commit()
-        logging.info(f"Inserted {new_count} new products (batch)")
+        logger.info("Inserted %d new products (batch)", new_count)
     except Exception as e:
-        logging.error(f"Product seeding failed: {e}")
+        logger.error("Product seeding failed: %s", e)
         db.rollback()
     finally:
         db.close()
@@ -60,7 +62,7 @@ def _ensure_brands(db: Session):
             b = Brand(name=bname, description=f"Brand {bname}")
             db.add(b); db.commit(); db.refresh(b)
             brand_cache[bname] = b.id
-            logging.info(f"Created brand {bname}")
+            logger.info("Created brand %s", bname)
     return brand_cache
 
 
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, status
+from datetime import datetime
+from fastapi import APIRouter, Response, status
 from typing import List
 from ..database.core import DbSession
 from ..auth.service import CurrentUser
+from ..pagination import DEFAULT_PAGE_SIZE, PageLimit, set_next_cursor
 from . import services as service
 from . import models
 
@@ -12,21 +14,61 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[models.UserChangeLogResponse])
-def list_logs(db: DbSession):
-    logs = service.list_all_logs(db)
-    return service.enrich_with_actions(db, logs)
+def list_logs(
+    db: DbSession,
+    response: Response,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    changed_by: int | None = None,
+    field: str | None = None,
+    cursor: str | None = None,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+):
+    logs, next_cursor = service.list_logs(
+        db, since=since, until=until, action=action, changed_by=changed_by,
+        field=field, cursor=cursor, limit=limit,
+    )
+    set_next_cursor(response, next_cursor)
+    return logs
 
 
 @router.get("/user/{user_id}", response_model=List[models.UserChangeLogResponse])
-def list_user_logs(user_id: int, db: DbSession):
-    logs = service.list_user_logs(db, user_id)
-    return service.enrich_with_actions(db, logs)
+def list_user_logs(
+    user_id: int,
+    db: DbSession,
+    response: Response,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    changed_by: int | None = None,
+    field: str | None = None,
+    cursor: str | None = None,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+):
+    logs, next_cursor = service.list_logs(
+        db, user_id=user_id, since=since, until=until, action=action,
+        changed_by=changed_by, field=field, cursor=cursor, limit=limit,
+    )
+    set_next_cursor(response, next_cursor)
+    return logs
 
 
 @router.get("/me", response_model=List[models.UserChangeLogResponse])
-def my_logs(current_user: CurrentUser, db: DbSession):
-    logs = service.list_user_logs(db, current_user.user_id)
-    return service.enrich_with_actions(db, logs)
+def my_logs(
+    current_user: CurrentUser,
+    db: DbSession,
+    response: Response,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+):
+    logs, next_cursor = service.list_logs(
+        db, user_id=current_user.user_id, since=since, until=until, cursor=cursor, limit=limit,
+    )
+    set_next_cursor(response, next_cursor)
+    return logs
 
 
 @router.get("/actions", response_model=List[models.ActionStatusResponse])
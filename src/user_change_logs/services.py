@@ -1,9 +1,11 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from typing import List
+from typing import List, Tuple
 from src.entities.action_status import ActionStatus
 from src.entities.user_change_log import UserChangeLog
 from src.entities.user import User
+from src.pagination import DEFAULT_PAGE_SIZE, seek, split_page
 from . import models
 
 ACTION_NOT_FOUND = "Action not found"
@@ -54,30 +56,59 @@ def log_user_change(db: Session, user_id: int, changed_by: int, action_name: str
     return log
 
 
-def list_user_logs(db: Session, user_id: int) -> List[UserChangeLog]:
-    return db.query(UserChangeLog).filter(UserChangeLog.user_id == user_id).order_by(UserChangeLog.changed_at.desc()).all()
-
-
-def list_all_logs(db: Session) -> List[UserChangeLog]:
-    return db.query(UserChangeLog).order_by(UserChangeLog.changed_at.desc()).all()
-
-
-def to_response(log: UserChangeLog, action_lookup: dict[int, str]) -> models.UserChangeLogResponse:
+def list_logs(
+    db: Session,
+    user_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    changed_by: int | None = None,
+    field: str | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Tuple[List[models.UserChangeLogResponse], str | None]:
+    """One page of logs, newest first, with the action name joined in."""
+    query = (
+        db.query(
+            UserChangeLog.id,
+            UserChangeLog.user_id,
+            UserChangeLog.changed_by,
+            UserChangeLog.action_id,
+            ActionStatus.name.label("action_name"),
+            UserChangeLog.field_changed,
+            UserChangeLog.old_value,
+            UserChangeLog.new_value,
+            UserChangeLog.changed_at,
+        )
+        .outerjoin(ActionStatus, ActionStatus.id == UserChangeLog.action_id)
+    )
+    if user_id is not None:
+        query = query.filter(UserChangeLog.user_id == user_id)
+    # Bounds on the partition key let Postgres prune monthly partitions
+    if since is not None:
+        query = query.filter(UserChangeLog.changed_at >= since)
+    if until is not None:
+        query = query.filter(UserChangeLog.changed_at < until)
+    if action is not None:
+        query = query.filter(ActionStatus.name == action)
+    if changed_by is not None:
+        query = query.filter(UserChangeLog.changed_by == changed_by)
+    if field is not None:
+        query = query.filter(UserChangeLog.field_changed == field)
+    rows = seek(query, UserChangeLog.changed_at, UserChangeLog.id, cursor, limit).all()
+    rows, next_cursor = split_page(rows, limit, "changed_at")
+    return [to_response(r) for r in rows], next_cursor
+
+
+def to_response(row) -> models.UserChangeLogResponse:
     return models.UserChangeLogResponse(
-        id=log.id,
-        user_id=log.user_id,
-        changed_by=log.changed_by,
-        action_id=log.action_id,
-        action_name=action_lookup.get(log.action_id),
-        field_changed=log.field_changed,
-        old_value=log.old_value,
-        new_value=log.new_value,
-        changed_at=str(log.changed_at)
+        id=row.id,
+        user_id=row.user_id,
+        changed_by=row.changed_by,
+        action_id=row.action_id,
+        action_name=row.action_name,
+        field_changed=row.field_changed,
+        old_value=row.old_value,
+        new_value=row.new_value,
+        changed_at=str(row.changed_at)
     )
-
-
-def enrich_with_actions(db: Session, logs: List[UserChangeLog]) -> List[models.UserChangeLogResponse]:
-    action_ids = {l.action_id for l in logs}
-    actions = db.query(ActionStatus).filter(ActionStatus.id.in_(action_ids)).all() if action_ids else []
-    lookup = {a.id: a.name for a in actions}
-    return [to_response(l, lookup) for l in logs]
@@ -1,23 +1,82 @@
-from fastapi import APIRouter, status, Depends
+from typing import Annotated
+from fastapi import APIRouter, status, Depends, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from ..database.core import DbSession
 from . import models
-from . import service
+from . import provisioning, service
 from ..auth.service import CurrentUser
-from ..roles.services import require_admin
+from ..concurrency import etag_for, is_not_modified, set_etag
+from ..pagination import DEFAULT_PAGE_SIZE, PageLimit, set_next_cursor
+from ..projections import parse_fields, projection_response
+from ..permissions.policy import FULL_ACCESS, route_permissions
 
+# User administration needs FULL_ACCESS; a user's own profile and password do not
 router = APIRouter(
     prefix="/users",
-    tags=["Users"]
+    tags=["Users"],
+    dependencies=[Depends(route_permissions({
+        "GET /users/me": None,
+        "PUT /users/change-password": None,
+    }, default=FULL_ACCESS))],
 )
 
-@router.get("/", response_model=list[models.UserResponse], dependencies=[Depends(require_admin)])
-def get_all_users(db: DbSession):
-    return service.get_users(db)
+@router.get("/", response_model=list[models.UserResponse])
+def list_users(
+    db: DbSession,
+    response: Response,
+    q: str | None = None,
+    status: bool | None = None,
+    role: str | None = None,
+    fields: str | None = None,
+    cursor: str | None = None,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+):
+    """User directory, newest first: ``q`` searches email/name prefixes; next page cursor in ``X-Next-Cursor``."""
+    projection = parse_fields(fields, models.UserResponse, service.USER_PROJECTIONS)
+    users, next_cursor = service.list_users(db, q=q, status=status, role=role, fields=projection, cursor=cursor, limit=limit)
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return projection_response(models.UserResponse, projection, users)
+    return users
+
+@router.post("/provision", response_model=models.ProvisionReport)
+async def provision_users(request: Request, db: DbSession, role: str | None = None, stream: bool = False):
+    """Create users from a ``text/csv`` or ``application/x-ndjson`` body; ``role`` is the default role name.
+
+    Returns the per-row outcomes; with ``stream=true`` the response is NDJSON
+    progress lines followed by the report.
+    """
+    fmt = provisioning.detect_format(content_type=request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+    too_large = HTTPException(status_code=413, detail=f"At most {provisioning.PROVISION_MAX_BYTES} bytes per request")
+    if int(request.headers.get("content-length") or 0) > provisioning.PROVISION_MAX_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > provisioning.PROVISION_MAX_BYTES:
+            raise too_large
+    try:
+        # Decoding and parsing up to PROVISION_MAX_ROWS rows is CPU work: keep it off the event loop
+        rows = await run_in_threadpool(provisioning.decode_rows, bytes(body), fmt, provisioning.PROVISION_MAX_ROWS + 1)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8")
+    if len(rows) > provisioning.PROVISION_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {provisioning.PROVISION_MAX_ROWS} rows per request")
+    if stream:
+        return StreamingResponse(provisioning.stream_provision(db.get_bind(), rows, role), media_type="application/x-ndjson")
+    return await run_in_threadpool(provisioning.provision, db, rows, role)
 
 @router.get("/me", response_model=models.UserResponse)
-def get_current_user(current_user: CurrentUser, db: DbSession):
-    return service.get_user_by_id(db, current_user.user_id)
+def get_current_user(current_user: CurrentUser, db: DbSession, response: Response, if_none_match: Annotated[str | None, Header()] = None):
+    user = service.get_user_by_id(db, current_user.user_id)
+    if is_not_modified(if_none_match, user.version):
+        return Response(status_code=304, headers={"ETag": etag_for(user.version)})
+    set_etag(response, user.version)
+    return user
 
 
 @router.put("/change-password", status_code=status.HTTP_200_OK)
@@ -29,12 +88,21 @@ def change_password(
     service.change_password(db, current_user.user_id, password_change)
 
 
-@router.put("/{user_id}", response_model=models.UserResponse, dependencies=[Depends(require_admin)])
-def update_user(user_id: int, update_in: models.UserUpdate, db: DbSession, current_user: CurrentUser):
-    return service.update_user(db, user_id, update_in, admin_user=current_user)
+@router.put("/{user_id}", response_model=models.UserResponse)
+def update_user(
+    user_id: int,
+    update_in: models.UserUpdate,
+    db: DbSession,
+    current_user: CurrentUser,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    user = service.update_user(db, user_id, update_in, admin_user=current_user, if_match=if_match)
+    set_etag(response, user.version)
+    return user
 
 
-@router.delete("/{user_id}", status_code=204, dependencies=[Depends(require_admin)])
-def soft_delete_user(user_id: int, db: DbSession, current_user: CurrentUser):
-    service.soft_delete_user(db, user_id, admin_user=current_user)
+@router.delete("/{user_id}", status_code=204)
+def soft_delete_user(user_id: int, db: DbSession, current_user: CurrentUser, if_match: Annotated[str | None, Header()] = None):
+    service.soft_delete_user(db, user_id, admin_user=current_user, if_match=if_match)
     return None
@@ -6,6 +6,7 @@ class UserResponse(BaseModel):
     email: EmailStr
     first_name: str
     last_name: str
+    version: int
 
 
 class UserUpdate(BaseModel):
@@ -19,3 +20,29 @@ class PasswordChange(BaseModel):
     current_password: str
     new_password: str
     new_password_confirm: str
+
+
+class ProvisionUser(BaseModel):
+    """One row of a bulk provisioning file (CSV header or NDJSON keys)."""
+    email: EmailStr
+    first_name: str
+    last_name: str
+    password: str
+    role: str | None = None
+
+
+class ProvisionRowResult(BaseModel):
+    row: int  # 1-based data row (CSV header excluded) / NDJSON line
+    email: str | None = None
+    status: str  # created | duplicate | invalid | failed
+    user_id: int | None = None
+    error: str | None = None
+
+
+class ProvisionReport(BaseModel):
+    total: int
+    created: int
+    duplicates: int
+    invalid: int
+    failed: int
+    results: list[ProvisionRowResult]
@@ -0,0 +1,303 @@
+"""Bulk user provisioning from CSV or NDJSON.
+
+Rows carry ``email``, ``first_name``, ``last_name``, ``password`` and an
+optional ``role`` (name; rows without one get the default role, if any):
+
+    validate each row -> drop emails repeated in the file or already taken
+    (one ``lower(email) IN (...)`` query per chunk) -> resolve role names
+    (one query) -> hash passwords across a process pool -> per chunk, one
+    multi-row INSERT into users and one into user_roles, then commit
+
+Hashing runs ahead of the inserts, so the database work overlaps it. Every
+row gets an outcome in the report (created, duplicate, invalid, or failed
+when the database rejects its chunk for another reason) and
+``progress(done, total)`` is called after each chunk.
+
+    POST /users/provision?role=customer   body text/csv or application/x-ndjson;
+                                          ?stream=true streams NDJSON progress lines
+    python -m src.users.provisioning users.csv --role customer --report outcomes.ndjson
+
+Environment variables:
+    PROVISION_WORKERS (default: CPU count, 0 hashes in-process)
+    PROVISION_CHUNK_SIZE (default 1000)
+    PROVISION_MAX_ROWS (default 50000)   per API request; the CLI has no limit
+    PROVISION_MAX_BYTES (default 32 MiB)  API request body size, checked before reading it
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Set, Tuple
+from pydantic import ValidationError
+from sqlalchemy import func, insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.auth.service import get_password_hash
+from src.entities.role import Role
+from src.entities.user import User
+from src.entities.user_role import UserRole
+from src.notifications.recipients import invalidate_admin_recipients
+from . import models
+
+logger = logging.getLogger(__name__)
+
+PROVISION_WORKERS = int(os.getenv("PROVISION_WORKERS", str(os.cpu_count() or 1)))
+PROVISION_CHUNK_SIZE = int(os.getenv("PROVISION_CHUNK_SIZE", "1000"))
+PROVISION_MAX_ROWS = int(os.getenv("PROVISION_MAX_ROWS", "50000"))
+PROVISION_MAX_BYTES = int(os.getenv("PROVISION_MAX_BYTES", str(32 * 1024 * 1024)))
+
+CSV = "csv"
+NDJSON = "ndjson"
+MEDIA_TYPES = {"text/csv": CSV, "application/x-ndjson": NDJSON, "application/ndjson": NDJSON}
+EXTENSIONS = {".csv": CSV, ".ndjson": NDJSON, ".jsonl": NDJSON}
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+FAILED = "failed"
+
+Progress = Callable[[int, int], None]
+# A parsed row: the raw fields, or the parse error for that line
+RawRow = Dict[str, str | None] | str
+
+
+def detect_format(content_type: str | None = None, filename: str | None = None) -> str | None:
+    if filename:
+        return EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+    return MEDIA_TYPES.get((content_type or "").split(";")[0].strip().lower())
+
+
+def parse_rows(text: str, fmt: str, limit: int | None = None) -> List[RawRow]:
+    """Parse the rows of ``text``; with ``limit`` parsing stops after that many rows."""
+    if fmt == CSV:
+        return [
+            {key: value or None for key, value in row.items() if key is not None}
+            for row in islice(csv.DictReader(io.StringIO(text)), limit)
+        ]
+    rows: List[RawRow] = []
+    for line in io.StringIO(text):
+        if limit is not None and len(rows) >= limit:
+            break
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            rows.append(f"Invalid JSON: {e.msg}")
+            continue
+        rows.append(row if isinstance(row, dict) else "Expected a JSON object")
+    return rows
+
+
+def decode_rows(body: bytes, fmt: str, limit: int | None = None) -> List[RawRow]:
+    """``parse_rows`` for a request body; raises ``UnicodeDecodeError`` unless it is UTF-8."""
+    return parse_rows(body.decode("utf-8-sig"), fmt, limit)
+
+
+def _validate(raw: RawRow) -> models.ProvisionUser | str:
+    if isinstance(raw, str):
+        return raw
+    try:
+        return models.ProvisionUser.model_validate(raw)
+    except ValidationError as e:
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+
+@contextmanager
+def password_hasher(workers: int) -> Iterator[Callable[[List[str]], Iterable[str]]]:
+    """Yields ``hash_many(passwords)``, an ordered lazy iterator of bcrypt hashes."""
+    if workers <= 0:
+        yield lambda passwords: map(get_password_hash, passwords)
+        return
+    # Spawned, not forked: forking a process that runs threads (the server) is unsafe
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield lambda passwords: pool.map(get_password_hash, passwords, chunksize=max(1, min(64, len(passwords) // (workers * 4))))
+    finally:
+        # Drop hashes not started yet when the run stops early (error or cancelled job)
+        pool.shutdown(cancel_futures=True)
+
+
+def _taken_emails(db: Session, emails: Sequence[str], chunk_size: int) -> Set[str]:
+    """Lower-cased emails that already belong to a user (served by ``ix_users_email_lower``)."""
+    lowered = [email.lower() for email in emails]
+    taken: Set[str] = set()
+    for start in range(0, len(lowered), chunk_size):
+        batch = lowered[start:start + chunk_size]
+        taken.update(email for (email,) in db.query(func.lower(User.email)).filter(func.lower(User.email).in_(batch)))
+    return taken
+
+
+def _insert_chunk(db: Session, chunk: Sequence[Tuple[int, models.ProvisionUser, int | None]], hashes: Sequence[str]) -> Dict[str, int]:
+    rows = db.execute(
+        insert(User).returning(User.id, User.email),
+        [
+            {"email": user.email, "first_name": user.first_name, "last_name": user.last_name, "password": hashed}
+            for (_, user, _), hashed in zip(chunk, hashes)
+        ],
+    ).all()
+    # RETURNING order is not guaranteed for multi-row inserts
+    ids = {row.email: row.id for row in rows}
+    assignments = [{"user_id": ids[user.email], "role_id": role_id} for _, user, role_id in chunk if role_id is not None]
+    if assignments:
+        db.execute(insert(UserRole), assignments)
+    db.commit()
+    return ids
+
+
+def provision(
+    db: Session,
+    rows: Sequence[RawRow],
+    default_role: str | None = None,
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    progress: Progress | None = None,
+) -> models.ProvisionReport:
+    """``workers`` / ``chunk_size`` default to ``PROVISION_WORKERS`` / ``PROVISION_CHUNK_SIZE``."""
+    workers = PROVISION_WORKERS if workers is None else workers
+    chunk_size = chunk_size or PROVISION_CHUNK_SIZE
+    total = len(rows)
+    results: List[models.ProvisionRowResult | None] = [None] * total
+
+    def outcome(i: int, email: str | None, status: str, user_id: int | None = None, error: str | None = None) -> None:
+        results[i] = models.ProvisionRowResult(row=i + 1, email=email, status=status, user_id=user_id, error=error)
+
+    valid: List[Tuple[int, models.ProvisionUser]] = []
+    seen: Set[str] = set()
+    for i, raw in enumerate(rows):
+        user = _validate(raw)
+        if isinstance(user, str):
+            outcome(i, raw.get("email") if isinstance(raw, dict) else None, INVALID, error=user)
+        elif user.email.lower() in seen:
+            outcome(i, user.email, DUPLICATE, error="Email repeated in the file")
+        else:
+            seen.add(user.email.lower())
+            valid.append((i, user))
+
+    taken = _taken_emails(db, [user.email for _, user in valid], chunk_size)
+    role_names = {user.role or default_role for _, user in valid} - {None}
+    role_ids = dict(db.query(Role.name, Role.id).filter(Role.name.in_(role_names)).all()) if role_names else {}
+    pending: List[Tuple[int, models.ProvisionUser, int | None]] = []
+    for i, user in valid:
+        role = user.role or default_role
+        if user.email.lower() in taken:
+            outcome(i, user.email, DUPLICATE, error="Email already in use")
+        elif role is not None and role not in role_ids:
+            outcome(i, user.email, INVALID, error=f"Role not found: {role}")
+        else:
+            pending.append((i, user, role_ids.get(role)))
+
+    done = total - len(pending)
+    if progress:
+        progress(done, total)
+    with password_hasher(workers) as hash_many:
+        hashes = iter(hash_many([user.password for _, user, _ in pending]))
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            chunk_hashes = list(islice(hashes, len(chunk)))
+            try:
+                ids = _insert_chunk(db, chunk, chunk_hashes)
+            except IntegrityError:
+                # An email was taken since the check: mark those rows and retry the rest once
+                db.rollback()
+                raced = _taken_emails(db, [user.email for _, user, _ in chunk], chunk_size)
+                keep = [n for n, (_, user, _) in enumerate(chunk) if user.email.lower() not in raced]
+                for i, user, _ in chunk:
+                    if user.email.lower() in raced:
+                        outcome(i, user.email, DUPLICATE, error="Email already in use")
+                try:
+                    ids = _insert_chunk(db, [chunk[n] for n in keep], [chunk_hashes[n] for n in keep]) if keep else {}
+                except IntegrityError as e:
+                    # Not (only) a race on emails, e.g. a role deleted since it was resolved,
+                    # or another race: give up on this chunk and go on with the next
+                    db.rollback()
+                    logger.warning("Provisioning chunk of %d rows failed: %s", len(keep), e.orig)
+                    for n in keep:
+                        i, user, _ = chunk[n]
+                        outcome(i, user.email, FAILED, error=f"Insert failed: {e.orig}")
+                    ids = {}
+            for i, user, _ in chunk:
+                if user.email in ids:
+                    outcome(i, user.email, CREATED, user_id=ids[user.email])
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+
+    if any(role_id is not None for _, _, role_id in pending):
+        invalidate_admin_recipients()
+    counts = {status: sum(r.status == status for r in results) for status in (CREATED, DUPLICATE, INVALID, FAILED)}
+    logger.info(
+        "Provisioned %d of %d users (%d duplicates, %d invalid, %d failed)",
+        counts[CREATED], total, counts[DUPLICATE], counts[INVALID], counts[FAILED],
+    )
+    return models.ProvisionReport(
+        total=total, created=counts[CREATED], duplicates=counts[DUPLICATE], invalid=counts[INVALID],
+        failed=counts[FAILED], results=results,
+    )
+
+
+def stream_provision(bind: Engine | Connection, rows: Sequence[RawRow], default_role: str | None = None) -> Iterator[str]:
+    """NDJSON lines: ``{"type": "progress", ...}`` per chunk, then ``{"type": "report", ...}``.
+
+    Runs on its own session and thread so progress is sent while the job runs.
+    """
+    events: "queue.Queue[dict | None]" = queue.Queue()
+
+    def run() -> None:
+        try:
+            with Session(bind=bind) as db:
+                report = provision(db, rows, default_role, progress=lambda done, total: events.put({"type": "progress", "done": done, "total": total}))
+            events.put({"type": "report", **report.model_dump()})
+        except Exception as e:
+            logger.exception("Bulk provisioning failed")
+            events.put({"type": "error", "detail": str(e)})
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, name="provision-users", daemon=True).start()
+    while (event := events.get()) is not None:
+        yield json.dumps(event) + "\n"
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Provision users from a CSV or NDJSON file")
+    parser.add_argument("path")
+    parser.add_argument("--role", help="Role for rows without a role column")
+    parser.add_argument("--format", choices=[CSV, NDJSON], help="Default: from the file extension")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--report", help="Write the per-row outcomes to this NDJSON file")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(filename=args.path)
+    if fmt is None:
+        parser.error("Cannot tell the format from the file name, pass --format")
+    with open(args.path, encoding="utf-8-sig") as f:
+        rows = parse_rows(f.read(), fmt)
+
+    from src.database.core import SessionLocal
+
+    with SessionLocal() as db:
+        report = provision(
+            db, rows, args.role, workers=args.workers, chunk_size=args.chunk_size,
+            progress=lambda done, total: logger.info("Processed %d/%d rows", done, total),
+        )
+    if args.report:
+        with open(args.report, "w") as f:
+            f.writelines(result.model_dump_json() + "\n" for result in report.results)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,24 +1,74 @@
+from typing import Tuple
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
-from fastapi import HTTPException
 from . import models
+from src.entities.role import Role
 from src.entities.user import User
+from src.entities.user_role import UserRole
 from src.exceptions import UserNotFoundError, InvalidPasswordError, PasswordMismatchError
+from src.concurrency import check_if_match, commit_or_conflict
+from src.pagination import DEFAULT_PAGE_SIZE, seek, split_page
+from src.projections import SUMMARY, columns
+from src.database.constraints import translate_integrity_errors
 from src.auth.service import verify_password, get_password_hash, CurrentUser
 from src.user_change_logs import services as change_log_service
 from src.notifications.services import send_admin_notifications_for_user_change
+from src.notifications.recipients import invalidate_admin_recipients
 import logging
 
-def get_users(db: Session) -> list[models.UserResponse]:
-    users = db.query(User).all()
-    logging.info(f"Successfully retrieved {len(users)} users.")
-    return users
+logger = logging.getLogger(__name__)
+
+USER_PROJECTIONS = {SUMMARY: ("id", "email")}
+# Directory columns: the response fields only, so ``password`` is never read
+DIRECTORY_FIELDS = tuple(models.UserResponse.model_fields)
+
+
+def _prefix_pattern(q: str) -> str:
+    escaped = q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def list_users(
+    db: Session,
+    q: str | None = None,
+    status: bool | None = None,
+    role: str | None = None,
+    fields: Tuple[str, ...] | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Tuple[list, str | None]:
+    """One page of the user directory, newest first, as column rows.
+
+    ``q`` is a case-insensitive prefix of the email, first or last name
+    (served by the ``lower(...)`` indexes); ``role`` filters by role name.
+    """
+    query = db.query(*columns(User, fields or DIRECTORY_FIELDS), User.created_at)
+    if q:
+        pattern = _prefix_pattern(q)
+        query = query.filter(or_(
+            func.lower(User.email).like(pattern, escape="\\"),
+            func.lower(User.first_name).like(pattern, escape="\\"),
+            func.lower(User.last_name).like(pattern, escape="\\"),
+        ))
+    if status is not None:
+        query = query.filter(User.status == status)
+    if role is not None:
+        query = (
+            query.join(UserRole, UserRole.user_id == User.id)
+            .join(Role, Role.id == UserRole.role_id)
+            .filter(Role.name == role)
+        )
+    rows = seek(query, User.created_at, User.id, cursor, limit).all()
+    rows, next_cursor = split_page(rows, limit, "created_at")
+    logger.debug("Successfully retrieved %d users.", len(rows))
+    return rows, next_cursor
 
 def get_user_by_id(db: Session, user_id: int) -> models.UserResponse:
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
-        logging.warning(f"User not found with ID: {user_id}")
+        logger.warning("User not found with ID: %s", user_id)
         raise UserNotFoundError(user_id)
-    logging.info(f"Successfully retrieved user with ID: {user_id}")
+    logger.debug("Successfully retrieved user with ID: %s", user_id)
     return user
 
 
@@ -27,15 +77,15 @@ def change_password(db: Session, user_id: int, password_change: models.PasswordC
         user = get_user_by_id(db, user_id)
         
         if not verify_password(password_change.current_password, user.password):
-            logging.warning(f"Invalid current password provided for user ID: {user_id}")
+            logger.warning("Invalid current password provided for user ID: %s", user_id)
             raise InvalidPasswordError()
         
         if password_change.new_password != password_change.new_password_confirm:
-            logging.warning(f"Password mismatch during change attempt for user ID: {user_id}")
+            logger.warning("Password mismatch during change attempt for user ID: %s", user_id)
             raise PasswordMismatchError()
         
         user.password = get_password_hash(password_change.new_password)
-        db.commit()
+        commit_or_conflict(db)
         logs = []
         try:
             log = change_log_service.log_user_change(
@@ -49,19 +99,20 @@ def change_password(db: Session, user_id: int, password_change: models.PasswordC
             )
             logs.append(log)
         except Exception as le:
-            logging.error(f"Failed to log password change for user {user_id}: {le}")
+            logger.error("Failed to log password change for user %s: %s", user_id, le)
         if logs:
-            send_admin_notifications_for_user_change(db, logs)
-        logging.info(f"Successfully changed password for user ID: {user_id}")
+            send_admin_notifications_for_user_change(db, logs, user=user, changer=user)
+        logger.info("Successfully changed password for user ID: %s", user_id)
     except Exception as e:
-        logging.error(f"Error during password change for user ID: {user_id}. Error: {str(e)}")
+        logger.error("Error during password change for user ID: %s. Error: %s", user_id, e)
         raise
 
 
-def update_user(db: Session, target_user_id: int, update_in: models.UserUpdate, admin_user: CurrentUser) -> User:
+def update_user(db: Session, target_user_id: int, update_in: models.UserUpdate, admin_user: CurrentUser, if_match: str | None = None) -> User:
     user = db.query(User).filter(User.id == target_user_id).first()
     if not user:
         raise UserNotFoundError(target_user_id)
+    check_if_match(if_match, user.version)
 
     def snapshot(u: User):
         return {
@@ -83,24 +134,23 @@ def update_user(db: Session, target_user_id: int, update_in: models.UserUpdate,
         if value is not None:
             setattr(user, field, value)
 
-    _update_user_email(db, user, update_in)
+    if update_in.email is not None:
+        user.email = update_in.email
 
-    db.commit()
+    # users_email_key violations map to 400 "Email already in use"
+    with translate_integrity_errors(db):
+        commit_or_conflict(db)
     db.refresh(user)
     after = snapshot(user)
+    if (before["status"], before["email"]) != (after["status"], after["email"]):
+        invalidate_admin_recipients()
 
-    _log_user_changes(db, target_user_id, admin_user.user_id, before, after)
+    _log_user_changes(db, user, admin_user.user_id, before, after)
 
     return user
 
-def _update_user_email(db: Session, user: User, update_in: models.UserUpdate) -> None:
-    if update_in.email is not None and update_in.email != user.email:
-        exists = db.query(User).filter(User.email == update_in.email, User.id != user.id).first()
-        if exists:
-            raise HTTPException(status_code=400, detail="Email already in use")
-        user.email = update_in.email
-
-def _log_user_changes(db: Session, target_user_id: int, changed_by: int, before: dict, after: dict) -> None:
+def _log_user_changes(db: Session, user: User, changed_by: int, before: dict, after: dict) -> None:
+    target_user_id = user.id
     logs = []
     for field, old_val in before.items():
         new_val = after[field]
@@ -118,20 +168,22 @@ def _log_user_changes(db: Session, target_user_id: int, changed_by: int, before:
             )
             logs.append(log)
         except Exception as le:
-            logging.error(f"Failed to log user update for user {target_user_id}: {le}")
+            logger.error("Failed to log user update for user %s: %s", target_user_id, le)
     if logs:
-        send_admin_notifications_for_user_change(db, logs)
+        send_admin_notifications_for_user_change(db, logs, user=user)
 
 
-def soft_delete_user(db: Session, target_user_id: int, admin_user: CurrentUser) -> None:
+def soft_delete_user(db: Session, target_user_id: int, admin_user: CurrentUser, if_match: str | None = None) -> None:
     user = db.query(User).filter(User.id == target_user_id).first()
     if not user:
         raise UserNotFoundError(target_user_id)
+    check_if_match(if_match, user.version)
     if not user.status:
         return
     old_status = user.status
     user.status = False
-    db.commit()
+    commit_or_conflict(db)
+    invalidate_admin_recipients()
     logs = []
     try:
         log = change_log_service.log_user_change(
@@ -145,6 +197,6 @@ def soft_delete_user(db: Session, target_user_id: int, admin_user: CurrentUser)
         )
         logs.append(log)
     except Exception as le:
-        logging.error(f"Failed to log user soft delete for user {target_user_id}: {le}")
+        logger.error("Failed to log user soft delete for user %s: %s", target_user_id, le)
     if logs:
-        send_admin_notifications_for_user_change(db, logs)
+        send_admin_notifications_for_user_change(db, logs, user=user)
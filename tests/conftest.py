@@ -1,11 +1,24 @@
+import os
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker
 
+# Fail the request (and the test) when an endpoint exceeds its query budget
+os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+os.environ.setdefault("QUERY_BUDGET_DEFAULT", "60")
+
 from src.main import app
+from src.auth.service import get_password_hash
 from src.database.core import Base, get_db
+from src.database.constraints import enable_sqlite_foreign_keys
+from src.database.instrumentation import instrument_engine
+from src.entities.brand import Brand
+from src.entities.role import Role
+from src.entities.user import User
+from src.entities.user_role import UserRole
+from src.seed import seed_access_control
 
 # Use an in-memory SQLite database for fast tests
 TEST_DATABASE_URL = "sqlite+pysqlite:///:memory:"
@@ -15,12 +28,17 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,  # Ensures the same in-memory DB is reused across connections
 )
+instrument_engine(engine)
+enable_sqlite_foreign_keys(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_db():
     Base.metadata.create_all(bind=engine)
+    # The routers authorize through these roles and permissions
+    with TestingSessionLocal() as db:
+        seed_access_control(db)
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -48,3 +66,62 @@ app.dependency_overrides[get_db] = override_get_db
 @pytest.fixture()
 def client():
     return TestClient(app)
+
+
+@pytest.fixture()
+def sql_statements():
+    """Statements executed on the test engine while the fixture is active."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
+ADMIN_EMAIL = "admin@test.com"
+ADMIN_PASS = "Admin123!"
+
+
+def seed_admin(db):
+    """The admin user (idempotent: the database lives for the whole session)."""
+    admin_role = db.query(Role).filter_by(name="admin").first()
+    admin_user = db.query(User).filter_by(email=ADMIN_EMAIL).first()
+    if not admin_user:
+        admin_user = User(email=ADMIN_EMAIL, first_name="Admin", last_name="User", password=get_password_hash(ADMIN_PASS))
+        db.add(admin_user); db.commit(); db.refresh(admin_user)
+    if not db.query(UserRole).filter_by(user_id=admin_user.id, role_id=admin_role.id).first():
+        db.add(UserRole(user_id=admin_user.id, role_id=admin_role.id)); db.commit()
+    return admin_user
+
+
+def seed_brand(db, name: str = "BrandX"):
+    brand = db.query(Brand).filter_by(name=name).first()
+    if not brand:
+        brand = Brand(name=name, description="Test brand")
+        db.add(brand); db.commit(); db.refresh(brand)
+    return brand
+
+
+def login(client: TestClient, email: str = ADMIN_EMAIL, password: str = ADMIN_PASS):
+    resp = client.post("/auth/token", data={"username": email, "password": password})
+    assert resp.status_code == 200, resp.text
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+@pytest.fixture()
+def admin(db_session):
+    return seed_admin(db_session)
+
+
+@pytest.fixture()
+def brand(db_session):
+    return seed_brand(db_session)
+
+
+@pytest.fixture()
+def admin_headers(client, admin):
+    """Authorization header of a logged-in admin."""
+    return login(client)
@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from src.entities.user import User
+from src.entities.admin_notification import AdminNotification
+from src.entities.notification_event import NotificationEvent
+from src.entities.notification_status import NotificationStatus
+from src.permissions.policy import invalidate_policy
+from tests.conftest import ADMIN_EMAIL
+
+
+def seed_notifications(db: Session, user: User, count: int):
+    status = db.query(NotificationStatus).filter_by(name="SENT").first()
+    if not status:
+        status = NotificationStatus(name="SENT", description="SENT")
+        db.add(status); db.commit(); db.refresh(status)
+    events = [NotificationEvent(subject=f"subject {i}", message=f"body {i}") for i in range(count)]
+    db.add_all(events); db.flush()
+    db.add_all([AdminNotification(event_id=e.id, sent_to=user.id, status_id=status.id) for e in events])
+    db.commit()
+
+
+def test_list_notifications_single_statement(client: TestClient, db_session: Session, admin, admin_headers, sql_statements):
+
+    seed_notifications(db_session, admin, 1)
+    invalidate_policy()
+    sql_statements.clear()
+    assert client.get("/admin-notifications/", headers=admin_headers).status_code == 200
+    # Cold policy: compile the matrix, look up the user's role, then list
+    assert len(sql_statements) == 3
+
+    seed_notifications(db_session, admin, 10)
+    sql_statements.clear()
+    resp = client.get("/admin-notifications/", headers=admin_headers)
+    assert resp.status_code == 200
+    assert len(resp.json()) >= 11
+    # Warm policy: one listing statement regardless of page size
+    assert len(sql_statements) == 1
+    assert sum("admin_notifications" in s for s in sql_statements) == 1
+
+
+def test_notification_message_only_on_request(client: TestClient, db_session: Session, admin, admin_headers, sql_statements):
+    seed_notifications(db_session, admin, 2)
+
+    sql_statements.clear()
+    resp = client.get("/admin-notifications/me", headers=admin_headers)
+    assert resp.status_code == 200
+    item = resp.json()[0]
+    assert "message" not in item
+    assert item["sent_to_email"] == ADMIN_EMAIL and item["status"] == "SENT"
+    listing = [s for s in sql_statements if "admin_notifications" in s]
+    assert len(listing) == 1 and "notification_events.message" not in listing[0]
+
+    resp = client.get("/admin-notifications/me", params={"include": "message"}, headers=admin_headers)
+    assert resp.status_code == 200
+    assert resp.json()[0]["message"].startswith("body")
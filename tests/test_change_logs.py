@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+from src.pagination import NEXT_CURSOR_HEADER
+
+
+def create_product_with_history(client: TestClient, headers: dict, brand_id: int, sku: str, updates: int):
+    payload = {"sku": sku, "name": f"Prod {sku}", "price": 10.00, "brand_id": brand_id}
+    resp = client.post("/products/", json=payload, headers=headers)
+    assert resp.status_code == 200, resp.text
+    product_id = resp.json()["id"]
+    for i in range(updates):
+        resp = client.put(f"/products/{product_id}", json={"price": 11 + i}, headers=headers)
+        assert resp.status_code == 200, resp.text
+    return product_id
+
+
+def test_product_change_logs_keyset_pages(client: TestClient, brand, admin_headers):
+    product_id = create_product_with_history(client, admin_headers, brand.id, "SKU-LOG-1", updates=5)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get(f"/product-change-logs/product/{product_id}", params=params, headers=admin_headers)
+        assert resp.status_code == 200, resp.text
+        page = resp.json()
+        assert len(page) <= 2
+        seen.extend(log["id"] for log in page)
+        cursor = resp.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    # 5 updates plus the creation entry
+    assert len(seen) == 6
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_product_change_logs_filters_and_limit(client: TestClient, admin, brand, admin_headers):
+    product_id = create_product_with_history(client, admin_headers, brand.id, "SKU-LOG-2", updates=2)
+
+    resp = client.get(f"/product-change-logs/product/{product_id}",
+                      params={"field": "price", "action": "UPDATE_PRODUCT", "changed_by": admin.id},
+                      headers=admin_headers)
+    assert resp.status_code == 200, resp.text
+    logs = resp.json()
+    assert len(logs) == 2
+    assert all(l["action_name"] == "UPDATE_PRODUCT" and l["field_changed"] == "price" for l in logs)
+
+    assert client.get("/product-change-logs/", params={"limit": 1000}, headers=admin_headers).status_code == 422
+    assert client.get("/product-change-logs/", params={"cursor": "not-a-cursor"}, headers=admin_headers).status_code == 400
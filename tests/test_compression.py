@@ -0,0 +1,41 @@
+import gzip
+from fastapi.testclient import TestClient
+from src import compression
+from src.compression import CompressedCache, choose_encoding
+
+
+def test_choose_encoding_honours_q_values():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding(None) is None
+    assert choose_encoding("*") in compression.ENCODERS
+
+
+def test_large_json_is_gzipped_and_cached(client: TestClient, monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION_MIN_SIZE", 10)
+    compression.cache.clear()
+    for _ in range(2):
+        resp = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+        assert resp.status_code == 200
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in resp.headers["Vary"]
+        assert resp.json()["info"]["title"] == "Products Catalog API"
+    assert compression.cache.hits == 1
+
+
+def test_small_bodies_and_identity_are_not_compressed(client: TestClient):
+    resp = client.get("/health/live", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in resp.headers
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    resp = client.get("/openapi.json", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in resp.headers
+
+
+def test_cache_evicts_least_recently_used():
+    cache = CompressedCache(max_entries=2)
+    bodies = [bytes([i]) * 100 for i in range(3)]
+    for body in bodies:
+        assert gzip.decompress(cache.compress("gzip", body)) == body
+    cache.compress("gzip", bodies[0])
+    assert cache.hits == 0 and cache.misses == 4
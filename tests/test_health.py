@@ -0,0 +1,35 @@
+from fastapi.testclient import TestClient
+from src.health import services
+
+
+def test_liveness(client: TestClient):
+    resp = client.get("/health/live")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok"}
+
+
+def test_readiness_reports_checks_and_is_cached(client: TestClient, sql_statements):
+    services.reset_cache()
+    resp = client.get("/health/ready")
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["status"] == "ok"
+    assert body["checks"]["database"]["status"] == "ok"
+    assert body["checks"]["notification_backlog"]["pending"] >= 0
+
+    sql_statements.clear()
+    assert client.get("/health/ready").json() == body
+    assert sql_statements == []
+
+
+def test_readiness_degraded_on_backlog_threshold(client: TestClient, monkeypatch):
+    services.reset_cache()
+    monkeypatch.setattr(services, "HEALTH_NOTIFICATION_BACKLOG_WARN", -1)
+    resp = client.get("/health/ready")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "degraded"
+
+    services.reset_cache()
+    monkeypatch.setattr(services, "HEALTH_FAIL_ON_DEGRADED", True)
+    assert client.get("/health/ready").status_code == 503
+    services.reset_cache()
@@ -0,0 +1,21 @@
+import pytest
+from fastapi.testclient import TestClient
+from src.database import instrumentation
+from src.database.instrumentation import QueryBudgetExceeded
+
+
+def test_server_timing_reports_query_count(client: TestClient, admin_headers, sql_statements):
+    sql_statements.clear()
+    resp = client.get("/users/me", headers=admin_headers)
+    assert resp.status_code == 200
+    timing = resp.headers["Server-Timing"]
+    assert timing.startswith("db;dur=")
+    assert f'desc="{len(sql_statements)} queries"' in timing
+
+
+def test_query_budget_fails_request(client: TestClient, admin_headers, monkeypatch):
+    # The role check is served from the policy cache; the listing alone exceeds 0
+    monkeypatch.setitem(instrumentation.QUERY_BUDGETS, "GET /users/", 0)
+    monkeypatch.setattr(instrumentation, "QUERY_BUDGET_MODE", instrumentation.QUERY_BUDGET_MODE_RAISE)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/users/", headers=admin_headers)
@@ -0,0 +1,136 @@
+import threading
+import time
+from datetime import timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from src.entities.job import Job
+from src.entities.job_secret import JobSecret
+from src.entities.user import User
+from src.jobs import services
+from src.jobs.worker import JobWorker
+from src.users import provisioning
+from tests.conftest import engine
+
+
+@services.register_job("tests.cancel_self")
+def cancel_self(ctx: services.JobContext):
+    services.cancel_job(ctx.db, ctx.job_id)
+    ctx.progress(1, 2)
+    return {"finished": True}
+
+
+blocked = threading.Event()
+release = threading.Event()
+
+
+@services.register_job("tests.block")
+def block(ctx: services.JobContext):
+    blocked.set()
+    release.wait(10)
+    return {}
+
+
+@services.register_job("tests.fail")
+def fail(ctx: services.JobContext):
+    raise ValueError("boom")
+
+
+def test_job_runs_in_worker_with_progress(client: TestClient, db_session: Session, admin_headers, monkeypatch):
+    monkeypatch.setattr(provisioning, "PROVISION_WORKERS", 0)
+    monkeypatch.setattr(provisioning, "PROVISION_CHUNK_SIZE", 2)
+    rows = [{"email": f"job{i}@test.com", "first_name": "Job", "last_name": str(i), "password": "Secret123!"} for i in range(3)]
+
+    resp = client.post("/jobs/", json={"kind": "users.provision", "payload": {"rows": rows}}, headers=admin_headers)
+    assert resp.status_code == 202, resp.text
+    job = resp.json()
+    assert job["status"] == "queued"
+    assert resp.headers["Location"] == f"/jobs/{job['id']}"
+    # Plaintext passwords are staged apart from the job row and gone once claimed
+    assert "rows" not in db_session.get(Job, job["id"]).payload
+    assert db_session.get(JobSecret, job["id"]) is not None
+
+    worker = JobWorker(engine)
+    assert worker.run_once()
+    job = client.get(f"/jobs/{job['id']}", headers=admin_headers).json()
+    assert job["status"] == "succeeded"
+    assert (job["progress_done"], job["progress_total"]) == (3, 3)
+    assert job["result"]["created"] == 3
+    db_session.expire_all()
+    assert db_session.get(JobSecret, job["id"]) is None
+    assert not worker.run_once()
+
+    assert client.post("/jobs/", json={"kind": "nope"}, headers=admin_headers).status_code == 400
+    assert client.get("/jobs/999999", headers=admin_headers).status_code == 404
+
+
+def test_job_cancellation_and_failure(client: TestClient, admin_headers):
+    worker = JobWorker(engine)
+
+    queued = client.post("/jobs/", json={"kind": "tests.fail"}, headers=admin_headers).json()
+    resp = client.post(f"/jobs/{queued['id']}/cancel", headers=admin_headers)
+    assert resp.json()["status"] == "cancelled"
+    assert client.post(f"/jobs/{queued['id']}/cancel", headers=admin_headers).status_code == 409
+    assert not worker.run_once()
+
+    running = client.post("/jobs/", json={"kind": "tests.cancel_self"}, headers=admin_headers).json()
+    assert worker.run_once()
+    job = client.get(f"/jobs/{running['id']}", headers=admin_headers).json()
+    assert (job["status"], job["cancel_requested"], job["result"]) == ("cancelled", True, None)
+
+    failing = client.post("/jobs/", json={"kind": "tests.fail"}, headers=admin_headers).json()
+    assert worker.run_once()
+    job = client.get(f"/jobs/{failing['id']}", headers=admin_headers).json()
+    assert (job["status"], job["error"]) == ("failed", "boom")
+
+
+def test_stale_running_job_is_requeued(client: TestClient, db_session: Session, admin_headers, monkeypatch):
+    job_id = client.post("/jobs/", json={"kind": "tests.fail"}, headers=admin_headers).json()["id"]
+    # Claimed by a worker that then died
+    assert services.claim_next(db_session, "dead-worker").id == job_id
+    stale = services.utcnow() - timedelta(seconds=services.JOB_STALE_SECONDS + 1)
+    db_session.query(Job).filter(Job.id == job_id).update({"heartbeat_at": stale}); db_session.commit()
+
+    services.requeue_stale(db_session)
+    job = client.get(f"/jobs/{job_id}", headers=admin_headers).json()
+    assert (job["status"], job["attempts"]) == ("queued", 1)
+
+    monkeypatch.setattr(services, "JOB_MAX_ATTEMPTS", 1)
+    services.claim_next(db_session, "dead-worker")
+    db_session.query(Job).filter(Job.id == job_id).update({"heartbeat_at": stale}); db_session.commit()
+    services.requeue_stale(db_session)
+    job = client.get(f"/jobs/{job_id}", headers=admin_headers).json()
+    assert (job["status"], job["error"]) == ("failed", "Worker stopped responding")
+
+
+def test_requeued_provisioning_job_fails_without_its_rows(client: TestClient, db_session: Session, admin_headers):
+    rows = [{"email": "lost@test.com", "first_name": "Lost", "last_name": "Row", "password": "Secret123!"}]
+    job_id = client.post("/jobs/", json={"kind": "users.provision", "payload": {"rows": rows}}, headers=admin_headers).json()["id"]
+    # The claim hands the rows to the (then dying) worker and deletes them
+    assert services.claim_next(db_session, "dead-worker").payload["rows"] == rows
+    assert db_session.get(JobSecret, job_id) is None
+    stale = services.utcnow() - timedelta(seconds=services.JOB_STALE_SECONDS + 1)
+    db_session.query(Job).filter(Job.id == job_id).update({"heartbeat_at": stale}); db_session.commit()
+    services.requeue_stale(db_session)
+
+    assert JobWorker(engine).run_once()
+    job = client.get(f"/jobs/{job_id}", headers=admin_headers).json()
+    assert (job["status"], job["error"]) == ("failed", "Rows are missing or no longer available; submit the file again")
+    assert db_session.query(User).filter_by(email="lost@test.com").count() == 0
+
+
+def test_stop_waits_at_most_the_timeout(client: TestClient, admin_headers):
+    job_id = client.post("/jobs/", json={"kind": "tests.block"}, headers=admin_headers).json()["id"]
+    worker = JobWorker(engine, threads=1, poll_seconds=0.01)
+    worker.start()
+    try:
+        assert blocked.wait(5)
+        started = time.monotonic()
+        worker.stop(timeout=0.2)
+        assert time.monotonic() - started < 2
+    finally:
+        release.set()
+    # The cut-short thread still finishes its job when the process lives on
+    deadline = time.monotonic() + 5
+    while client.get(f"/jobs/{job_id}", headers=admin_headers).json()["status"] != "succeeded" and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert client.get(f"/jobs/{job_id}", headers=admin_headers).json()["status"] == "succeeded"
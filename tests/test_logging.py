@@ -0,0 +1,29 @@
+import json
+import logging
+from fastapi.testclient import TestClient
+from src.logging import JsonFormatter, RequestContextFilter, parse_module_levels, REQUEST_ID_HEADER
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord("src.users.service", logging.INFO, __file__, 1, "retrieved %d users", (3,), None)
+    record.db_queries = 2
+    RequestContextFilter().filter(record)
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["message"] == "retrieved 3 users"
+    assert payload["logger"] == "src.users.service"
+    assert payload["db_queries"] == 2
+    assert payload["request_id"] == "-"
+
+
+def test_parse_module_levels():
+    assert parse_module_levels("src.users=debug, sqlalchemy.engine=WARNING,bad") == {
+        "src.users": "DEBUG",
+        "sqlalchemy.engine": "WARNING",
+    }
+
+
+def test_request_id_is_echoed_or_generated(client: TestClient):
+    resp = client.get("/health/live", headers={REQUEST_ID_HEADER: "abc-123"})
+    assert resp.headers[REQUEST_ID_HEADER] == "abc-123"
+    generated = client.get("/health/live").headers[REQUEST_ID_HEADER]
+    assert len(generated) == 32
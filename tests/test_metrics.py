@@ -0,0 +1,32 @@
+import os
+from fastapi.testclient import TestClient
+from src.metrics import services
+
+
+def test_metrics_endpoint_exposes_request_and_domain_metrics(client: TestClient):
+    assert client.get("/health").status_code == 200
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/health"}' in body
+    assert "admin_notifications_pending" in body
+
+
+def test_unknown_paths_share_one_route_label(client: TestClient):
+    client.get("/no-such-path/123")
+    client.get("/no-such-path/456")
+    body = client.get("/metrics").text
+    assert 'route="unmatched",status="404"' in body
+    assert "/no-such-path/123" not in body
+
+
+def test_stopped_worker_drops_its_live_gauges(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    monkeypatch.setattr(services, "MULTIPROCESS_MODE", True)
+    pid = os.getpid()
+    for name in (f"gauge_livesum_{pid}.db", f"gauge_livemax_{pid}.db", f"gauge_livesum_{pid + 1}.db", f"counter_{pid}.db"):
+        (tmp_path / name).write_bytes(b"")
+    services.mark_worker_dead()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"counter_{pid}.db", f"gauge_livesum_{pid + 1}.db"]
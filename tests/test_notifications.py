@@ -0,0 +1,256 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from src.auth.service import get_password_hash
+from src.entities.user import User
+from src.entities.role import Role
+from src.entities.user_role import UserRole
+from src.entities.admin_notification import AdminNotification
+from src.entities.notification_event import NotificationEvent
+from src.entities.notification_status import NotificationStatus
+from src.entities.job import Job
+from src.jobs.worker import JobWorker
+from src.notifications import digest, services, transports
+from src.notifications.recipients import invalidate_admin_recipients
+from src.notifications.transports import MemoryTransport, OutgoingEmail, SendGridTransport, SMTPTransport
+from tests.conftest import ADMIN_PASS
+
+
+def seed_second_admin(db: Session):
+    second = db.query(User).filter_by(email="admin2@test.com").first()
+    if not second:
+        second = User(email="admin2@test.com", first_name="Second", last_name="Admin", password=get_password_hash(ADMIN_PASS))
+        db.add(second); db.commit(); db.refresh(second)
+        admin_role = db.query(Role).filter_by(name="admin").first()
+        db.add(UserRole(user_id=second.id, role_id=admin_role.id)); db.commit()
+        invalidate_admin_recipients()
+    return second
+
+
+def _clear_digest(db: Session):
+    digest.claim(db)
+    db.commit()
+
+
+@pytest.fixture
+def sent_mail(monkeypatch, db_session: Session):
+    """Enable email in digest mode through an in-memory transport; yields its outbox."""
+    transport = MemoryTransport()
+    monkeypatch.setattr(services, "ENABLE_EMAIL_NOTIFICATIONS", True)
+    monkeypatch.setattr(services, "NOTIFICATION_SENDER", "no-reply@test.com")
+    monkeypatch.setattr(digest, "NOTIFICATION_DIGEST_ENABLED", True)
+    monkeypatch.setattr(digest, "NOTIFICATION_DIGEST_SECONDS", 3600)
+    previous = transports.set_transport(transport)
+    invalidate_admin_recipients()
+    _clear_digest(db_session)
+    yield transport.outbox
+    _clear_digest(db_session)
+    transports.set_transport(previous)
+
+
+def test_digest_coalesces_changes_and_sends_critical_immediately(client: TestClient, db_session: Session, brand, admin_headers, sent_mail):
+    ids = [
+        client.post("/products/", json={"sku": f"DIG-{i}", "name": f"Digest {i}", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+        for i in range(2)
+    ]
+    for price in (2, 3):
+        for product_id in ids:
+            assert client.put(f"/products/{product_id}", json={"price": price}, headers=admin_headers).status_code == 200
+    assert sent_mail == []
+    assert digest.pending(db_session) == 4
+
+    # Critical actions are not held back by the window
+    assert client.delete(f"/products/{ids[0]}", headers=admin_headers).status_code == 204
+    assert len(sent_mail) == 1
+    assert digest.pending(db_session) == 4
+
+    before = db_session.query(AdminNotification).count()
+    assert services.flush_digest(db_session.get_bind()) == 4
+    assert len(sent_mail) == 2
+    assert sent_mail[1].subject == "Catalog digest: 4 change(s) to 2 product(s)"
+    body = sent_mail[1].body
+    assert "Product 'Digest 0'" in body and "Product 'Digest 1'" in body
+    assert "price: 2.00 -> 3.00" in body
+    # One row per admin for the whole digest
+    assert db_session.query(AdminNotification).count() == before + 1
+    assert services.flush_digest(db_session.get_bind()) == 0
+
+
+def test_digest_flushes_when_full(client: TestClient, db_session: Session, brand, admin_headers, sent_mail, monkeypatch):
+    monkeypatch.setattr(digest, "NOTIFICATION_DIGEST_MAX_CHANGES", 2)
+    product_id = client.post("/products/", json={"sku": "DIG-9", "name": "Digest 9", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+
+    client.put(f"/products/{product_id}", json={"price": 2}, headers=admin_headers)
+    assert sent_mail == []
+    client.put(f"/products/{product_id}", json={"price": 3}, headers=admin_headers)
+    # Full: the digest job is queued and sent by whichever worker claims it
+    assert sent_mail == []
+    job = db_session.query(Job).filter_by(kind=digest.DIGEST_JOB, status="queued").one()
+    assert JobWorker(db_session.get_bind()).run_once()
+    db_session.refresh(job)
+    assert job.status == "succeeded" and job.result == {"sent": 2}
+    assert len(sent_mail) == 1
+    assert digest.pending(db_session) == 0
+
+
+def test_digest_entries_survive_a_failed_flush(client: TestClient, db_session: Session, brand, admin_headers, sent_mail, monkeypatch):
+    product_id = client.post("/products/", json={"sku": "DIG-10", "name": "Digest 10", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+    client.put(f"/products/{product_id}", json={"price": 2}, headers=admin_headers)
+    assert digest.pending(db_session) == 1
+
+    def broken(*args):
+        raise RuntimeError("boom")
+    with monkeypatch.context() as m:
+        m.setattr(services, "_digest_content", broken)
+        with pytest.raises(RuntimeError):
+            services.flush_digest(db_session.get_bind())
+    # Rolled back: the next run sends it
+    assert digest.pending(db_session) == 1
+    assert services.flush_digest(db_session.get_bind()) == 1
+    assert digest.pending(db_session) == 0
+
+
+def test_message_is_stored_once_per_event(client: TestClient, db_session: Session, admin, brand, admin_headers, sent_mail, monkeypatch, sql_statements):
+    monkeypatch.setattr(digest, "NOTIFICATION_DIGEST_ENABLED", False)
+    second = seed_second_admin(db_session)
+    product_id = client.post("/products/", json={"sku": "DIG-20", "name": "Digest 20", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+
+    sql_statements.clear()
+    assert client.put(f"/products/{product_id}", json={"price": 5}, headers=admin_headers).status_code == 200
+    assert len(sent_mail) == 1
+
+    event = db_session.query(NotificationEvent).order_by(NotificationEvent.id.desc()).first()
+    assert "price: 1.00 -> 5.00" in event.message
+    deliveries = db_session.query(AdminNotification).filter_by(event_id=event.id).all()
+    assert sorted(d.sent_to for d in deliveries) == sorted([admin.id, second.id])
+    sent = db_session.query(NotificationStatus).filter_by(name="SENT").one()
+    assert all(d.status_id == sent.id for d in deliveries)
+    # One status UPDATE for all recipients
+    assert sum(s.lstrip().startswith("UPDATE admin_notifications") for s in sql_statements) == 1
+
+    resp = client.get(f"/admin-notifications/{deliveries[0].id}", headers=admin_headers)
+    assert resp.json()["change_log_id"] == event.change_log_id
+    assert resp.json()["message"] == event.message
+
+
+def test_refused_recipient_is_marked_error(client: TestClient, db_session: Session, admin, brand, admin_headers, sent_mail, monkeypatch):
+    second = seed_second_admin(db_session)
+    monkeypatch.setattr(digest, "NOTIFICATION_DIGEST_ENABLED", False)
+    transports.get_transport().refuse = {second.email: "550 mailbox unavailable"}
+    product_id = client.post("/products/", json={"sku": "DIG-21", "name": "Digest 21", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+    client.put(f"/products/{product_id}", json={"price": 2}, headers=admin_headers)
+
+    event = db_session.query(NotificationEvent).order_by(NotificationEvent.id.desc()).first()
+    rows = {
+        d.sent_to: (d.status.name, d.error_message)
+        for d in db_session.query(AdminNotification).filter_by(event_id=event.id)
+    }
+    assert rows == {admin.id: ("SENT", None), second.id: ("ERROR", "550 mailbox unavailable")}
+
+
+def test_bulk_status_change_is_one_statement_and_one_email(client: TestClient, db_session: Session, brand, admin_headers, sent_mail, sql_statements):
+    ids = [
+        client.post("/products/", json={"sku": f"BULK-{i}", "name": f"Bulk {i}", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+        for i in range(3)
+    ]
+
+    sql_statements.clear()
+    resp = client.patch("/products/status", json={"ids": ids + [999999], "status": False}, headers=admin_headers)
+    assert resp.status_code == 200, resp.text
+    assert resp.json() == {"updated": ids, "unchanged": [999999]}
+    assert sum(s.lstrip().startswith("UPDATE products") for s in sql_statements) == 1
+    assert sum(s.lstrip().startswith("INSERT INTO product_change_logs") for s in sql_statements) == 1
+    # Deactivation is critical: sent right away, as one grouped email
+    assert len(sent_mail) == 1
+    assert sent_mail[0].subject == "3 product(s) updated: status True -> False"
+    assert all(f"'Bulk {i}'" in sent_mail[0].body for i in range(3))
+
+    products = [client.get(f"/products/{i}", headers=admin_headers).json() for i in ids]
+    assert all(p["status"] is False and p["version"] == 2 for p in products)
+    logs = client.get(f"/product-change-logs/product/{ids[0]}", headers=admin_headers).json()
+    assert logs[0]["field_changed"] == "status" and logs[0]["action_name"] == "DELETE_PRODUCT"
+
+    # Reactivation is not critical and goes to the digest
+    resp = client.patch("/products/status", json={"ids": ids, "status": True}, headers=admin_headers)
+    assert resp.json()["updated"] == ids
+    assert len(sent_mail) == 1
+    assert digest.pending(db_session) == 3
+
+
+def test_sendgrid_batches_recipients_as_personalizations():
+    transport = SendGridTransport(api_key="SG.test")
+    message = OutgoingEmail(sender="no-reply@test.com", recipients=("a@test.com", "b@test.com"), subject="s", body="b")
+    payload = json.loads(transport._payload(message, message.recipients))
+    # One request, each recipient gets their own copy
+    assert sorted(p["to"][0]["email"] for p in payload["personalizations"]) == ["a@test.com", "b@test.com"]
+    assert all(len(p["to"]) == 1 for p in payload["personalizations"])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_smtp_transport_reuses_pooled_connection():
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    from aiosmtpd.handlers import Sink
+
+    class Recorder(Sink):
+        def __init__(self):
+            self.envelopes = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.envelopes.append((session.peer, list(envelope.rcpt_tos)))
+            return "250 OK"
+
+    handler = Recorder()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    try:
+        transport = SMTPTransport(host="127.0.0.1", port=controller.port, starttls=False)
+        message = OutgoingEmail(sender="no-reply@test.com", recipients=("a@test.com", "b@test.com"), subject="s", body="b")
+        assert transport.send(message) == {}
+        assert transport.send(message) == {}
+        transport.close()
+    finally:
+        controller.stop()
+    # One transaction per send with every recipient, both over the same connection
+    assert [rcpts for _, rcpts in handler.envelopes] == [["a@test.com", "b@test.com"]] * 2
+    assert handler.envelopes[0][0] == handler.envelopes[1][0]
+
+
+def test_admin_recipients_are_cached_until_roles_change(client: TestClient, db_session: Session, brand, admin_headers, sent_mail, monkeypatch, sql_statements):
+    monkeypatch.setattr(digest, "NOTIFICATION_DIGEST_ENABLED", False)
+    other = User(email="future-admin@test.com", first_name="Future", last_name="Admin", password=get_password_hash(ADMIN_PASS))
+    db_session.add(other); db_session.commit()
+    product_id = client.post("/products/", json={"sku": "DIG-30", "name": "Digest 30", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+
+    def recipient_queries():
+        return sum("JOIN user_roles" in s for s in sql_statements)
+
+    client.put(f"/products/{product_id}", json={"price": 2}, headers=admin_headers)
+    sql_statements.clear()
+    client.put(f"/products/{product_id}", json={"price": 3}, headers=admin_headers)
+    assert recipient_queries() == 0
+    assert other.email not in sent_mail[-1].recipients
+
+    admin_role = db_session.query(Role).filter_by(name="admin").one()
+    resp = client.post("/roles/assign", json={"user_id": other.id, "role_id": admin_role.id}, headers=admin_headers)
+    assert resp.status_code == 204
+    sql_statements.clear()
+    client.put(f"/products/{product_id}", json={"price": 4}, headers=admin_headers)
+    assert recipient_queries() == 1
+    assert other.email in sent_mail[-1].recipients
+
+
+def test_unknown_email_transport_fails_at_import():
+    env = {**os.environ, "EMAIL_TRANSPORT": "carrier-pigeon"}
+    result = subprocess.run([sys.executable, "-c", "import src.notifications.transports"], env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "Unknown EMAIL_TRANSPORT 'carrier-pigeon'" in result.stderr
@@ -0,0 +1,35 @@
+from datetime import date
+from src.database.partitions import (
+    add_months,
+    month_bounds,
+    partition_name,
+    months_to_create,
+    expired_partitions,
+)
+
+
+def test_month_bounds_roll_over_year():
+    assert month_bounds(date(2025, 12, 17)) == (date(2025, 12, 1), date(2026, 1, 1))
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+def test_months_to_create_includes_current_month():
+    months = months_to_create(date(2025, 11, 5), months_ahead=2)
+    assert [partition_name("product_change_logs", m) for m in months] == [
+        "product_change_logs_p202511",
+        "product_change_logs_p202512",
+        "product_change_logs_p202601",
+    ]
+
+
+def test_expired_partitions_respects_retention():
+    names = [
+        "user_change_logs_p202401",
+        "user_change_logs_p202412",
+        "user_change_logs_p202501",
+        "user_change_logs_default",
+    ]
+    assert expired_partitions(names, date(2025, 12, 10), retain_months=11) == [
+        "user_change_logs_p202401",
+        "user_change_logs_p202412",
+    ]
@@ -0,0 +1,137 @@
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from src.auth.service import get_password_hash
+from src.database.core import get_db
+from src.entities.user import User
+from src.entities.role import Role
+from src.entities.user_role import UserRole
+from src.permissions.policy import FULL_ACCESS, invalidate_policy, require_permission, route_permissions
+from tests.conftest import override_get_db
+
+ADMIN_EMAIL = "admin@test.com"
+ADMIN_PASS = "Admin123!"
+EDITOR_EMAIL = "editor@test.com"
+
+
+def seed_user(db: Session, email: str, role_name: str):
+    role = db.query(Role).filter_by(name=role_name).first()
+    if not role:
+        role = Role(name=role_name, description=f"{role_name} role")
+        db.add(role); db.commit(); db.refresh(role)
+    user = db.query(User).filter_by(email=email).first()
+    if not user:
+        user = User(email=email, first_name="Test", last_name="User", password=get_password_hash(ADMIN_PASS))
+        db.add(user); db.commit(); db.refresh(user)
+    if not db.query(UserRole).filter_by(user_id=user.id).first():
+        db.add(UserRole(user_id=user.id, role_id=role.id)); db.commit()
+    # Written behind the services' back
+    invalidate_policy()
+    return user, role
+
+
+def login(client: TestClient, email: str = ADMIN_EMAIL):
+    resp = client.post("/auth/token", data={"username": email, "password": ADMIN_PASS})
+    assert resp.status_code == 200, resp.text
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+def things_app() -> FastAPI:
+    router = APIRouter(prefix="/things", dependencies=[Depends(route_permissions({
+        "GET": "READ_THINGS",
+        "POST /things/import": "IMPORT_THINGS",
+    }, default=FULL_ACCESS))])
+
+    @router.get("/")
+    def list_things():
+        return []
+
+    @router.post("/import")
+    def import_things():
+        return {"imported": 0}
+
+    @router.delete("/{thing_id}")
+    def delete_thing(thing_id: int):
+        return {"deleted": thing_id}
+
+    app = FastAPI()
+    app.include_router(router)
+
+    @app.post("/publish", dependencies=[Depends(require_permission("PUBLISH_THINGS"))])
+    def publish():
+        return {"published": True}
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+def grant(client: TestClient, role_id: int, name: str):
+    resp = client.post("/permissions/", json={"name": name})
+    perm_id = resp.json()["id"] if resp.status_code == 201 else next(
+        p["id"] for p in client.get("/permissions/").json() if p["name"] == name
+    )
+    assert client.post("/permissions/assign", json={"role_id": role_id, "permission_id": perm_id}).status_code == 204
+
+
+def test_route_permissions_and_hot_reload(client: TestClient, db_session: Session, sql_statements):
+    _, editor_role = seed_user(db_session, EDITOR_EMAIL, "editor")
+    headers = login(client, EDITOR_EMAIL)
+    things = TestClient(things_app())
+
+    assert things.get("/things/", headers=headers).status_code == 403
+    assert things.post("/things/import", headers=headers).status_code == 403
+    assert things.post("/publish", headers=headers).status_code == 403
+
+    # Assignments through the API take effect on the next request
+    grant(client, editor_role.id, "READ_THINGS")
+    grant(client, editor_role.id, "IMPORT_THINGS")
+    assert things.get("/things/", headers=headers).status_code == 200
+    assert things.post("/things/import", headers=headers).status_code == 200
+    # Unmapped routes fall back to the default
+    assert things.delete("/things/1", headers=headers).status_code == 403
+    assert things.post("/publish", headers=headers).status_code == 403
+
+    # Warm checks do not touch the database
+    sql_statements.clear()
+    assert things.get("/things/", headers=headers).status_code == 200
+    assert sql_statements == []
+
+    # A deactivated permission stops granting access
+    perm_id = next(p["id"] for p in client.get("/permissions/").json() if p["name"] == "READ_THINGS")
+    assert client.delete(f"/permissions/{perm_id}").status_code == 204
+    assert things.get("/things/", headers=headers).status_code == 403
+    assert client.put(f"/permissions/{perm_id}", json={"status": True}).status_code == 200
+
+
+def test_full_access_grants_everything(client: TestClient, db_session: Session):
+    _, admin_role = seed_user(db_session, ADMIN_EMAIL, "admin")
+    headers = login(client)
+    things = TestClient(things_app())
+    grant(client, admin_role.id, FULL_ACCESS)
+    assert things.delete("/things/1", headers=headers).status_code == 200
+    assert things.post("/publish", headers=headers).status_code == 200
+    assert things.get("/things/", headers=headers).status_code == 200
+
+
+def test_catalog_routers_check_seeded_permissions(client: TestClient, db_session: Session):
+    seed_user(db_session, "anon@test.com", "anonymous")
+    _, viewer_role = seed_user(db_session, "viewer@test.com", "viewer")
+    anon = login(client, "anon@test.com")
+    viewer = login(client, "viewer@test.com")
+
+    # Anonymous holds READ_PRODUCTS (seeded): reads only. Unknown ids so no
+    # product views are recorded for the other tests' rollups.
+    assert client.get("/products/999999", headers=anon).status_code == 404
+    assert client.post("/products/batch", json={"ids": [999999]}, headers=anon).status_code == 200
+    assert client.post("/products/", json={"sku": "P-1", "name": "P", "price": 1, "brand_id": 1}, headers=anon).status_code == 403
+    assert client.get("/users/", headers=anon).status_code == 403
+
+    # A role without permissions only reaches its own profile and public brand reads
+    assert client.get("/products/999999", headers=viewer).status_code == 403
+    assert client.get("/users/me", headers=viewer).status_code == 200
+    assert client.get("/brands/").status_code == 200
+    assert client.post("/brands/", json={"name": "Nope"}).status_code == 401
+    assert client.post("/brands/", json={"name": "Nope"}, headers=viewer).status_code == 403
+
+    grant(client, viewer_role.id, "READ_PRODUCTS")
+    assert client.get("/products/999999", headers=viewer).status_code == 404
@@ -0,0 +1,96 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from src.entities.product import Product
+from src.entities.product_change_log import ProductChangeLog
+from src.product_change_logs import services as pcl_services
+from src.pagination import NEXT_CURSOR_HEADER
+from src.products import changes
+from tests.conftest import TestingSessionLocal
+
+
+def test_catch_up_returns_create_update_delete_events(client: TestClient, db_session: Session, brand, admin_headers):
+    since = changes.latest_change_id(db_session)
+
+    payload = {"sku": "SKU-CHG-1", "name": "Changing", "price": 5, "brand_id": brand.id}
+    product_id = client.post("/products/", json=payload, headers=admin_headers).json()["id"]
+    client.put(f"/products/{product_id}", json={"price": 6}, headers=admin_headers)
+    client.delete(f"/products/{product_id}", headers=admin_headers)
+
+    resp = client.get("/products/changes", params={"since": since}, headers=admin_headers)
+    assert resp.status_code == 200, resp.text
+    events = resp.json()
+    assert [e["type"] for e in events] == ["product.created", "product.updated", "product.deleted"]
+    assert all(e["product_id"] == product_id for e in events)
+    assert events[1]["field"] == "price" and events[1]["new_value"] == "6.00"
+    assert resp.headers[NEXT_CURSOR_HEADER] == str(events[-1]["id"])
+
+    resp = client.get("/products/changes", params={"since": events[-1]["id"]}, headers=admin_headers)
+    assert resp.json() == []
+    assert NEXT_CURSOR_HEADER not in resp.headers
+
+
+def log_created(db: Session, product: Product, user_id: int):
+    pcl_services.log_product_created(db, product, user_id)
+    db.commit()
+    changes.notify_changes()
+
+
+def change_log(product: Product, user_id: int, action_id: int, log_id: int) -> ProductChangeLog:
+    return ProductChangeLog(id=log_id, product_id=product.id, changed_by=user_id, action_id=action_id, field_changed="price", old_value="1", new_value=str(log_id))
+
+
+def test_catch_up_waits_for_ids_committed_out_of_order(db_session: Session, admin, brand, monkeypatch):
+    product = Product(sku="SKU-CHG-3", name="Interleaved", price=1, brand_id=brand.id, created_by=admin.id)
+    db_session.add(product)
+    action_id = pcl_services.get_action_id(db_session, changes.ACTION_UPDATE)
+    db_session.commit()
+    since = changes.latest_change_id(db_session)
+
+    # The sequence hands since+1 to the first writer and since+2 to the second, which commits first
+    first, second = TestingSessionLocal(), TestingSessionLocal()
+    try:
+        second.add(change_log(product, admin.id, action_id, since + 2)); second.commit()
+        assert changes.list_changes(db_session, since, 10) == []
+
+        first.add(change_log(product, admin.id, action_id, since + 1)); first.commit()
+        assert [e.id for e in changes.list_changes(db_session, since, 10)] == [since + 1, since + 2]
+
+        # since+3 never commits (rolled back): skipped once the gap is old enough
+        second.add(change_log(product, admin.id, action_id, since + 4)); second.commit()
+        assert [e.id for e in changes.list_changes(db_session, since, 10)] == [since + 1, since + 2]
+        monkeypatch.setattr(changes, "CHANGES_GAP_SECONDS", 0)
+        assert [e.id for e in changes.list_changes(db_session, since + 2, 10)] == [since + 4]
+    finally:
+        first.close()
+        second.close()
+
+
+class _ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def test_stream_is_woken_by_broadcaster(db_session: Session, admin, brand, monkeypatch):
+    monkeypatch.setattr(changes, "CHANGES_POLL_SECONDS", 30)
+    product = Product(sku="SKU-CHG-2", name="Streamed", price=1, brand_id=brand.id, created_by=admin.id)
+    db_session.add(product); db_session.commit(); db_session.refresh(product)
+    start = changes.latest_change_id(db_session)
+
+    async def scenario():
+        stream = changes.stream_changes(_ConnectedRequest(), db_session.get_bind(), start)
+        assert (await stream.__anext__()).startswith("retry:")
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.1)
+        assert changes.broadcaster.subscriber_count() == 1
+        await asyncio.get_running_loop().run_in_executor(None, log_created, db_session, product, admin.id)
+        message = await asyncio.wait_for(pending, timeout=5)
+        await stream.aclose()
+        return message
+
+    message = asyncio.run(scenario())
+    assert message.startswith("id: ") and "event: product.created" in message
+    data = json.loads(message.split("data: ", 1)[1])
+    assert data["product_id"] == product.id
+    assert changes.broadcaster.subscriber_count() == 0
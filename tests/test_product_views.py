@@ -0,0 +1,152 @@
+from datetime import datetime
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from src.auth.service import get_password_hash
+from src.entities.user import User
+from src.entities.role import Role
+from src.entities.user_role import UserRole
+from src.entities.brand import Brand
+from src.entities.product import Product
+from src.entities.product_view_bucket import ProductViewHourly
+from src.product_views import recorder, services
+from src.product_views.recorder import LiveTopK, ViewBuffer
+
+ANON_EMAIL = "anonymous@example.com"
+
+
+def seed_anonymous_and_products(db: Session, count: int = 3):
+    anon_role = db.query(Role).filter_by(name="anonymous").first()
+    if not anon_role:
+        anon_role = Role(name="anonymous", description="Anonymous role")
+        db.add(anon_role); db.commit(); db.refresh(anon_role)
+    anon = db.query(User).filter_by(email=ANON_EMAIL).first()
+    if not anon:
+        anon = User(email=ANON_EMAIL, first_name="Anon", last_name="User", password=get_password_hash("Anon123!"))
+        db.add(anon); db.commit(); db.refresh(anon)
+    if not db.query(UserRole).filter_by(user_id=anon.id, role_id=anon_role.id).first():
+        db.add(UserRole(user_id=anon.id, role_id=anon_role.id)); db.commit()
+    brand = db.query(Brand).filter_by(name="ViewsBrand").first()
+    if not brand:
+        brand = Brand(name="ViewsBrand", description="Views brand")
+        db.add(brand); db.commit(); db.refresh(brand)
+    products = []
+    for i in range(count):
+        sku = f"VIEW-{i}"
+        product = db.query(Product).filter_by(sku=sku).first()
+        if not product:
+            product = Product(sku=sku, name=f"Viewed {i}", price=Decimal("1.00"), brand_id=brand.id, created_by=anon.id)
+            db.add(product); db.commit(); db.refresh(product)
+        products.append(product)
+    return products
+
+
+def anonymous_login(client: TestClient):
+    resp = client.post("/auth/anonymous/token")
+    assert resp.status_code == 200, resp.text
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+def reset_recorder():
+    recorder.buffer.drain()
+    recorder.live_top.clear()
+
+
+def test_views_are_buffered_and_flushed_into_rollups(client: TestClient, db_session: Session, monkeypatch):
+    products = seed_anonymous_and_products(db_session)
+    headers = anonymous_login(client)
+    reset_recorder()
+    monkeypatch.setattr(recorder, "VIEW_FLUSH_SECONDS", 3600)
+
+    for product, views in zip(products, (1, 3, 2)):
+        for _ in range(views):
+            assert client.get(f"/products/{product.id}", headers=headers).status_code == 200
+    assert recorder.buffer.pending() == (3, 6)
+
+    live = client.get("/product-views/top", params={"realtime": "true", "limit": 2}).json()
+    assert [(r["product_id"], r["view_count"]) for r in live] == [(products[1].id, 3), (products[2].id, 2)]
+
+    def top_1h():
+        resp = client.get("/product-views/top", params={"window": "1h", "limit": 10})
+        assert resp.status_code == 200
+        return [(r["product_id"], r["view_count"]) for r in resp.json() if r["product_id"] in {p.id for p in products}]
+
+    # Requests only read the rollup; maintenance recomputes it
+    assert top_1h() == []
+    assert services.flush_views(db_session.get_bind()) == 6
+    services.refresh_top(db_session)
+    assert top_1h() == [(products[1].id, 3), (products[2].id, 2), (products[0].id, 1)]
+    assert recorder.buffer.pending() == (0, 0)
+    assert client.get(f"/product-views/{products[1].id}").json()["view_count"] >= 3
+
+
+def test_top_advances_through_the_scheduled_maintenance_job(client: TestClient, db_session: Session, monkeypatch):
+    import src.main
+    from src.jobs.worker import JobWorker
+    from tests.conftest import TestingSessionLocal, engine
+    products = seed_anonymous_and_products(db_session)
+    headers = anonymous_login(client)
+    reset_recorder()
+    monkeypatch.setattr(src.main, "SessionLocal", TestingSessionLocal)
+
+    def top_1h():
+        resp = client.get("/product-views/top", params={"window": "1h", "limit": 100})
+        return {r["product_id"]: r["view_count"] for r in resp.json() if r["product_id"] == products[0].id}
+
+    before = top_1h().get(products[0].id, 0)
+    for _ in range(4):
+        assert client.get(f"/products/{products[0].id}", headers=headers).status_code == 200
+    services.flush_views(engine)
+    assert top_1h().get(products[0].id, 0) == before
+
+    # What the lifespan task does every VIEW_TOP_REFRESH_SECONDS; a second call while queued is a no-op
+    src.main._schedule_top_refresh()
+    src.main._schedule_top_refresh()
+    worker = JobWorker(engine)
+    assert worker.run_once()
+    assert not worker.run_once()
+    assert top_1h() == {products[0].id: before + 4}
+
+
+def test_not_modified_revalidation_is_not_a_view(client: TestClient, db_session: Session):
+    product = seed_anonymous_and_products(db_session)[0]
+    headers = anonymous_login(client)
+    reset_recorder()
+    etag = client.get(f"/products/{product.id}", headers=headers).headers["ETag"]
+    resp = client.get(f"/products/{product.id}", headers={**headers, "If-None-Match": etag})
+    assert resp.status_code == 304
+    assert recorder.buffer.pending() == (1, 1)
+
+
+def test_update_then_insert_fallback(db_session: Session):
+    products = seed_anonymous_and_products(db_session)
+    table = ProductViewHourly.__table__
+    bucket = datetime(2020, 1, 1, 10)
+    for views in (2, 3):
+        services._update_then_insert(
+            db_session, table, ["product_id", "bucket_start"],
+            [{"product_id": p.id, "bucket_start": bucket, "view_count": views} for p in products[:2]],
+        )
+        db_session.commit()
+    counts = db_session.query(ProductViewHourly.view_count).filter(ProductViewHourly.bucket_start == bucket).all()
+    assert [c for (c,) in counts] == [5, 5]
+
+
+def test_top_rejects_unknown_window(client: TestClient):
+    assert client.get("/product-views/top", params={"window": "2w"}).status_code == 400
+
+
+def test_view_buffer_is_due_by_size():
+    buffer = ViewBuffer()
+    assert not buffer.due()
+    buffer.add(list(range(recorder.VIEW_FLUSH_MAX_PRODUCTS)))
+    assert buffer.due()
+    assert sum(buffer.drain().values()) == recorder.VIEW_FLUSH_MAX_PRODUCTS
+    assert buffer.pending() == (0, 0)
+
+
+def test_live_top_k_keeps_heavy_hitters_with_bounded_memory():
+    top = LiveTopK(capacity=3)
+    top.add([1] * 10 + [2] * 5 + [3] + [4] + [5])
+    assert len(top._counts) == 3
+    assert [pid for pid, _ in top.top(2)] == [1, 2]
@@ -1,49 +1,16 @@
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from decimal import Decimal
-from src.auth.service import get_password_hash
-from src.entities.user import User
-from src.entities.role import Role
-from src.entities.user_role import UserRole
 from src.entities.brand import Brand
-
-ADMIN_EMAIL = "admin@test.com"
-ADMIN_PASS = "Admin123!"
-
-
-def seed_admin_and_brand(db: Session):
-    # Role
-    admin_role = db.query(Role).filter_by(name="admin").first()
-    if not admin_role:
-        admin_role = Role(name="admin", description="Admin role")
-        db.add(admin_role); db.commit(); db.refresh(admin_role)
-    # User
-    admin_user = db.query(User).filter_by(email=ADMIN_EMAIL).first()
-    if not admin_user:
-        admin_user = User(email=ADMIN_EMAIL, first_name="Admin", last_name="User", password=get_password_hash(ADMIN_PASS))
-        db.add(admin_user); db.commit(); db.refresh(admin_user)
-    # Link role
-    user_role = db.query(UserRole).filter_by(user_id=admin_user.id, role_id=admin_role.id).first()
-    if not user_role:
-        db.add(UserRole(user_id=admin_user.id, role_id=admin_role.id)); db.commit()
-    # Brand
-    brand = db.query(Brand).filter_by(name="BrandX").first()
-    if not brand:
-        brand = Brand(name="BrandX", description="Test brand")
-        db.add(brand); db.commit(); db.refresh(brand)
-    return admin_user, brand
-
-
-def login(client: TestClient):
-    resp = client.post("/auth/token", data={"username": ADMIN_EMAIL, "password": ADMIN_PASS})
-    assert resp.status_code == 200, resp.text
-    token = resp.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"}
+from src.entities.product import Product
+from src import compression
+from src.concurrency import commit_or_conflict
+from src.exceptions import PreconditionFailedError
+from tests.conftest import TestingSessionLocal
 
 
-def test_create_product(client: TestClient, db_session: Session):
-    admin, brand = seed_admin_and_brand(db_session)
-    headers = login(client)
+def test_create_product(client: TestClient, admin, brand, admin_headers):
     payload = {
         "sku": "SKU-1",
         "name": "Producto 1",
@@ -52,7 +19,7 @@ def test_create_product(client: TestClient, db_session: Session):
         "brand_id": brand.id,
         "status": True
     }
-    resp = client.post("/products/", json=payload, headers=headers)
+    resp = client.post("/products/", json=payload, headers=admin_headers)
     assert resp.status_code == 200, resp.text
     data = resp.json()
     assert data["sku"] == "SKU-1"
@@ -60,9 +27,7 @@ def test_create_product(client: TestClient, db_session: Session):
     assert data["created_by"] == admin.id
 
 
-def test_update_product_change_name(client: TestClient, db_session: Session):
-    _, brand = seed_admin_and_brand(db_session)
-    headers = login(client)
+def test_update_product_change_name(client: TestClient, brand, admin_headers):
     # Crear producto
     payload = {
         "sku": "SKU-2",
@@ -72,19 +37,17 @@ def test_update_product_change_name(client: TestClient, db_session: Session):
         "brand_id": brand.id,
         "status": True
     }
-    resp = client.post("/products/", json=payload, headers=headers)
+    resp = client.post("/products/", json=payload, headers=admin_headers)
     assert resp.status_code == 200
     product_id = resp.json()["id"]
     # Update
     upd = {"name": "Prod 2 Nuevo"}
-    resp2 = client.put(f"/products/{product_id}", json=upd, headers=headers)
+    resp2 = client.put(f"/products/{product_id}", json=upd, headers=admin_headers)
     assert resp2.status_code == 200
     assert resp2.json()["name"] == "Prod 2 Nuevo"
 
 
-def test_soft_delete_product(client: TestClient, db_session: Session):
-    _, brand = seed_admin_and_brand(db_session)
-    headers = login(client)
+def test_soft_delete_product(client: TestClient, brand, admin_headers):
     payload = {
         "sku": "SKU-3",
         "name": "Prod 3",
@@ -93,8 +56,203 @@ def test_soft_delete_product(client: TestClient, db_session: Session):
         "brand_id": brand.id,
         "status": True
     }
-    resp = client.post("/products/", json=payload, headers=headers)
+    resp = client.post("/products/", json=payload, headers=admin_headers)
     assert resp.status_code == 200
     product_id = resp.json()["id"]
-    resp_del = client.delete(f"/products/{product_id}", headers=headers)
+    resp_del = client.delete(f"/products/{product_id}", headers=admin_headers)
     assert resp_del.status_code == 204
+
+
+def test_batch_get_products_reports_missing(client: TestClient, brand, admin_headers, sql_statements):
+    ids = []
+    for i in (4, 5):
+        payload = {"sku": f"SKU-{i}", "name": f"Prod {i}", "price": 10, "brand_id": brand.id}
+        resp = client.post("/products/", json=payload, headers=admin_headers)
+        assert resp.status_code == 200
+        ids.append(resp.json()["id"])
+    sql_statements.clear()
+    resp = client.get("/products/batch", params={"ids": f"{ids[1]},999999,{ids[0]},{ids[1]}"}, headers=admin_headers)
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert [p["id"] for p in data["products"]] == [ids[1], ids[0]]
+    assert data["missing"] == [999999]
+    # Role comes from the policy cache: one IN query for all products
+    assert len(sql_statements) == 1
+
+    resp = client.post("/products/batch", json={"ids": ids}, headers=admin_headers)
+    assert resp.status_code == 200
+    assert [p["id"] for p in resp.json()["products"]] == ids
+
+
+def test_batch_get_products_rejects_bad_ids(client: TestClient, admin_headers):
+    assert client.get("/products/batch", params={"ids": "1,abc"}, headers=admin_headers).status_code == 400
+
+
+def test_list_products_sparse_fieldsets(client: TestClient, brand, admin_headers, sql_statements):
+    payload = {"sku": "SKU-6", "name": "Prod 6", "description": "Long text", "price": 12.5, "brand_id": brand.id}
+    product_id = client.post("/products/", json=payload, headers=admin_headers).json()["id"]
+
+    sql_statements.clear()
+    resp = client.get("/products/", params={"fields": "name,price"}, headers=admin_headers)
+    assert resp.status_code == 200
+    assert all(set(p) == {"id", "name", "price"} for p in resp.json())
+    assert not any("products.description" in s for s in sql_statements)
+
+    resp = client.get(f"/products/{product_id}", params={"fields": "summary"}, headers=admin_headers)
+    assert resp.json() == {"id": product_id, "sku": "SKU-6", "name": "Prod 6", "price": "12.50"}
+
+    resp = client.get("/brands/", params={"fields": "summary"})
+    assert {"id": brand.id, "name": "BrandX"} in resp.json()
+
+    assert client.get("/products/", params={"fields": "name,password"}, headers=admin_headers).status_code == 400
+
+
+def test_product_if_match_and_if_none_match(client: TestClient, brand, admin_headers):
+    payload = {"sku": "SKU-7", "name": "Prod 7", "price": 7, "brand_id": brand.id}
+    product_id = client.post("/products/", json=payload, headers=admin_headers).json()["id"]
+
+    resp = client.get(f"/products/{product_id}", headers=admin_headers)
+    etag = resp.headers["ETag"]
+    assert etag == f'"{resp.json()["version"]}"'
+    assert client.get(f"/products/{product_id}", headers={**admin_headers, "If-None-Match": etag}).status_code == 304
+
+    resp = client.put(f"/products/{product_id}", json={"price": 8}, headers={**admin_headers, "If-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+    # A second writer still holding the old version loses instead of overwriting
+    resp = client.put(f"/products/{product_id}", json={"price": 9}, headers={**admin_headers, "If-Match": etag})
+    assert resp.status_code == 412
+    assert client.delete(f"/products/{product_id}", headers={**admin_headers, "If-Match": etag}).status_code == 412
+    assert client.get(f"/products/{product_id}", headers=admin_headers).json()["price"] == "8.00"
+
+
+def test_compressed_product_has_its_own_etag(client: TestClient, brand, admin_headers, monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION_MIN_SIZE", 10)
+    product_id = client.post("/products/", json={"sku": "SKU-7z", "name": "Prod 7z", "price": 7, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+    version = client.get(f"/products/{product_id}", headers={**admin_headers, "Accept-Encoding": "identity"}).headers["ETag"]
+
+    resp = client.get(f"/products/{product_id}", headers={**admin_headers, "Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    etag = resp.headers["ETag"]
+    assert etag == version[:-1] + '-gzip"'
+
+    resp = client.get(f"/products/{product_id}", headers={**admin_headers, "Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert (resp.status_code, resp.headers["ETag"]) == (304, etag)
+    resp = client.get(f"/products/{product_id}", headers={**admin_headers, "Accept-Encoding": "gzip", "If-None-Match": version})
+    assert (resp.status_code, resp.headers["ETag"]) == (304, version)
+    assert client.put(f"/products/{product_id}", json={"price": 8}, headers={**admin_headers, "If-Match": etag}).status_code == 200
+
+
+def test_concurrent_product_update_conflicts(db_session: Session, admin, brand):
+    product = Product(sku="SKU-8", name="Prod 8", price=Decimal("1.00"), brand_id=brand.id, created_by=admin.id)
+    db_session.add(product); db_session.commit()
+
+    other = TestingSessionLocal()
+    try:
+        theirs = other.get(Product, product.id)
+        product.price = Decimal("2.00")
+        theirs.price = Decimal("3.00")
+        commit_or_conflict(db_session)
+        with pytest.raises(PreconditionFailedError):
+            commit_or_conflict(other)
+    finally:
+        other.close()
+
+
+def test_create_product_constraint_violations(client: TestClient, brand, admin_headers, sql_statements):
+    payload = {"sku": "SKU-9", "name": "Prod 9", "price": 9, "brand_id": brand.id}
+    assert client.post("/products/", json=payload, headers=admin_headers).status_code == 200
+
+    sql_statements.clear()
+    resp = client.post("/products/", json={**payload, "name": "Prod 9b"}, headers=admin_headers)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Product SKU already exists"
+    # No SELECT per rule: the INSERT itself is the check
+    assert not any(s.lstrip().startswith("SELECT products.") for s in sql_statements)
+
+    resp = client.post("/products/", json={**payload, "sku": "SKU-9b"}, headers=admin_headers)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Product name already exists"
+
+    resp = client.post("/products/", json={**payload, "sku": "SKU-9c", "name": "Prod 9c", "brand_id": 99999}, headers=admin_headers)
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == "Brand not found"
+
+
+def test_product_writes_log_in_their_own_transaction(client: TestClient, brand, admin_headers, sql_statements):
+    client.post("/products/", json={"sku": "SKU-WT0", "name": "Prod WT0", "price": 1, "brand_id": brand.id}, headers=admin_headers)
+
+    def log_inserts():
+        return sum(s.lstrip().startswith("INSERT INTO product_change_logs") for s in sql_statements)
+
+    sql_statements.clear()
+    product_id = client.post("/products/", json={"sku": "SKU-WT1", "name": "Prod WT1", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+    # INSERT product, INSERT log, reload for the response: no product/user/action lookups
+    assert len(sql_statements) == 3 and log_inserts() == 1
+
+    sql_statements.clear()
+    resp = client.put(f"/products/{product_id}", json={"name": "Prod WT1b", "price": 2}, headers=admin_headers)
+    assert resp.status_code == 200
+    # SELECT, one INSERT for both fields, UPDATE, reload
+    assert len(sql_statements) == 4 and log_inserts() == 1
+    logs = client.get(f"/product-change-logs/product/{product_id}", headers=admin_headers).json()
+    assert {(log["field_changed"], log["new_value"]) for log in logs} >= {("name", "Prod WT1b"), ("price", "2.00")}
+
+
+def test_update_product_constraint_violations(client: TestClient, brand, admin_headers):
+    client.post("/products/", json={"sku": "SKU-10", "name": "Prod 10", "price": 1, "brand_id": brand.id}, headers=admin_headers)
+    product_id = client.post("/products/", json={"sku": "SKU-11", "name": "Prod 11", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+
+    assert client.put(f"/products/{product_id}", json={"name": "Prod 10"}, headers=admin_headers).status_code == 400
+    assert client.put(f"/products/{product_id}", json={"brand_id": 99999}, headers=admin_headers).status_code == 404
+    resp = client.put(f"/products/{product_id}", json={"name": "Prod 11", "sku": "SKU-11"}, headers=admin_headers)
+    assert resp.status_code == 200
+    assert resp.json()["version"] == 1
+
+
+def test_brand_stats_single_query(client: TestClient, db_session: Session, admin_headers, sql_statements):
+    brand = Brand(name="BrandStats", description="Stats brand")
+    empty = Brand(name="BrandEmpty", description="No products")
+    db_session.add_all([brand, empty]); db_session.commit()
+    ids = []
+    for i, price in enumerate((10, 20, 35)):
+        payload = {"sku": f"SKU-ST{i}", "name": f"Prod ST{i}", "price": price, "brand_id": brand.id}
+        ids.append(client.post("/products/", json=payload, headers=admin_headers).json()["id"])
+    assert client.delete(f"/products/{ids[2]}", headers=admin_headers).status_code == 204
+
+    sql_statements.clear()
+    resp = client.get("/brands/stats")
+    assert resp.status_code == 200
+    assert len(sql_statements) == 1
+    stats = {b["name"]: b for b in resp.json()}
+    assert stats["BrandStats"]["total_products"] == 3
+    assert stats["BrandStats"]["active_products"] == 2
+    assert float(stats["BrandStats"]["min_price"]) == 10
+    assert float(stats["BrandStats"]["max_price"]) == 20
+    assert float(stats["BrandStats"]["avg_price"]) == 15
+    assert stats["BrandEmpty"]["total_products"] == stats["BrandEmpty"]["active_products"] == 0
+    assert stats["BrandEmpty"]["avg_price"] is None
+
+
+def test_deactivate_brand_cascades_to_products(client: TestClient, db_session: Session, admin_headers, sql_statements):
+    brand = Brand(name="BrandRetired", description="Retired brand")
+    db_session.add(brand); db_session.commit()
+    ids = [
+        client.post("/products/", json={"sku": f"SKU-RT{i}", "name": f"Prod RT{i}", "price": 1, "brand_id": brand.id}, headers=admin_headers).json()["id"]
+        for i in range(3)
+    ]
+    assert client.delete(f"/products/{ids[0]}", headers=admin_headers).status_code == 204
+
+    sql_statements.clear()
+    resp = client.post(f"/brands/{brand.id}/deactivate", headers=admin_headers)
+    assert resp.status_code == 200, resp.text
+    assert resp.json() == {"brand_id": brand.id, "deactivated_products": ids[1:]}
+    # No per-product reads: one UPDATE per table and one bulk INSERT of logs
+    assert not any(s.lstrip().startswith("SELECT products.") for s in sql_statements)
+    assert sum(s.lstrip().startswith("UPDATE") for s in sql_statements) == 2
+    assert client.get(f"/brands/{brand.id}").json()["status"] is False
+    stats = {b["name"]: b for b in client.get("/brands/stats").json()}
+    assert stats["BrandRetired"]["active_products"] == 0
+
+    assert client.post("/brands/999999/deactivate", headers=admin_headers).status_code == 404
@@ -0,0 +1,41 @@
+import os
+from fastapi.testclient import TestClient
+from src import profiling
+
+
+def enable_profiling(monkeypatch, tmp_path, sample_rate=0.0):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILING_SAMPLE_RATE", sample_rate)
+    monkeypatch.setattr(profiling, "PROFILING_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILER", "cprofile")
+
+
+def test_token_header_writes_report_with_sql(client: TestClient, admin_headers, monkeypatch, tmp_path):
+    enable_profiling(monkeypatch, tmp_path)
+    resp = client.get("/users/", headers={**admin_headers, "X-Profile-Token": "secret"})
+    assert resp.status_code == 200
+    path = resp.headers[profiling.PROFILE_REPORT_HEADER]
+    assert os.path.dirname(path) == os.path.join(str(tmp_path), "GET_users")
+    report = open(path, encoding="utf-8").read()
+    assert "cProfile" in report
+    assert "SELECT" in report and "users" in report
+
+
+def test_wrong_token_and_disabled_do_not_profile(client: TestClient, admin_headers, monkeypatch, tmp_path):
+    enable_profiling(monkeypatch, tmp_path)
+    resp = client.get("/users/", params={"profile": "nope"}, headers=admin_headers)
+    assert profiling.PROFILE_REPORT_HEADER not in resp.headers
+
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", False)
+    resp = client.get("/users/", params={"profile": "secret"}, headers=admin_headers)
+    assert profiling.PROFILE_REPORT_HEADER not in resp.headers
+    assert not any(tmp_path.iterdir())
+
+
+def test_sampled_requests_are_stored_without_header(client: TestClient, admin_headers, monkeypatch, tmp_path):
+    enable_profiling(monkeypatch, tmp_path, sample_rate=1.0)
+    resp = client.get("/users/me", headers=admin_headers)
+    assert resp.status_code == 200
+    assert profiling.PROFILE_REPORT_HEADER not in resp.headers
+    assert list((tmp_path / "GET_users_me").iterdir())
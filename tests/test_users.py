@@ -1,66 +1,175 @@
+import json
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from src.auth.service import get_password_hash
 from src.entities.user import User
 from src.entities.role import Role
 from src.entities.user_role import UserRole
-
-ADMIN_EMAIL = "admin@test.com"
-ADMIN_PASS = "Admin123!"
-
-
-def seed_admin(db: Session):
-    # Role
-    admin_role = db.query(Role).filter_by(name="admin").first()
-    if not admin_role:
-        admin_role = Role(name="admin", description="Admin role")
-        db.add(admin_role); db.commit(); db.refresh(admin_role)
-    # User
-    admin_user = db.query(User).filter_by(email=ADMIN_EMAIL).first()
-    if not admin_user:
-        admin_user = User(
-            email=ADMIN_EMAIL,
-            first_name="Admin",
-            last_name="User",
-            password=get_password_hash(ADMIN_PASS)
-        )
-        db.add(admin_user); db.commit(); db.refresh(admin_user)
-    # Link role
-    user_role = db.query(UserRole).filter_by(user_id=admin_user.id, role_id=admin_role.id).first()
-    if not user_role:
-        db.add(UserRole(user_id=admin_user.id, role_id=admin_role.id)); db.commit()
-    return admin_user
-
-
-def login(client: TestClient):
-    resp = client.post("/auth/token", data={"username": ADMIN_EMAIL, "password": ADMIN_PASS})
-    assert resp.status_code == 200, resp.text
-    token = resp.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"}
+from tests.conftest import ADMIN_EMAIL, ADMIN_PASS
 
 
-def test_get_users_empty(client: TestClient, db_session: Session):
-    seed_admin(db_session)
-    headers = login(client)
-    resp = client.get("/users/", headers=headers)
+def test_get_users_empty(client: TestClient, admin_headers):
+    resp = client.get("/users/", headers=admin_headers)
     assert resp.status_code == 200
     data = resp.json()
     assert isinstance(data, list)
     assert len(data) >= 1  # at least the admin
 
 
-def test_update_user_first_name(client: TestClient, db_session: Session):
-    admin = seed_admin(db_session)
-    headers = login(client)
+def test_update_user_first_name(client: TestClient, admin, admin_headers):
     payload = {"first_name": "NuevoNombre"}
-    resp = client.put(f"/users/{admin.id}", json=payload, headers=headers)
+    resp = client.put(f"/users/{admin.id}", json=payload, headers=admin_headers)
     assert resp.status_code == 200, resp.text
     assert resp.json()["first_name"] == "NuevoNombre"
 
 
-def test_change_password(client: TestClient, db_session: Session):
-    seed_admin(db_session)
-    headers = login(client)
+def test_user_etag_and_stale_update(client: TestClient, admin, admin_headers):
+    resp = client.get("/users/me", headers=admin_headers)
+    etag = resp.headers["ETag"]
+    assert client.get("/users/me", headers={**admin_headers, "If-None-Match": etag}).status_code == 304
+
+    resp = client.put(f"/users/{admin.id}", json={"last_name": "Versioned"}, headers={**admin_headers, "If-Match": etag})
+    assert resp.status_code == 200, resp.text
+    resp = client.put(f"/users/{admin.id}", json={"last_name": "Stale"}, headers={**admin_headers, "If-Match": etag})
+    assert resp.status_code == 412
+
+
+def test_user_directory_search_filters_and_pages(client: TestClient, db_session: Session, admin_headers, sql_statements):
+    role = db_session.query(Role).filter_by(name="directory").first()
+    if not role:
+        role = Role(name="directory", description="Directory role")
+        db_session.add(role); db_session.commit()
+    users = [
+        User(email=f"dir{i}@test.com", first_name="Dora" if i % 2 else "Dan", last_name=f"Dir_{i}",
+             password=get_password_hash(ADMIN_PASS), status=i != 4)
+        for i in range(5)
+    ]
+    db_session.add_all(users); db_session.commit()
+    db_session.add_all([UserRole(user_id=u.id, role_id=role.id) for u in users[:3]]); db_session.commit()
+
+    sql_statements.clear()
+    resp = client.get("/users/", params={"q": "DIR", "limit": 2}, headers=admin_headers)
+    assert resp.status_code == 200
+    page = resp.json()
+    # Newest first, and the password column is never selected
+    assert [u["email"] for u in page] == ["dir4@test.com", "dir3@test.com"]
+    assert not any("users.password" in s for s in sql_statements)
+    seen = [u["id"] for u in page]
+    cursor = resp.headers["X-Next-Cursor"]
+    while cursor:
+        resp = client.get("/users/", params={"q": "dir", "limit": 2, "cursor": cursor}, headers=admin_headers)
+        seen += [u["id"] for u in resp.json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+    assert seen == [u.id for u in reversed(users)]
+
+    assert {u["email"] for u in client.get("/users/", params={"q": "dora"}, headers=admin_headers).json()} == {"dir1@test.com", "dir3@test.com"}
+    # LIKE wildcards in the search are literal
+    assert [u["email"] for u in client.get("/users/", params={"q": "dir_4"}, headers=admin_headers).json()] == ["dir4@test.com"]
+    assert client.get("/users/", params={"q": "d%"}, headers=admin_headers).json() == []
+
+    resp = client.get("/users/", params={"role": "directory", "q": "dir"}, headers=admin_headers)
+    assert sorted(u["id"] for u in resp.json()) == [u.id for u in users[:3]]
+    resp = client.get("/users/", params={"status": False, "q": "dir", "fields": "email"}, headers=admin_headers)
+    assert resp.json() == [{"id": users[4].id, "email": "dir4@test.com"}]
+
+
+def test_bulk_provisioning_reports_each_row(client: TestClient, db_session: Session, admin, admin_headers, sql_statements):
+    if not db_session.query(Role).filter_by(name="customer").first():
+        db_session.add(Role(name="customer", description="Customer role")); db_session.commit()
+    body = "\n".join([
+        "email,first_name,last_name,password,role",
+        "bulk1@test.com,Bulk,One,Secret123!,",
+        "bulk2@test.com,Bulk,Two,Secret123!,admin",
+        "BULK1@test.com,Bulk,Again,Secret123!,",
+        f"{ADMIN_EMAIL},Admin,Again,Secret123!,",
+        "not-an-email,Bad,Row,Secret123!,",
+        "bulk3@test.com,Bulk,Three,Secret123!,nope",
+    ])
+    sql_statements.clear()
+    resp = client.post("/users/provision", params={"role": "customer"}, content=body, headers={**admin_headers, "Content-Type": "text/csv"})
+    assert resp.status_code == 200, resp.text
+    report = resp.json()
+    assert (report["total"], report["created"], report["duplicates"], report["invalid"]) == (6, 2, 2, 2)
+    assert [r["status"] for r in report["results"]] == ["created", "created", "duplicate", "duplicate", "invalid", "invalid"]
+    assert report["results"][5]["error"] == "Role not found: nope"
+    # Set-based: one multi-row INSERT per table for the whole chunk
+    assert sum(s.lstrip().startswith("INSERT INTO users ") for s in sql_statements) == 1
+    assert sum(s.lstrip().startswith("INSERT INTO user_roles ") for s in sql_statements) == 1
+
+    created = {r["email"]: r["user_id"] for r in report["results"] if r["status"] == "created"}
+    roles = dict(
+        db_session.query(UserRole.user_id, Role.name).join(Role, Role.id == UserRole.role_id)
+        .filter(UserRole.user_id.in_(created.values())).all()
+    )
+    assert roles == {created["bulk1@test.com"]: "customer", created["bulk2@test.com"]: "admin"}
+    assert client.post("/auth/token", data={"username": "bulk1@test.com", "password": "Secret123!"}).status_code == 200
+
+
+def test_bulk_provisioning_marks_chunks_the_database_rejects(db_session: Session, monkeypatch):
+    from src.users import provisioning
+    insert_chunk = provisioning._insert_chunk
+
+    def with_missing_role(db, chunk, hashes):
+        # As if the role were deleted after it was resolved: user_roles FK error on every try
+        if any(user.email == "fk1@test.com" for _, user, _ in chunk):
+            chunk = [(i, user, 999999) for i, user, _ in chunk]
+        return insert_chunk(db, chunk, hashes)
+    monkeypatch.setattr(provisioning, "_insert_chunk", with_missing_role)
+
+    rows = [{"email": f"fk{i}@test.com", "first_name": "F", "last_name": "K", "password": "Secret123!"} for i in range(1, 4)]
+    report = provisioning.provision(db_session, rows, workers=0, chunk_size=2)
+    assert [r.status for r in report.results] == ["failed", "failed", "created"]
+    assert report.results[0].error.startswith("Insert failed")
+    assert (report.created, report.failed) == (1, 2)
+    assert db_session.query(User).filter(User.email.in_(["fk1@test.com", "fk2@test.com"])).count() == 0
+
+
+def test_bulk_provisioning_hashes_in_a_process_pool(db_session: Session):
+    from src.auth.service import verify_password
+    from src.users import provisioning
+    rows = [{"email": f"pool{i}@test.com", "first_name": "P", "last_name": str(i), "password": f"Secret{i}23!"} for i in range(3)]
+    report = provisioning.provision(db_session, rows, workers=2, chunk_size=2)
+    assert [r.status for r in report.results] == ["created"] * 3
+    users = {u.email: u for u in db_session.query(User).filter(User.email.like("pool%@test.com"))}
+    assert len(users) == 3
+    for i in range(3):
+        assert verify_password(f"Secret{i}23!", users[f"pool{i}@test.com"].password)
+
+
+def test_bulk_provisioning_streams_progress(client: TestClient, admin_headers, monkeypatch):
+    from src.users import provisioning
+    monkeypatch.setattr(provisioning, "PROVISION_CHUNK_SIZE", 2)
+    body = "\n".join(
+        f'{{"email": "stream{i}@test.com", "first_name": "S", "last_name": "{i}", "password": "Secret123!"}}' for i in range(3)
+    ) + "\n{broken"
+    resp = client.post("/users/provision", params={"stream": "true"}, content=body, headers={**admin_headers, "Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 200
+    events = [json.loads(line) for line in resp.text.splitlines()]
+    assert [(e["done"], e["total"]) for e in events if e["type"] == "progress"] == [(1, 4), (3, 4), (4, 4)]
+    assert events[-1]["type"] == "report"
+    assert events[-1]["created"] == 3 and events[-1]["invalid"] == 1
+
+    assert client.post("/users/provision", content=body, headers={**admin_headers, "Content-Type": "text/plain"}).status_code == 415
+
+
+def test_bulk_provisioning_rejects_oversized_bodies(client: TestClient, admin_headers, monkeypatch):
+    from src.users import provisioning
+    headers = {**admin_headers, "Content-Type": "text/csv"}
+    body = "email,first_name,last_name,password\n" + "".join(f"big{i}@test.com,B,{i},Secret123!\n" for i in range(5))
+    monkeypatch.setattr(provisioning, "PROVISION_MAX_ROWS", 2)
+    resp = client.post("/users/provision", content=body, headers=headers)
+    assert resp.status_code == 400 and "At most 2 rows" in resp.json()["detail"]
+    assert provisioning.parse_rows(body, provisioning.CSV, limit=3) == provisioning.parse_rows(body, provisioning.CSV)[:3]
+
+    monkeypatch.setattr(provisioning, "PROVISION_MAX_BYTES", 64)
+    assert client.post("/users/provision", content=body, headers=headers).status_code == 413
+    assert client.get("/users/", params={"q": "big"}, headers=admin_headers).json() == []
+
+
+def test_change_password(client: TestClient, admin_headers):
     payload = {"current_password": ADMIN_PASS, "new_password": "OtraPass123!", "new_password_confirm": "OtraPass123!"}
-    resp = client.put("/users/change-password", json=payload, headers=headers)
+    resp = client.put("/users/change-password", json=payload, headers=admin_headers)
     assert resp.status_code == 200, resp.text
+    # Put it back: the admin fixture is shared by the whole session
+    payload = {"current_password": "OtraPass123!", "new_password": ADMIN_PASS, "new_password_confirm": ADMIN_PASS}
+    assert client.put("/users/change-password", json=payload, headers=admin_headers).status_code == 200